@@ -0,0 +1,159 @@
+'''
+Benchmark of the mcx route point parser
+
+Writes a synthetic plan with 5000 route points into a temporary directory
+and times the parsing of its points with the former point.find based code
+and with mcxFile.parse_mcx_point, which walks the children of a point once.
+The two must give the same data. The time of a whole MCXfile read is
+printed too.
+
+usage:
+python bench_mcx_parser.py [number of points] [repeats]
+'''
+import os
+import random
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+import mcxFile as mcx
+
+
+def dm(value):
+    d = int(value)
+    return f'{d}D{(value - d)*60:05.2f}M'
+
+
+def make_plan(fname, n, seed=1):
+    random.seed(seed)
+    o = ['<?xml version="1.0" encoding="UTF-8"?>',
+         '<cruise name="Benchmark" nameEN="Benchmark" organiser="FMI" collateCenter="FMI" '
+         'platformcode="34AR" platformname="Aranda" platform_class="ship" project="VRT" '
+         'nro="1" status="plan" planDateTime="2021-05-01 10:00:00" language="FI">',
+         '  <software version="1.0"/>',
+         '  <ship name="Aranda" shipCode="34AR" master="M"/>',
+         '  <departure dateTime="2021-05-10T08:00:00" timeZone="UTC" harbour="Helsinki"/>',
+         '  <arrival dateTime="2021-06-10T08:00:00" timeZone="UTC" harbour="Helsinki"/>',
+         '  <purpose>Benchmark</purpose>',
+         '  <description><dr>Benchmark</dr></description>',
+         '  <descriptionFIN><drf>Benchmark</drf></descriptionFIN>',
+         '  <staff></staff>',
+         '  <route>',
+         '    <defaults><speed>10.0</speed><duration>P1H</duration>'
+         '<mapsymbol type="1" size="2" color="3"/></defaults>',
+         '    <points>']
+    t = datetime(2021, 5, 10, 8)
+    for i in range(n):
+        o.append(f'      <point nro="{i}" type="s" status="0" index="{i}">'
+                 f'<name>ST{i}</name><lat>{dm(random.uniform(54, 65.5))}</lat>'
+                 f'<lon>{dm(random.uniform(10, 29))}</lon>'
+                 f'<depth>{random.randint(10, 300)}.0</depth>'
+                 f'<distance>{random.uniform(0, 2000):.1f}</distance>'
+                 f'<entry dateTime="{t.isoformat()}" status="1"/>'
+                 f'<duration>{random.choice(["P1H", "P30M", "P2H15M", "P"])}</duration>')
+        t += timedelta(hours=random.randint(1, 5))
+        o.append(f'<exit dateTime="{t.isoformat()}" status="0"/><speed status="0">10.0</speed>'
+                 '<observations><obscode>CTD,NUT</obscode></observations>'
+                 '<SDN_P02_parameters>TEMP,PSAL</SDN_P02_parameters><SDN_C77_data>H10</SDN_C77_data>'
+                 '<Country>Finland</Country><SeaArea>Gulf of Finland</SeaArea>'
+                 '<isMooring>false</isMooring><mapsymbol type="1" size="2" color="3"/>'
+                 f'<comments>c{i}</comments></point>')
+    o += ['    </points>', '  </route>',
+          '  <acquisitionInfo></acquisitionInfo>',
+          '  <accessPolicies>open</accessPolicies>',
+          '  <deviceCategories>CTD</deviceCategories>',
+          '  <mapfiles>map</mapfiles>',
+          '</cruise>']
+    with open(fname, 'w') as f:
+        f.write('\n'.join(o) + '\n')
+
+
+def parse_point_with_find(station):
+    # the point parsing of MCXfile.read before parse_mcx_point
+    la = station.find('lat').text.split('D')
+    lat = float(la[0]) + float(la[1].split('M')[0])/60
+    lo = station.find('lon').text.split('D')
+    lon = float(lo[0]) + float(lo[1].split('M')[0])/60
+
+    rpoint = mcx.Routepoint(station.find('name').text, lat, lon)
+
+    rpoint.nro = station.attrib['nro']
+    rpoint.type = station.attrib['type']
+    rpoint.status = station.attrib['status']
+    rpoint.index = station.attrib['index']
+
+    rpoint.depth = float(station.find('depth').text)
+    rpoint.distance = float(station.find('distance').text)
+    rpoint.entry = station.find('entry').attrib['dateTime']
+    rpoint.entry_status = station.find('entry').attrib['status']
+    dur = station.find('duration').text
+    if dur:
+        rpoint.duration = mcx.hours_from_mcx_duration_format(dur)
+    rpoint.exit = station.find('exit').attrib['dateTime']
+    rpoint.exit_status = station.find('exit').attrib['status']
+    rpoint.speed = float(station.find('speed').text)
+    rpoint.speed_status = station.find('speed').attrib['status']
+
+    if station.find('observations') is not None:
+        ocode = station.find('observations')
+        if ocode.find('obscode') is not None:
+            rpoint.observations = ocode.find('obscode').text
+
+    if station.find('SDN_P02_parameters') is not None:
+        rpoint.SDN_P02_parameters = station.find(
+            'SDN_P02_parameters').text
+
+    if station.find('SDN_C77_data') is not None:
+        rpoint.SDN_C77_data = station.find('SDN_C77_data').text
+
+    # the truth value of an element, true only with children
+    country = station.find('Country')
+    if country is not None and len(country):
+        rpoint.country = country.text
+    sea_area = station.find('SeaArea')
+    if sea_area is not None and len(sea_area):
+        rpoint.sea_area = sea_area.text
+    rpoint.mooring = mcx.child_node_text(station, 'isMooring')
+    rpoint.mapsymbol = dict(station.find('mapsymbol').attrib)
+    rpoint.comments = mcx.child_node_text(station, 'comments')
+    return rpoint
+
+
+def best_time(func, repeats):
+    best = None
+    for _ in range(repeats):
+        t = time.perf_counter()
+        result = func()
+        t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return best, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, 'benchmark.mcx')
+        make_plan(fname, n)
+        points = ET.parse(fname).getroot().find('route').find('points').findall('point')
+
+        t_find, old = best_time(lambda: [parse_point_with_find(p) for p in points], repeats)
+        t_dispatch, new = best_time(lambda: [mcx.parse_mcx_point(p) for p in points], repeats)
+        old = [vars(p) for p in old]
+        new = [dict(mcx._routepoint_defaults, **r) for r in new]
+        if old != new:
+            print('ERROR: the parsers give different data')
+            sys.exit(1)
+        t_read, _ = best_time(lambda: mcx.MCXfile(fname), repeats)
+        t_lazy, _ = best_time(lambda: mcx.MCXfile(fname, lazy=True), repeats)
+
+    print(f'{n} route points, best of {repeats}')
+    print(f'point.find parser       {1000*t_find:8.1f} ms')
+    print(f'single pass parser      {1000*t_dispatch:8.1f} ms  ({t_find/t_dispatch:.1f} x faster)')
+    print(f'MCXfile read            {1000*t_read:8.1f} ms')
+    print(f'MCXfile read, lazy=True {1000*t_lazy:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
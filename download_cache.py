@@ -0,0 +1,185 @@
+'''
+Local cache for downloaded files
+
+fetch downloads a file over HTTP(S) and keeps a copy in a local cache
+directory. A copy younger than max_age seconds is used as such, an older
+one is revalidated with the ETag and Last-Modified headers of the previous
+response so that an unchanged file is not downloaded again. If the server
+can not be reached (e.g. offline at sea) the last good copy is used.
+
+The cache directory is $MYCRUISE_CACHE_DIR or ~/.cache/mycruise.
+
+usage:
+import download_cache as dc
+text = dc.fetch_text('https://raw.githubusercontent.com/pekkaalenius/MyCruise/main/stations.txt')
+data = dc.fetch(url, max_age=0)      -> always revalidated
+data = dc.fetch(url, max_age=None)   -> the cached copy whenever there is one
+path = dc.fetch_path(url)            -> name of the local copy
+
+atomic_write is also used by the other units that write files that other
+processes may read or write at the same time:
+with dc.atomic_write(fname, 'w') as f:
+    f.write(text)
+'''
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# Seconds a cached copy is used without asking the server
+DEFAULT_MAX_AGE = 24*3600
+DEFAULT_TIMEOUT = 30
+
+# mkstemp makes files readable by their owner only, atomic_write gives them
+# the permissions of files made with open
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def default_cache_dir():
+    return os.environ.get('MYCRUISE_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'mycruise'))
+
+
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, key), os.path.join(cache_dir, f'{key}.json')
+
+
+def _read_meta(data_path, meta_path):
+    # the metadata of a cached copy, None if there is no valid copy
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.isfile(data_path):
+        return None
+    return meta
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb', **kwargs):
+    """ Opens a new temporary file next to path for writing and renames it
+        to path when the with block ends, so that readers of path see the
+        old or the whole new file. The temporary file is unique to the
+        writer, so processes writing path at the same time do not mix their
+        data, and it is removed if the block raises. kwargs are those of
+        open, e.g. encoding.
+    """
+    fd, tmp = tempfile.mkstemp(prefix=f'{os.path.basename(path)}.', suffix='.tmp',
+                               dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            os.chmod(tmp, 0o666 & ~_UMASK)
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        _remove(tmp)
+        raise
+
+
+def _write_atomic(path, data):
+    with atomic_write(path) as f:
+        f.write(data)
+
+
+def _write_meta(meta_path, meta):
+    _write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+
+
+def fetch_path(url, max_age=DEFAULT_MAX_AGE, cache_dir=None, timeout=DEFAULT_TIMEOUT):
+    """ Returns the path of the local copy of url, downloaded or
+        revalidated when needed.
+        max_age - seconds a cached copy is used without revalidation,
+                  0 revalidates always, None never if there is a copy
+        Raises requests.RequestException if the file can not be downloaded
+        and there is no cached copy.
+    """
+    import requests
+
+    cache_dir = cache_dir or default_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = _cache_paths(url, cache_dir)
+    meta = _read_meta(data_path, meta_path)
+    cached = meta is not None
+    meta = meta or {}
+    now = time.time()
+    if cached and (max_age is None or now - meta.get('checked', 0) < max_age):
+        return data_path
+
+    headers = {}
+    if cached:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    try:
+        result = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True, stream=True)
+    except requests.RequestException:
+        if cached:
+            return data_path
+        raise
+
+    with result:
+        if result.status_code == 304 and cached:
+            meta['checked'] = now
+            _write_meta(meta_path, meta)
+            return data_path
+        if result.status_code != 200:
+            # a server error is treated like being offline
+            if cached:
+                return data_path
+            result.raise_for_status()
+            raise requests.HTTPError(f'{url}: unexpected status {result.status_code}', response=result)
+
+        try:
+            with atomic_write(data_path) as f:
+                for chunk in result.iter_content(1 << 16):
+                    f.write(chunk)
+        except requests.RequestException:
+            if cached:
+                return data_path
+            raise
+    _write_meta(meta_path, {'url': url, 'checked': now,
+                            'etag': result.headers.get('ETag'),
+                            'last_modified': result.headers.get('Last-Modified')})
+    return data_path
+
+
+def fetch(url, **kwargs):
+    """ Returns the content of url as bytes through the local cache,
+        see fetch_path for the arguments.
+    """
+    with open(fetch_path(url, **kwargs), 'rb') as f:
+        return f.read()
+
+
+def fetch_text(url, encoding='utf-8', **kwargs):
+    """ Returns the content of url as str, see fetch for the arguments."""
+    return fetch(url, **kwargs).decode(encoding)
+
+
+def clear(url=None, cache_dir=None):
+    """ Removes the cached copy of url, or all cached copies."""
+    cache_dir = cache_dir or default_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return
+    if url is not None:
+        paths = _cache_paths(url, cache_dir)
+    else:
+        paths = [os.path.join(cache_dir, n) for n in os.listdir(cache_dir)]
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
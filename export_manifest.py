@@ -0,0 +1,202 @@
+'''
+Build-if-stale bookkeeping of the map outputs of cruise plans
+
+Each directory of plans gets a small JSON manifest (.mycruise_map.json)
+that records for every output file the plan it was made from, the SHA-1
+of the plan content, mcxFile.EXPORT_VERSION, the options of the output
+(topodir of the pyGMT script) and the modification time and size of the
+output file. An output is stale when any of these has changed or the
+output is missing, and only the stale outputs need to be made again.
+
+Plans that would write the same output files (small.mcx and small.mkx in
+one directory) are not exported but the first of them, otherwise they
+would overwrite each other and be stale on every run.
+
+A plan whose modification time and size are those recorded is not
+hashed again, a plan that is only touched is hashed and found unchanged.
+The hash and the time of a plan are taken before its export, so a plan
+saved during the export is found stale the next time.
+
+usage:
+import export_manifest as em
+todo, states, clashes = em.stale_outputs(f_names, 'LPK', {'P': topodir})   -> {plan: 'LK', ...}
+... export the outputs of todo ...
+em.record_outputs({plan: 'LK'}, states, {'P': topodir})
+'''
+import hashlib
+import json
+import os
+import mcxFile as mcx
+
+MANIFEST_NAME = '.mycruise_map.json'
+MANIFEST_VERSION = 1
+
+
+def file_hash(fname):
+    """ Returns the SHA-1 of the content of file fname as hex."""
+    h = hashlib.sha1()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _stamp(fname):
+    st = os.stat(fname)
+    return [st.st_mtime_ns, st.st_size]
+
+
+class Manifest:
+    """ The manifest of the outputs in directory dirpath."""
+    def __init__(self, dirpath):
+        self.path = os.path.join(dirpath, MANIFEST_NAME)
+        self.outputs = {}
+        self._plans = {}
+        self._dirty = False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == MANIFEST_VERSION:
+            self.outputs = data.get('outputs', {})
+            for out in self.outputs.values():
+                self._plans[out['plan']] = out
+
+    def plan_state(self, plan):
+        """ Returns (SHA-1, [mtime_ns, size]) of the plan, the recorded
+            SHA-1 when the modification time and size are those recorded.
+        """
+        name = os.path.basename(plan)
+        stamp = _stamp(plan)
+        out = self._plans.get(name)
+        if out is not None and out['plan_stamp'] == stamp:
+            return out['sha1'], stamp
+        return file_hash(plan), stamp
+
+    def stale(self, plan, outputtypes, options=None, state=None):
+        """ Returns the letters of outputtypes whose output file of plan is
+            missing or not made from the current plan with the current
+            exporters and options. state is the plan_state of plan.
+        """
+        options = options or {}
+        name = os.path.basename(plan)
+        sha1 = (state or self.plan_state(plan))[0]
+        letters = ''
+        for t in outputtypes:
+            o_name = mcx.export_name(plan, t)
+            out = self.outputs.get(os.path.basename(o_name))
+            try:
+                current = (out is not None
+                           and out['plan'] == name
+                           and out['sha1'] == sha1
+                           and out['exporter'] == mcx.EXPORT_VERSION
+                           and out['options'] == options.get(t, '')
+                           and out['stamp'] == _stamp(o_name))
+            except OSError:
+                current = False
+            if not current:
+                letters += t
+        return letters
+
+    def record(self, plan, outputtypes, state, options=None):
+        """ Records the output files of outputtypes as made from plan.
+            state is the plan_state of the plan before the export.
+        """
+        options = options or {}
+        name = os.path.basename(plan)
+        sha1, plan_stamp = state
+        for t in outputtypes:
+            o_name = mcx.export_name(plan, t)
+            try:
+                stamp = _stamp(o_name)
+            except OSError:
+                continue
+            out = {'plan': name, 'sha1': sha1, 'plan_stamp': plan_stamp,
+                   'exporter': mcx.EXPORT_VERSION, 'options': options.get(t, ''),
+                   'stamp': stamp}
+            self.outputs[os.path.basename(o_name)] = out
+            self._plans[name] = out
+        self._dirty = True
+
+    def save(self):
+        """ Writes the manifest if it has changed."""
+        if not self._dirty:
+            return
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'outputs': self.outputs}, f,
+                          indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError:
+            # outputs that are not recorded are made again the next time
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._dirty = False
+
+
+def _manifests(f_names):
+    # the Manifest of the directory of each plan, one per directory
+    manifests = {}
+    for f in f_names:
+        dirpath = os.path.dirname(os.path.abspath(f))
+        if dirpath not in manifests:
+            manifests[dirpath] = Manifest(dirpath)
+    return manifests
+
+
+def output_clashes(plans, outputtypes):
+    """ Returns {plan: earlier plan} of the plans whose output files of
+        outputtypes are output files of an earlier plan of plans too.
+    """
+    owners = {}
+    clashes = {}
+    for f in plans:
+        path = os.path.abspath(f)
+        for t in outputtypes:
+            owner = owners.setdefault(os.path.abspath(mcx.export_name(f, t)), (path, f))
+            if owner[0] != path:
+                clashes[f] = owner[1]
+    return clashes
+
+
+def stale_outputs(f_names, outputtypes, options=None, force=False, plans=None):
+    """ Returns (todo, states, clashes) of the plans f_names. todo is {plan:
+        letters of its stale outputs} of the plans that have stale outputs
+        (all outputtypes of every plan with force=True), states {plan:
+        plan_state} for record_outputs. A plan that can not be read is in
+        todo with all outputtypes, so that its export reports the error.
+        clashes is {plan: earlier plan} of the plans of f_names that are not
+        in todo because an earlier plan of plans (default f_names) writes
+        the same output files.
+    """
+    clashes = output_clashes(f_names if plans is None else plans, outputtypes)
+    clashes = {f: clashes[f] for f in f_names if f in clashes}
+    manifests = _manifests(f_names)
+    todo = {}
+    states = {}
+    for f in f_names:
+        if f in clashes:
+            continue
+        manifest = manifests[os.path.dirname(os.path.abspath(f))]
+        try:
+            states[f] = manifest.plan_state(f)
+            letters = outputtypes if force else manifest.stale(f, outputtypes, options, states[f])
+        except OSError:
+            letters = outputtypes
+        if letters:
+            todo[f] = letters
+    return todo, states, clashes
+
+
+def record_outputs(done, states, options=None):
+    """ Records the outputs {plan: letters} as made from the plans of
+        states (of stale_outputs) and writes the manifests.
+    """
+    manifests = _manifests(done)
+    for f, letters in done.items():
+        if f in states:
+            manifests[os.path.dirname(os.path.abspath(f))].record(f, letters, states[f], options)
+    for manifest in manifests.values():
+        manifest.save()
@@ -0,0 +1,134 @@
+'''
+Baltic Sea stations of the ICES station dictionary
+
+ICES publishes its station dictionary as StationDictionary.zip, which
+contains a tab separated Station_yyyy-mm-dd-hh-mm.tab file. The station
+table is read as a stream from the zip and parsed line by line. The
+stations of the Baltic Sea countries that are inside the Baltic Sea
+(sea_areas.gsw_Baltic) are kept.
+
+The result is cached as a small .npz file in the download cache directory,
+keyed on the SHA-1 of the zip, so an unchanged dictionary is parsed once.
+The zip can be a local file or is downloaded through download_cache.
+
+usage:
+import ices_stations as ics
+rows = ics.read_ices_stations()                   -> from www.ices.dk
+rows = ics.read_ices_stations('StationDictionary.zip')
+rows                                              -> [(name, country, lat, lat_range,
+                                                      lon, lon_range), ...]
+'''
+import hashlib
+import io
+import os
+import zipfile
+import numpy as np
+import download_cache as dc
+import sea_areas as sa
+
+ICES_URL = 'https://www.ices.dk/data/Documents/ENV/StationDictionary.zip'
+BALTIC_COUNTRIES = ('DK', 'DE', 'FI', 'EE', 'LV', 'LT', 'PL', 'RU', 'SE')
+
+# Bump when the parsing changes so that old cached results are not used
+PARSER_VERSION = 1
+
+
+def zip_hash(zip_path):
+    h = hashlib.sha1()
+    with open(zip_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def station_table_name(zf):
+    """ Returns the name of the last Station_ file of the zip, None if there is none."""
+    name = None
+    for n in zf.namelist():
+        if 'Station_' in n[:8]:
+            name = n
+    return name
+
+
+def iter_ices_rows(zip_path, countries=BALTIC_COUNTRIES):
+    """ Yields (name, country, lat, lat_range, lon, lon_range) of the stations
+        of countries in the Baltic Sea from an ICES station dictionary zip.
+        The table ends at the first line that contains 'Relation'.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        table = station_table_name(zf)
+        if table is None:
+            return
+        with zf.open(table) as raw:
+            # the lines of the table end with '\r'
+            lines = io.TextIOWrapper(raw, encoding='utf-8', newline='\r')
+            next(lines, None)
+            for line in lines:
+                if 'Relation' in line:
+                    break
+                s = line.rstrip('\r').split('\t')
+                if len(s) < 4 or s[3] not in countries:
+                    continue
+                country = s[3]
+                name = s[4]
+                try:
+                    lat = float(s[11])
+                    lat_range = float(s[12])
+                    lon = float(s[13])
+                    lon_range = float(s[14])
+                except (ValueError, IndexError):
+                    lat = float(s[12])
+                    lat_range = float(s[13])
+                    lon = float(s[14])
+                    lon_range = float(s[15])
+                if sa.gsw_Baltic(lon, lat):
+                    yield (name, country, lat, lat_range, lon, lon_range)
+
+
+def _result_path(digest, countries, cache_dir):
+    key = hashlib.sha1(f'{digest};{PARSER_VERSION};{",".join(countries)}'.encode()).hexdigest()
+    return os.path.join(cache_dir, f'ices_{key}.npz')
+
+
+def _save_rows(path, rows):
+    names, countries, lats, lat_ranges, lons, lon_ranges = zip(*rows) if rows else ((),)*6
+    # np.savez adds .npz to a file name, but not when given the open file
+    with dc.atomic_write(path) as f:
+        np.savez(f, name=np.array(names, dtype=str), country=np.array(countries, dtype=str),
+                 lat=np.array(lats, dtype=float), lat_range=np.array(lat_ranges, dtype=float),
+                 lon=np.array(lons, dtype=float), lon_range=np.array(lon_ranges, dtype=float))
+
+
+def _load_rows(path):
+    with np.load(path) as d:
+        return list(zip(d['name'].tolist(), d['country'].tolist(), d['lat'].tolist(),
+                        d['lat_range'].tolist(), d['lon'].tolist(), d['lon_range'].tolist()))
+
+
+def read_ices_stations(source=ICES_URL, countries=BALTIC_COUNTRIES, cache_dir=None,
+                       max_age=dc.DEFAULT_MAX_AGE):
+    """ Returns [(name, country, lat, lat_range, lon, lon_range), ...] of the
+        Baltic Sea stations in an ICES station dictionary zip.
+        source - a local zip file or the URL of the zip
+        The result is returned also when it can not be cached.
+    """
+    cache_dir = cache_dir or dc.default_cache_dir()
+    if os.path.isfile(source):
+        zip_path = source
+    else:
+        zip_path = dc.fetch_path(source, max_age=max_age, cache_dir=cache_dir)
+    countries = tuple(countries)
+    path = _result_path(zip_hash(zip_path), countries, cache_dir)
+    if os.path.isfile(path):
+        try:
+            return _load_rows(path)
+        except (OSError, ValueError, KeyError):
+            pass
+    rows = list(iter_ices_rows(zip_path, countries))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_rows(path, rows)
+    except OSError:
+        # parsed again the next time
+        pass
+    return rows
@@ -23,13 +23,21 @@ Aranda system supports only old mkx-files.
 '''
 from pathlib import Path
 import math
-from datetime import datetime
+from datetime import datetime, timezone
+import copy
+import hashlib
+import io
+import os
+import pickle
 import re
+import sys
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import numpy as np
 import strutils_pa as strpa
 import sea_areas as sarea
 import station_dictionaries as sd
+import download_cache as dc
+import xml_backend as xb
 
 
 def mon2num(mon):
@@ -44,7 +52,7 @@ def mon2num(mon):
 def child_node_text(node, what):
     # ==========================
     child = node.find(what)
-    if child:
+    if child is not None and len(child):
         r = child.text
     else:
         r = ''
@@ -81,9 +89,11 @@ def mcx_duration_format(decimalvalue):
         s = f'{s}{m}M'
     return s
 
+_duration_re = re.compile(r'P(\d*D)?(\d*H)?(\d*M)?')
+
 def hours_from_mcx_duration_format(dstr):
-    res = re.search(r'P(\d*D)?(\d*H)?(\d*M)?', dstr)
-    h = 0
+    res = _duration_re.search(dstr)
+    h = 0.0
     if res[1]:
         h = h + float(res[1][:-1])*24
     if res[2]:
@@ -92,6 +102,205 @@ def hours_from_mcx_duration_format(dstr):
         h = h + float(res[3][:-1])/60
     return h
 
+
+def mcx_dm_degrees(dmstr):
+    # degrees of a mcx D/M coordinate string as read by MCXfile.read:
+    # 'ddDmm.mmM' -> dd + mm.mm/60, the sign of dd is not applied to the minutes
+    d, sep, rest = dmstr.partition('D')
+    if not sep:
+        raise IndexError(f'no D in coordinate {dmstr!r}')
+    return float(d) + float(rest.partition('D')[0].partition('M')[0])/60
+
+# Durations repeat a lot in a route, so the parsed values are kept
+_duration_hours = {}
+
+def _cached_duration_hours(dstr):
+    h = _duration_hours.get(dstr)
+    if h is None:
+        h = hours_from_mcx_duration_format(dstr)
+        if len(_duration_hours) < 10000:
+            _duration_hours[dstr] = h
+    return h
+
+# Handlers of the child elements of a mcx <point>. Each sets the attributes
+# of the point record that MCXfile.read used to set with point.find(tag).
+def _point_name(r, e):
+    r['name'] = e.text
+
+def _point_lat(r, e):
+    r['lat'] = mcx_dm_degrees(e.text)
+
+def _point_lon(r, e):
+    r['lon'] = mcx_dm_degrees(e.text)
+
+def _point_depth(r, e):
+    r['depth'] = float(e.text)
+
+def _point_distance(r, e):
+    r['distance'] = float(e.text)
+
+def _point_entry(r, e):
+    r['entry'] = e.attrib['dateTime']
+    r['entry_status'] = e.attrib['status']
+
+def _point_duration(r, e):
+    if e.text:
+        r['duration'] = _cached_duration_hours(e.text)
+
+def _point_exit(r, e):
+    r['exit'] = e.attrib['dateTime']
+    r['exit_status'] = e.attrib['status']
+
+def _point_speed(r, e):
+    r['speed'] = float(e.text)
+    r['speed_status'] = e.attrib['status']
+
+def _point_observations(r, e):
+    ocode = e.find('obscode')
+    if ocode is not None:
+        r['observations'] = ocode.text
+
+def _point_sdn_p02(r, e):
+    r['SDN_P02_parameters'] = e.text
+
+def _point_sdn_c77(r, e):
+    r['SDN_C77_data'] = e.text
+
+# Country, SeaArea, isMooring and comments were tested with the truth value
+# of the element, which is true only for an element with children
+def _point_country(r, e):
+    if len(e):
+        r['country'] = e.text
+
+def _point_sea_area(r, e):
+    if len(e):
+        r['sea_area'] = e.text
+
+def _point_mooring(r, e):
+    if len(e):
+        r['mooring'] = e.text
+
+def _point_mapsymbol(r, e):
+    r['mapsymbol'] = dict(e.attrib)
+
+def _point_comments(r, e):
+    if len(e):
+        r['comments'] = e.text
+
+mcx_point_handlers = {
+    'name': _point_name,
+    'lat': _point_lat,
+    'lon': _point_lon,
+    'depth': _point_depth,
+    'distance': _point_distance,
+    'entry': _point_entry,
+    'duration': _point_duration,
+    'exit': _point_exit,
+    'speed': _point_speed,
+    'observations': _point_observations,
+    'SDN_P02_parameters': _point_sdn_p02,
+    'SDN_C77_data': _point_sdn_c77,
+    'Country': _point_country,
+    'SeaArea': _point_sea_area,
+    'isMooring': _point_mooring,
+    'mapsymbol': _point_mapsymbol,
+    'comments': _point_comments,
+}
+
+# The child elements every mcx <point> must have
+mcx_point_required = ('name', 'lat', 'lon', 'depth', 'distance', 'entry',
+                      'duration', 'exit', 'speed', 'mapsymbol')
+
+def parse_mcx_point(point):
+    """ Returns the attributes of a mcx <point> element as a dict for RouteTable.
+        The children are walked once and only the first element of each tag
+        is used, as point.find(tag) did.
+    """
+    a = point.attrib
+    r = {'nro': a['nro'], 'type': a['type'], 'status': a['status'], 'index': a['index'],
+         'mooring': '', 'comments': ''}
+    # the handlers of the tags not seen yet
+    todo = mcx_point_handlers.copy()
+    pop = todo.pop
+    for child in point:
+        handler = pop(child.tag, None)
+        if handler is not None:
+            handler(r, child)
+    if todo:
+        for tag in mcx_point_required:
+            if tag in todo:
+                raise AttributeError(f'point {a["nro"]} has no <{tag}>')
+    return r
+
+# Bytes read from the start of a plan to find out its format
+SNIFF_SIZE = 8192
+
+_xml_encoding = re.compile(r'^(\s*<\?xml[^>]*?)\s+encoding\s*=\s*["\'][^"\']*["\']')
+_coordinate_tag = re.compile(rb'<(long|lon)[\s>/]')
+_root_tag = re.compile(rb'<cruise\s([^>]*)>')
+
+# Attributes of <cruise> that only mcx files have
+mcx_root_attributes = (b'collateCenter', b'platformname', b'platform_class', b'crcode')
+
+
+def _plan_data(source):
+    # the content of bytes or of a binary or text file object as bytes
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    data = source.read()
+    if isinstance(data, str):
+        # the text is parsed as UTF-8, whatever its declaration says
+        data = _xml_encoding.sub(r'\1', data, count=1).encode('utf-8')
+    return data
+
+
+def _plan_source(source):
+    # (file name, content as bytes or None) of a plan file name, bytes or file object
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source), None
+    name = getattr(source, 'name', '')
+    return (name if isinstance(name, str) else ''), _plan_data(source)
+
+
+def sniff_format(head, fname=''):
+    """ Returns 'mcx' or 'mkx', the format of a plan from the first bytes of it.
+        The route points of mkx files have <long>, those of mcx files <lon>.
+        Before the first point the attributes of <cruise> are used, and
+        without <cruise> the extension of fname.
+    """
+    m = _coordinate_tag.search(head)
+    if m is not None:
+        return 'mkx' if m.group(1) == b'long' else 'mcx'
+    m = _root_tag.search(head)
+    if m is not None:
+        attributes = m.group(1)
+        if any(re.search(rb'\b' + a + rb'\s*=', attributes) for a in mcx_root_attributes):
+            return 'mcx'
+        return 'mkx'
+    return 'mkx' if fname.upper().endswith('.MKX') else 'mcx'
+
+
+def open_cruise(source, **kwargs):
+    """ Returns an MCXfile or an MKXfile of a plan, as its format is sniffed
+        from the first SNIFF_SIZE bytes.
+        source - file name, the content of a plan as bytes or a file object
+        kwargs - arguments of the class (lazy, backend, cache, cache_dir)
+    """
+    fname, data = _plan_source(source)
+    if data is not None:
+        head = data[:SNIFF_SIZE]
+        source = data
+    elif os.path.isfile(fname):
+        with open(fname, 'rb') as f:
+            head = f.read(SNIFF_SIZE)
+    else:
+        head = b''
+    cls = MKXfile if sniff_format(head, fname) == 'mkx' else MCXfile
+    plan = cls(source, **kwargs)
+    if data is not None:
+        plan.fname = fname
+    return plan
+
 # ==============================
 mcx_html_tmpl = [
     '<!DOCTYPE html>',
@@ -528,10 +737,7 @@ mcx_html_tmpl = [
 
 def mycruise_leaflet_map(filename):
     # ==================================
-    if '.MKX' in filename.upper():
-        acruise = MKXfile(filename)
-    else:
-        acruise = MCXfile(filename)
+    acruise = open_cruise(filename)
 
     [lo1, la1, lo2, la2] = acruise.get_boundingbox()
 
@@ -623,7 +829,7 @@ def mycruise_leaflet_map(filename):
     for I in range(I2, len(tmpl)):
         olist.append(tmpl[I])
 
-    o_name = filename.split('.')[0] + '.html'
+    o_name = os.path.splitext(filename)[0] + '.html'
     o_file = open(o_name, 'w')
     for i in range(len(olist)):
         o_file.write(olist[i] + '\n')
@@ -691,6 +897,381 @@ class Routepoint:
         self.sea_area = ''
 
 
+def _epoch(dtstr):
+    # seconds since 1970-01-01 of an ISO date time string taken as UTC, nan if not a date time
+    try:
+        t = datetime.fromisoformat(dtstr)
+    except (TypeError, ValueError):
+        return math.nan
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t.timestamp()
+
+
+# The attributes of a new Routepoint, the defaults of the RouteTable columns
+_routepoint_defaults = Routepoint('', 0.0, 0.0).__dict__
+
+# Marks a value that a point does not have (an attribute it was never given)
+_MISSING = object()
+
+
+class RouteRow:
+    """ View of one point of a RouteTable. Reading and setting attributes
+        works as with a Routepoint: route[i].lat, route[i].name = 'X'
+
+        A view is a position in the table. Inserting, deleting or replacing
+        points of the table makes the views taken before it stale, using
+        one raises RuntimeError (appending keeps them valid). copy.copy,
+        copy.deepcopy and pickle give a Routepoint with the attributes of
+        the point, not a view.
+    """
+    __slots__ = ('_table', '_i', '_generation')
+
+    def __init__(self, table, i):
+        object.__setattr__(self, '_table', table)
+        object.__setattr__(self, '_i', i)
+        object.__setattr__(self, '_generation', table._generation)
+
+    def __getattr__(self, name):
+        if name[0] == '_':
+            raise AttributeError(name)
+        table = self._table
+        if self._generation != table._generation:
+            raise RuntimeError(f'route point {self._i} has been moved or removed')
+        return table.get(name, self._i)
+
+    def __setattr__(self, name, value):
+        if name[0] == '_':
+            raise AttributeError(f'{name} can not be set on a route point')
+        table = self._table
+        if self._generation != table._generation:
+            raise RuntimeError(f'route point {self._i} has been moved or removed')
+        table.set(name, self._i, value)
+
+    def as_dict(self):
+        if self._generation != self._table._generation:
+            raise RuntimeError(f'route point {self._i} has been moved or removed')
+        return self._table.record(self._i)
+
+    def to_point(self):
+        """ The point as a Routepoint that does not follow the table."""
+        return _routepoint(self.as_dict())
+
+    def __copy__(self):
+        return self.to_point()
+
+    def __deepcopy__(self, memo):
+        return _routepoint(copy.deepcopy(self.as_dict(), memo))
+
+    def __reduce__(self):
+        return (_routepoint, (self.as_dict(),))
+
+    def __repr__(self):
+        if self._generation != self._table._generation:
+            return f'RouteRow({self._i}, stale)'
+        return f'RouteRow({self._i}, {self.name!r}, {self.lat}, {self.lon})'
+
+
+def _routepoint(record):
+    p = Routepoint(record.get('name', ''), record.get('lat', 0.0), record.get('lon', 0.0))
+    p.__dict__.update(record)
+    return p
+
+
+# The kinds of the RouteTable columns: NumPy float64, int32 codes of
+# interned strings and Python lists of any values
+_FLOAT, _STRING, _OBJECT = 'f', 's', 'o'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class RouteTable:
+    """ The route points of a cruise plan as columns.
+
+        Columns of numbers with at least one float are NumPy float64
+        arrays (ints set into them become floats), columns with only
+        strings are int32 codes into one table of interned strings, other
+        columns are lists. entry_epoch and exit_epoch are the entry and exit
+        times in seconds since 1970 (UTC, nan if not given), the original
+        strings stay in entry and exit. Indexing gives RouteRow views.
+
+        The arrays have room to grow, so append is amortized O(1) per
+        column, insert and delete shift the columns in place. Reading a
+        point through a view costs more than reading a Routepoint
+        attribute, whole columns (column, values) are the fast way.
+    """
+    def __init__(self, records=()):
+        """ records - dicts of the attributes of the points """
+        self._strings = []
+        self._string_ids = {}
+        self._generation = 0
+        self._build(list(records))
+
+    @classmethod
+    def from_points(cls, points):
+        """ Makes a table of Routepoints, RouteRows or dicts."""
+        return cls([_point_record(p) for p in points])
+
+    def _build(self, records):
+        self.n = len(records)
+        self._capacity = self.n
+        names = dict.fromkeys(_routepoint_defaults)
+        for r in records:
+            names.update(dict.fromkeys(r))
+        names.pop('entry_epoch', None)
+        names.pop('exit_epoch', None)
+        self._columns = {}
+        self._kinds = {}
+        for name in names:
+            self._add_column(name, [self._record_value(r, name) for r in records])
+        for name in ('entry', 'exit'):
+            values = self._values(name) if name in self._columns else [_MISSING]*self.n
+            self._columns[f'{name}_epoch'] = np.array([_epoch(v) for v in values], dtype=float)
+            self._kinds[f'{name}_epoch'] = _FLOAT
+
+    @staticmethod
+    def _record_value(record, name):
+        # the value of a column for a point, the Routepoint default if the point has none
+        if name in record:
+            return record[name]
+        default = _routepoint_defaults.get(name, _MISSING)
+        if isinstance(default, (list, dict)):
+            # every point gets its own list as a Routepoint does
+            return copy.copy(default)
+        return default
+
+    def _add_column(self, name, values):
+        # a column of the n values of the points
+        if values:
+            numbers = all(_is_number(v) for v in values)
+            is_float = numbers and any(isinstance(v, float) for v in values)
+            is_string = not numbers and all(type(v) is str for v in values)
+        else:
+            default = _routepoint_defaults.get(name)
+            is_float = isinstance(default, float)
+            is_string = isinstance(default, str)
+        if is_float:
+            col = np.empty(self._capacity, dtype=float)
+            col[:self.n] = values
+            kind = _FLOAT
+        elif is_string:
+            col = np.empty(self._capacity, dtype=np.int32)
+            col[:self.n] = [self._string_id(v) for v in values]
+            kind = _STRING
+        else:
+            col = list(values)
+            kind = _OBJECT
+        self._columns[name] = col
+        self._kinds[name] = kind
+
+    def _string_id(self, value):
+        sid = self._string_ids.get(value)
+        if sid is None:
+            sid = len(self._strings)
+            self._strings.append(sys.intern(value))
+            self._string_ids[value] = sid
+        return sid
+
+    def _values(self, name):
+        col = self._columns[name]
+        kind = self._kinds[name]
+        if kind == _OBJECT:
+            return list(col)
+        if kind == _STRING:
+            strings = self._strings
+            return [strings[k] for k in col[:self.n].tolist()]
+        return col[:self.n].tolist()
+
+    def _reserve(self, n):
+        # room for n points in the arrays, grown in steps of at least a half
+        if n <= self._capacity:
+            return
+        capacity = max(n, 16, self._capacity + self._capacity//2)
+        for name, col in self._columns.items():
+            if self._kinds[name] != _OBJECT:
+                grown = np.empty(capacity, dtype=col.dtype)
+                grown[:self.n] = col[:self.n]
+                self._columns[name] = grown
+        self._capacity = capacity
+
+    def __len__(self):
+        return self.n
+
+    def _index(self, i):
+        if i < 0:
+            i = i + self.n
+        if not 0 <= i < self.n:
+            raise IndexError('route point index out of range')
+        return i
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [RouteRow(self, k) for k in range(*i.indices(self.n))]
+        return RouteRow(self, self._index(i))
+
+    def __iter__(self):
+        return (RouteRow(self, i) for i in range(self.n))
+
+    def __repr__(self):
+        return f'RouteTable({self.n} points)'
+
+    def fields(self):
+        return list(self._columns)
+
+    def column(self, name):
+        """ Returns a column: a NumPy array for float columns, a list otherwise."""
+        kind = self._kinds.get(name)
+        if kind is None:
+            raise AttributeError(name)
+        if kind == _FLOAT:
+            return self._columns[name][:self.n]
+        return self.values(name)
+
+    def values(self, name):
+        """ Returns a column as a list of Python values."""
+        if name not in self._columns:
+            raise AttributeError(name)
+        values = self._values(name)
+        if self._kinds[name] == _OBJECT and any(v is _MISSING for v in values):
+            raise AttributeError(name)
+        return values
+
+    def get(self, name, i):
+        kind = self._kinds.get(name)
+        if kind is None:
+            raise AttributeError(name)
+        if kind == _FLOAT:
+            return self._columns[name].item(i)
+        if kind == _STRING:
+            return self._strings[self._columns[name].item(i)]
+        value = self._columns[name][i]
+        if value is _MISSING:
+            raise AttributeError(name)
+        return value
+
+    def set(self, name, i, value):
+        if name in ('entry_epoch', 'exit_epoch'):
+            raise AttributeError(f'{name} follows {name[:-6]}')
+        self._store(name, i, value)
+
+    def _store(self, name, i, value):
+        kind = self._kinds.get(name)
+        if kind is None:
+            self._columns[name] = [_MISSING]*self.n
+            kind = self._kinds[name] = _OBJECT
+        if kind == _OBJECT:
+            self._columns[name][i] = value
+        elif kind == _STRING and type(value) is str:
+            self._columns[name][i] = self._string_id(value)
+        elif kind == _FLOAT and _is_number(value):
+            self._columns[name][i] = value
+        else:
+            col = self._columns[name] = self._values(name)
+            self._kinds[name] = _OBJECT
+            col[i] = value
+        if name in ('entry', 'exit'):
+            self._columns[f'{name}_epoch'][i] = _epoch(value)
+
+    def record(self, i):
+        """ The attributes of point i as a dict."""
+        result = {}
+        for name in self._columns:
+            if name in ('entry_epoch', 'exit_epoch'):
+                continue
+            try:
+                result[name] = self.get(name, i)
+            except AttributeError:
+                pass
+        return result
+
+    def records(self):
+        return [self.record(i) for i in range(self.n)]
+
+    def _store_record(self, i, record):
+        # sets the columns of point i to the attributes of record
+        for name in list(self._columns):
+            if name not in ('entry_epoch', 'exit_epoch'):
+                self._store(name, i, self._record_value(record, name))
+        for name in record:
+            if name not in self._columns:
+                self._store(name, i, record[name])
+
+    def extend(self, points):
+        records = [_point_record(p) for p in points]
+        if self.n == 0:
+            self._build(records)
+            return
+        self._reserve(self.n + len(records))
+        for record in records:
+            self._insert_record(self.n, record)
+
+    def append(self, point):
+        self.extend([point])
+
+    def _insert_record(self, i, record):
+        # opens a place for a point at i and fills it from record
+        n = self.n
+        self._reserve(n + 1)
+        for name, col in self._columns.items():
+            if self._kinds[name] == _OBJECT:
+                col.insert(i, _MISSING)
+            elif i < n:
+                col[i + 1:n + 1] = col[i:n]
+        self.n = n + 1
+        self._store_record(i, record)
+
+    def insert(self, i, point):
+        """ Inserts a point before index i as list.insert does."""
+        if i < 0:
+            i = max(0, i + self.n)
+        i = min(i, self.n)
+        record = _point_record(point)
+        self._generation += 1
+        self._insert_record(i, record)
+
+    def __delitem__(self, i):
+        if isinstance(i, slice):
+            keep = np.ones(self.n, dtype=bool)
+            keep[i] = False
+        else:
+            i = self._index(i)
+            keep = None
+        self._generation += 1
+        n = self.n
+        for name, col in self._columns.items():
+            if keep is not None:
+                if self._kinds[name] == _OBJECT:
+                    self._columns[name] = [v for v, k in zip(col, keep.tolist()) if k]
+                else:
+                    kept = col[:n][keep]
+                    col[:len(kept)] = kept
+            elif self._kinds[name] == _OBJECT:
+                del col[i]
+            else:
+                col[i:n - 1] = col[i + 1:n]
+        self.n = n - 1 if keep is None else int(keep.sum())
+
+    def __setitem__(self, i, point):
+        i = self._index(i)
+        record = _point_record(point)
+        self._generation += 1
+        self._store_record(i, record)
+
+    def to_points(self):
+        """ The points as Routepoint objects."""
+        return [_routepoint(r) for r in self.records()]
+
+
+def _point_record(point):
+    if isinstance(point, dict):
+        return dict(point)
+    if isinstance(point, RouteRow):
+        return point.as_dict()
+    return dict(vars(point))
+
+
 class Cruiseroute:
     def __init__(self):
         self.default_speed_knots = 10.0
@@ -715,9 +1296,679 @@ class ObjectiveInfo:
         self.paramName = paramName
 
 
-class MCXfile:
-    def __init__(self, fname):
-        self.fname = fname
+# Bump when the parsing or the attributes of the plans change so that
+# old snapshots are not used
+PARSER_VERSION = 2
+SNAPSHOT_SUFFIX = '.plan.pickle'
+
+
+def default_snapshot_dir():
+    return os.path.join(dc.default_cache_dir(), 'plans')
+
+
+class _PlanSnapshot:
+    """ Snapshots of parsed plans.
+
+        With cache=True the attributes of a plan read in full are pickled
+        into a cache directory, one file for each plan file. Later the plan
+        is loaded from the snapshot instead of parsing the XML as long as
+        the path, size and modification time of the file and PARSER_VERSION
+        are the same as when the snapshot was made. A plan read with
+        lazy=True is not snapshotted. A pickle can run code when it is
+        loaded, use only a cache directory that others can not write to.
+    """
+    # attributes that are not stored in a snapshot
+    snapshot_skip = ('fname', '_data', 'xml', 'OK', '_body_defaults')
+
+    def _snapshot_key(self):
+        st = os.stat(self.fname)
+        return (type(self).__name__, os.path.abspath(self.fname), st.st_size,
+                st.st_mtime_ns, PARSER_VERSION)
+
+    def _snapshot_path(self, cache_dir):
+        path = f'{type(self).__name__};{os.path.abspath(self.fname)}'
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(cache_dir, name + SNAPSHOT_SUFFIX)
+
+    def _read_snapshot(self, key, cache_dir):
+        try:
+            with open(self._snapshot_path(cache_dir), 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot['key'] != key:
+                return False
+            plan = snapshot['plan']
+        except Exception:
+            # no snapshot or one that can not be read, the file is parsed
+            return False
+        self.__dict__.update(plan)
+        return True
+
+    def _write_snapshot(self, key, cache_dir):
+        skip = self.snapshot_skip
+        plan = {name: value for name, value in self.__dict__.items() if name not in skip}
+        path = self._snapshot_path(cache_dir)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump({'key': key, 'plan': plan}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            # a plan that can not be cached is still read
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _read_plan(self, lazy, cache, cache_dir):
+        # reads the plan from a snapshot, lazily or in full
+        if not cache:
+            if lazy:
+                self._read_lazy()
+            else:
+                self.read()
+            return
+        cache_dir = cache_dir or default_snapshot_dir()
+        # the key is taken before reading, a file changed during the read
+        # gives a snapshot that is not used
+        key = self._snapshot_key()
+        if self._read_snapshot(key, cache_dir):
+            return
+        if lazy:
+            self._read_lazy()
+        else:
+            self.read()
+            self._write_snapshot(key, cache_dir)
+
+
+class _LazyPlan:
+    """ Lazy loading of the crew and the route of a cruise plan.
+
+        With lazy=True a plan reads only the cruise attributes and the
+        elements in header_tags (ship, departure, arrival...). iterparse
+        stops as soon as they all have been read. The crew, the route and
+        the other attributes in body_attributes are parsed from the file
+        when one of them is first accessed.
+    """
+    header_tags = ()
+    body_attributes = ()
+
+    def _read_lazy(self):
+        self._body_loaded = False
+        # the initial values are put back when the body is read
+        self._body_defaults = {name: self.__dict__.pop(name)
+                               for name in self.body_attributes if name in self.__dict__}
+        wanted = set(self.header_tags)
+        root = None
+        depth = 0
+        with self._open_plan() as f:
+            for event, elem in self.xml.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                    depth = depth + 1
+                    continue
+                depth = depth - 1
+                if depth == 1:
+                    if elem.tag in wanted:
+                        wanted.discard(elem.tag)
+                        if not wanted:
+                            break
+                    else:
+                        elem.clear()
+        self._read_header(root)
+
+    def _load_body(self):
+        self._body_loaded = True
+        self.__dict__.update(self.__dict__.pop('_body_defaults', {}))
+        with self._open_plan() as f:
+            self._read_body(self.xml.parse(f))
+
+    def _open_plan(self):
+        # the plan file, or the plan given as bytes, as a binary file object
+        if self._data is not None:
+            return io.BytesIO(self._data)
+        return open(self.fname, 'rb')
+
+    def _body(self):
+        # makes sure that the rest of a lazily read plan has been parsed
+        if not self.__dict__.get('_body_loaded', True):
+            self._load_body()
+
+    @property
+    def route(self):
+        self._body()
+        return self._route
+
+    @route.setter
+    def route(self, value):
+        self._body()
+        if not isinstance(value, RouteTable):
+            value = RouteTable.from_points(value)
+        self._route = value
+
+    @property
+    def scientific_crew(self):
+        self._body()
+        return self._scientific_crew
+
+    @scientific_crew.setter
+    def scientific_crew(self, value):
+        self._body()
+        self._scientific_crew = value
+
+    def __getattr__(self, name):
+        if name in type(self).body_attributes and not self.__dict__.get('_body_loaded', True):
+            self._load_body()
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+
+# The outputtypes of export: (suffix of the output file, writer method)
+export_outputs = {
+    'L': ('.html', '_leaflet_lines'),
+    'P': ('_gmt.txt', '_gmt_lines'),
+    'O': ('_ODV.gob', '_odv_lines'),
+    'I': ('_ODV_line.gob', '_odv_line_lines'),
+    'S': ('_ODV_points.gob', '_odv_points_lines'),
+    'K': ('.kml', '_kml_lines'),
+}
+
+# The version of the exporters, raise it when the output of some exporter
+# changes so that the files made by the earlier version are made again
+EXPORT_VERSION = 1
+
+
+def _output_base(fname):
+    # the plan file name without extension, the start of its output file names
+    if not fname:
+        # a plan opened from bytes or a stream
+        raise ValueError('plan has no file name, give out=')
+    return os.path.splitext(fname)[0]
+
+
+def export_name(fname, outputtype):
+    """ Returns the name of the output file of outputtype (one letter of
+        export_outputs) of the plan fname. Raises ValueError if fname is
+        empty, as it is for a plan opened from bytes or a stream.
+    """
+    return f"{_output_base(fname)}{export_outputs[outputtype][0]}"
+
+
+# The size of the pieces of text the exporters write at a time
+OUTPUT_CHUNK_SIZE = 1 << 16
+
+
+def output_chunks(texts, size=OUTPUT_CHUNK_SIZE):
+    """ Yields the strings of texts joined into pieces of about size
+        characters.
+    """
+    buf = []
+    n = 0
+    for text in texts:
+        buf.append(text)
+        n += len(text)
+        if n >= size:
+            yield ''.join(buf)
+            buf = []
+            n = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def _is_binary(stream):
+    return (isinstance(stream, (io.RawIOBase, io.BufferedIOBase))
+            or 'b' in getattr(stream, 'mode', ''))
+
+
+def write_output(texts, out):
+    """ Writes the strings of texts, an output of an exporter, into out:
+            a file name      - the file is written, returns the file name
+            a stream         - written as str, or as UTF-8 bytes into a binary
+                               stream (e.g. BytesIO, an HTTP response), returns None
+            str or bytes     - returns the output as str or UTF-8 bytes
+    """
+    if out is str or out is bytes:
+        text = ''.join(texts)
+        return text if out is str else text.encode('utf-8')
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, 'w') as ofile:
+            for chunk in output_chunks(texts):
+                ofile.write(chunk)
+        return out
+    if _is_binary(out):
+        for chunk in output_chunks(texts):
+            out.write(chunk.encode('utf-8'))
+    else:
+        for chunk in output_chunks(texts):
+            out.write(chunk)
+    return None
+
+
+class ExportData:
+    """ The route of a plan as the exporters need it.
+
+        The columns of the route are read once and the coordinates are
+        formatted with 5 decimals (ODV, KML and the Leaflet route line) in
+        one pass that also finds stations, the indices of the points of
+        type 's', and named, the indices of the points not named 'P'.
+        Other columns and formats are made when first needed and then
+        shared by all the outputs of an export.
+    """
+    def __init__(self, plan):
+        self.route = plan.route
+        self._columns = {}
+        self.lons = self.column('lon')
+        self.lats = self.column('lat')
+        self.names = self.column('name')
+        self.n = len(self.lons)
+        if self.n > 0:
+            self.bbox = [min(self.lons), min(self.lats), max(self.lons), max(self.lats)]
+        else:
+            self.bbox = [180.0, 90, -180.0, -90.0]
+
+        self.lon5 = []
+        self.lat5 = []
+        self.stations = []
+        self.named = []
+        for i, (lon, lat, name, ptype) in enumerate(zip(self.lons, self.lats, self.names,
+                                                         self.column('type'))):
+            self.lon5.append(f'{lon:.5f}')
+            self.lat5.append(f'{lat:.5f}')
+            if ptype == 's':
+                self.stations.append(i)
+            if name != 'P':
+                self.named.append(i)
+
+    def column(self, name):
+        """ Returns the values of a route column as a list."""
+        if name not in self._columns:
+            self._columns[name] = self.route.values(name)
+        return self._columns[name]
+
+    @property
+    def odv_points(self):
+        # the coordinates of all points as ODV gob rows
+        if 'odv_points' not in self._columns:
+            self._columns['odv_points'] = [f'{lon} {lat}' for lon, lat in zip(self.lon5, self.lat5)]
+        return self._columns['odv_points']
+
+
+def _check_outputtypes(outputtypes, single=False):
+    # the letters of outputtypes without repeats, ValueError for an unknown letter
+    letters = list(dict.fromkeys(outputtypes.upper()))
+    for outputtype in letters:
+        if outputtype not in export_outputs:
+            raise ValueError(f'unknown outputtype {outputtype!r}, use some of {"".join(export_outputs)}')
+    if single and len(letters) != 1:
+        raise ValueError(f'give one outputtype, not {outputtypes!r}')
+    return letters
+
+
+class _PlanExport:
+    """ The map outputs of a plan.
+
+        export writes several outputs (e.g. 'LPOK') from one ExportData of
+        the route. Each output is a generator of lines, the to_* methods
+        write one output with export.
+    """
+    # the Leaflet route line has ', ' (mcx) or ',' (mkx) between the points
+    leaflet_route_separator = ', '
+    # the Leaflet tooltips of the points show their index
+    leaflet_tooltip_index = True
+
+    def export(self, outputtypes='L', **kwargs):
+        """ Writes the files of outputtypes, e.g. 'LPOK', with one reading
+            of the route.
+            L - Leaflet html-file, P - pyGMT script, O - ODV gob-file with
+            line and points, I - ODV gob-file, line only, S - ODV gob-file,
+            points only, K - Google Earth kml-file
+            kwargs are the options of the pyGMT script (topodir, station_names, line)
+            Returns the names of the files written. A plan without a file
+            name raises ValueError, give its exporters out instead.
+        """
+        outputtypes = _check_outputtypes(outputtypes)
+        data = ExportData(self)
+        o_names = []
+        for outputtype in outputtypes:
+            o_name = export_name(self.fname, outputtype)
+            write_output(self._output_text(outputtype, data, kwargs), o_name)
+            o_names.append(o_name)
+        return o_names
+
+    def iter_export(self, outputtype, **kwargs):
+        """ Yields the output of outputtype (one letter of export) in pieces
+            of text of about OUTPUT_CHUNK_SIZE characters, e.g. for streaming
+            it into an HTTP response.
+        """
+        [outputtype] = _check_outputtypes(outputtype, single=True)
+        return output_chunks(self._output_text(outputtype, ExportData(self), kwargs))
+
+    def _output_text(self, outputtype, data, kwargs):
+        # the lines of an output with their line ends
+        writer = getattr(self, export_outputs[outputtype][1])
+        lines = writer(data, **kwargs) if outputtype == 'P' else writer(data)
+        return (f'{r}\n' for r in lines)
+
+    def _export_to(self, outputtype, out, **kwargs):
+        # one output into out of write_output, the file of export when out is None
+        if out is None:
+            return self.export(outputtype, **kwargs)[0]
+        return write_output(self._output_text(outputtype, ExportData(self), kwargs), out)
+
+    # The exporters write the file named after the plan file by default,
+    # a plan opened from bytes or a stream has none and needs out.
+    # out can be another file name, a text or binary stream, or str or bytes
+    # to get the output as a string (see write_output).
+
+    def leaflethtml(self, out=None):
+        #   Prints the leaflet html into a file
+        return self._export_to('L', out)
+
+    def to_gmtscript(self, out=None, **kwargs):
+        return self._export_to('P', out, **kwargs)
+
+    def to_ODV_GOBline(self, out=None):
+        return self._export_to('I', out)
+
+    def to_ODV_GOBsymbols(self, out=None):
+        return self._export_to('S', out)
+
+    def to_ODV_gob(self, out=None):
+        return self._export_to('O', out)
+
+    def to_KML(self, out=None):
+        return self._export_to('K', out)
+
+    def _point_countries(self, data):
+        # the economic zones of the points, Finnish points are green on the Leaflet map
+        return data.column('country')
+
+    def _leaflet_lines(self, data):
+        [lo1, la1, lo2, la2] = data.bbox
+        llhtml = mcx_html_tmpl.copy()
+        for I in range(len(llhtml)):
+            if '<title>' in llhtml[I]:
+                llhtml[I] = f'    <title>Routemap of {self.name_en}</title>'
+
+            if 'var map = L.map' in llhtml[I]:
+                llhtml[I] = f"      var map = L.map('map', {{center:["\
+                    f'{((la1+la2)/2):10.6f}, {((lo1+lo2)/2):11.6f}],'\
+                    f' zoom: 5}});'
+
+            if 'Cruise route of' in llhtml[I]:
+                llhtml[I] = '        this._div.innerHTML = \'<h4 style="color: #0000CC;">Cruise route of' \
+                    + ' the ' \
+                    + self.platform_name \
+                    + ' cruise ' \
+                    + self.nro \
+                    + '/' \
+                    + str(self.year) \
+                    + '</h4>' \
+                    + self.name_en \
+                    + '<br>' \
+                    + self.departure_time.split('T')[0] \
+                    + ' - ' \
+                    + self.arrival_time.split('T')[0] \
+                    + '\';'
+            if '//pisteet ja reitti' in llhtml[I]:
+                I1 = I
+                I2 = I+1
+
+        yield from llhtml[:I1]
+
+        yield ''
+        yield '      var stationPoints = L.layerGroup();'
+        yield ''
+
+        countries = self._point_countries(data)
+        entries = data.column('entry')
+        distances = data.column('distance')
+        indices = data.column('index') if self.leaflet_tooltip_index else None
+        for I in data.named:
+            nameandtime = f"{I}: {data.names[I]}, {entries[I]}, {distances[I]:5.1f} nmi"
+            if indices is not None:
+                nameandtime = f"{nameandtime}, index={indices[I]}"
+
+            if countries[I] == 'Finland':
+                pColor = 'green'
+            else:
+                pColor = 'red'
+
+            yield '      L.circle('\
+                f"[{data.lats[I]:9.6f}, {data.lons[I]:11.6f}], "\
+                f"500, {{color: '{pColor}',fillColor: '{pColor}',"\
+                f"fillOpacity: 0.5"\
+                f'}}).addTo(stationPoints).bindTooltip("{nameandtime}");'
+
+        yield ' '
+        yield '      var routeLine = L.layerGroup();'
+        yield '      var antLine   = L.layerGroup();'
+        yield ''
+
+        points = self.leaflet_route_separator.join(
+            [f'[{lat:>9}, {lon:>10}]' for lon, lat in zip(data.lon5, data.lat5)])
+        yield f'      route = [{points}]'
+        yield '      L.polyline(route, {color: \'blue\', weight: 1}).addTo(routeLine);'
+        yield ' '
+        yield '      antroute = L.polyline.antPath(route, {'
+        yield '          "delay": 1000,'
+        yield '          "dashArray": [10,10],'
+        yield '          "weight": 3,'
+        yield '          "color": "#0000FF",'
+        yield '          "pulseColor": "#FFFFFF",'
+        yield '          "paused": false ,'
+        yield '          "reverse": false ,'
+        yield '          "hardwareAccelerated": true'
+        yield '      }).addTo(antLine)'
+        yield ' '
+
+        yield from llhtml[I2:]
+
+    def _gmt_lines(self, data, **kwargs):
+        topodir = kwargs.get('topodir', False)
+        stationnames = kwargs.get('station_names', False)
+        routeline = kwargs.get('line', True)
+        [lo1, la1, lo2, la2] = data.bbox
+        reg = [float(math.trunc(lo1-1)), float(math.trunc(lo2+2)), float(math.trunc(la1)), float(math.trunc(la2+1))]
+        yield 'import pygmt'
+        yield ' '
+        yield 'fig = pygmt.Figure()'
+        yield ' '
+        yield '# mapregion [minlon, maxlon, minlat, maxlat]'
+        yield f'fig.basemap(region=[{reg[0]:.{7}}, {reg[1]:.{7}}, {reg[2]:.{7}}, {reg[3]:.{7}}], projection="M8i", frame=True)'
+        if topodir:
+            topodat = f'{topodir}Baltic_Sea_topo.nc'
+            topoclr = f'{topodir}Baltic_Sea_topo.cpt'
+            yield '# plot bottom topography'
+            yield f'fig.grdimage("{topodat}", cmap="{topoclr}")'
+            yield '# plot land'
+            yield 'fig.coast(land="darkgreen")'
+            penclr = 'black'
+        else:
+            yield '# plot land'
+            yield 'fig.coast(land="darkgreen", water="navy")'
+            penclr = 'white'
+
+        xs = ', '.join([f'{lon:.{7}}' for lon in data.lons])
+        ys = ', '.join([f'{lat:.{7}}' for lat in data.lats])
+        s = f'fig.plot(x=[{xs}], y=[{ys}]'
+        if routeline:
+            yield '# plot routeline '
+            yield s + f', pen="1,{penclr}")'
+        yield '# plot station marks'
+        yield s + ', pen="3,red", S="c0.1")'
+        # Plot cruise name
+        namestr = f'Cruise {self.name}, {self.departure_time.split("T")[0]} - {self.arrival_time.split("T")[0]}'
+        yield '# plot title '
+        yield f'fig.text(text="{namestr}", x={reg[0]+(reg[1]-reg[0])/25}, y={reg[3]-(reg[3]-reg[2])/25}, justify="LM", font="16p,Helvetica-Bold,{penclr}")'
+        yield ' '
+        if stationnames:
+            for name, lon, lat in zip(data.names, data.lons, data.lats):
+                yield f'fig.text(text=["{name}"], x=[{lon}], y=[{lat}], font="6p,Helvetica-Bold,navy", justify="LM", offset="0.15/0", fill="white")'
+
+        yield 'fig.show()'
+
+    def _odv_line_lines(self, data):
+        yield '%GOB1.04 graphics objects'
+        yield ''
+        yield ':POLYLINE'
+        yield 'coordinates=1'
+        yield 'clip=1'
+        yield 'iOrder=1'
+        yield 'isFixed=0'
+        yield 'doSmooth=0'
+        yield 'LineColor=1'
+        yield 'LineType=0'
+        yield 'LineWidth=1'
+        yield 'FillColor=-1'
+        yield 'SymbolTypeAtStart=-1'
+        yield 'SymbolSizeAtStart=3'
+        yield 'SymbolTypeAtEnd=-1'
+        yield 'SymbolSizeAtEnd=3'
+        yield f'nPts={data.n}'
+        yield f'nStrokePts={data.n}'
+        yield from data.odv_points
+
+    def _odv_points_lines(self, data):
+        yield '%GOB1.04 graphics objects'
+        yield ''
+        yield ':SYMBOLSET'
+        yield f'Text={self.name_en}'
+        yield 'coordinates=1'
+        yield 'clip=1'
+        yield 'iOrder=1'
+        yield 'isFixed=1'
+        yield 'addToLegends=1'
+        yield 'symbolNo=1'
+        yield 'symbolSize=2.5'
+        yield 'LineColor=1'
+        yield 'LineType=0'
+        yield 'LineWidth=-1'
+        yield 'FillColor=12'
+        yield 'BorderColor=0'
+        yield 'BorderWidth=1'
+        yield f'nPts={len(data.stations)}'
+        odv_points = data.odv_points
+        for i in data.stations:
+            yield odv_points[i]
+
+    def _odv_lines(self, data):
+        # the line and the points in one file, with one header
+        yield from self._odv_line_lines(data)
+        points = self._odv_points_lines(data)
+        next(points)
+        yield from points
+
+    def _kml_lines(self, data):
+        yield '<?xml version="1.0" encoding="UTF-8"?>'
+        yield '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2" xmlns:kml="http://www.opengis.net/kml/2.2" xmlns:atom="http://www.w3.org/2005/Atom">'
+        yield '<Document>'
+        yield f'  <name>{self.name_en}</name>'
+        yield '  <open>1</open>'
+        yield '  <description>Cruise route</description>'
+        yield '  <Style id="sn_placemark_circle">'
+        yield '    <IconStyle>'
+        yield '      <color>802e19fc</color>'
+        yield '      <scale>0.6</scale>'
+        yield '      <Icon>'
+        yield '        <href>http://maps.google.com/mapfiles/kml/shapes/placemark_circle.png</href>'
+        yield '      </Icon>'
+        yield '    </IconStyle>'
+        yield '    <LabelStyle>'
+        yield '      <color>1affffff</color>'
+        yield '      <scale>0.3</scale>'
+        yield '    </LabelStyle>'
+        yield '    <ListStyle>'
+        yield '    </ListStyle>'
+        yield '  </Style>'
+        yield '  <StyleMap id="msn_placemark_circle">'
+        yield '    <Pair>'
+        yield '      <key>normal</key>'
+        yield '      <styleUrl>#sn_placemark_circle</styleUrl>'
+        yield '    </Pair>'
+        yield '    <Pair>'
+        yield '      <key>highlight</key>'
+        yield '      <styleUrl>#sh_placemark_circle_highlight</styleUrl>'
+        yield '    </Pair>'
+        yield '  </StyleMap>'
+        yield '  <Style id="sh_placemark_circle_highlight">'
+        yield '    <IconStyle>'
+        yield '      <color>802e19fc</color>'
+        yield '      <scale>0.6</scale>'
+        yield '      <Icon>'
+        yield '        <href>http://maps.google.com/mapfiles/kml/shapes/placemark_circle_highlight.png</href>'
+        yield '      </Icon>'
+        yield '    </IconStyle>'
+        yield '    <LabelStyle>'
+        yield '      <color>1affffff</color>'
+        yield '      <scale>0.3</scale>'
+        yield '    </LabelStyle>'
+        yield '    <ListStyle>'
+        yield '    </ListStyle>'
+        yield '  </Style>'
+        yield '  <Placemark>'
+        yield '    <name>Route</name>'
+        yield '    <LineString>'
+        yield '      <tessellate>1</tessellate>'
+        yield '      <coordinates>'
+        for lon, lat in zip(data.lon5, data.lat5):
+            yield f'        {lon},{lat},0'
+        yield '      </coordinates>'
+        yield '    </LineString>'
+        yield '  </Placemark>'
+        yield '  <Folder>'
+        yield '    <name>Points</name>'
+        yield '    <open>1</open>'
+        yield '    <description>These are the observation stations</description>'
+        yield '    <LookAt>'
+        [lo1, la1, lo2, la2] = data.bbox
+        clon = (lo1 + lo2)/2
+        clat = (la1 + la2)/2
+        yield f'      <longitude>{clon:10.5f}</longitude>'
+        yield f'      <latitude>{clat:9.5}</latitude>'
+        yield '      <altitude>0</altitude>'
+        yield '      <heading>0</heading>'
+        yield '      <tilt>0</tilt>'
+        yield '      <range>500000</range>'
+        yield '    </LookAt>'
+        for i in data.named:
+            lon = f'{data.lon5[i]:>10}'
+            lat = f'{data.lat5[i]:>9}'
+            yield '    <Placemark>'
+            yield f'      <name>{data.names[i]}</name>'
+            yield '      <Snippet maxLines="0"></Snippet>'
+            yield f'      <description><![CDATA[{self.name_en}'
+            yield f'        <p>Longitude: {lon}<br>Latitude: {lat}<br>]]></description>'
+            yield '      <styleUrl>#msn_placemark_circle</styleUrl>'
+            yield '      <Point>'
+            yield f'        <coordinates>{lon},{lat},0</coordinates>'
+            yield '      </Point>'
+            yield '    </Placemark>'
+        yield '    </Folder>'
+        yield '  </Document>'
+        yield '</kml>'
+
+
+class MCXfile(_PlanSnapshot, _LazyPlan, _PlanExport):
+    header_tags = ('software', 'ship', 'departure', 'arrival', 'purpose',
+                   'description', 'descriptionFIN')
+    body_attributes = ('default_speed_knots', 'default_duration_hours',
+                       'default_observations', 'default_mapsymbol',
+                       'acquisitionInfo', 'accessPolicies', 'deviceCategories',
+                       'mkxsave', 'mapfiles')
+
+    def __init__(self, fname, lazy=False, backend=None, cache=False, cache_dir=None):
+        """ lazy      - read only the header of the file, the crew and the route
+                        are read when they are first used
+            backend   - XML backend, 'stdlib' or None, 'lxml' or 'auto' for
+                        lxml when it is installed (see xml_backend)
+            fname can also be the content of a plan as bytes or a file object,
+            then fname is the name of the file object or ''
+            cache     - load the plan from a snapshot of an earlier read of the
+                        same unchanged file, or make one
+            cache_dir - directory of the snapshots, default_snapshot_dir() if None
+        """
+        self.fname, self._data = _plan_source(fname)
+        self.xml = xb.get_backend(backend)
         self.name = ''
         self.organiser = ''
         self.nro = 0
@@ -734,7 +1985,7 @@ class MCXfile:
         self.project = ''
         self.ctd_name = ''
         self.scientific_crew = []
-        self.route = []
+        self.route = RouteTable()
         self.language = ''
         self.software_version = ''
         self.master = ''
@@ -755,18 +2006,23 @@ class MCXfile:
         self.deviceCategories = ''
         self.mapfiles = []
 
-        my_file = Path(fname)
-        if my_file.is_file():
-            self.read()
+        if self._data is not None or Path(self.fname).is_file():
+            self._read_plan(lazy, cache and self._data is None, cache_dir)
             self.OK = True
         else:
             self.OK = False
-            print('\nNOTE! File '+fname+' not found!')
+            print('\nNOTE! File '+self.fname+' not found!')
 
     def read(self):
         # read the mcx-file into mcx-object
-        cruise = ET.parse(self.fname).getroot()
-
+        with self._open_plan() as f:
+            cruise = self.xml.parse(f)
+        self._read_header(cruise)
+        self._body_loaded = True
+        self._read_body(cruise)
+
+    def _read_header(self, cruise):
+        # cruise attributes, ship, departure, arrival and descriptions
         cruise_attributes = cruise.attrib
         self.organiser = cruise_attributes['organiser']
         self.name = cruise_attributes['name']
@@ -815,6 +2071,10 @@ class MCXfile:
         self.letterid = ''
         self.ctd_name = ''
 
+        if self.name_en == '':
+            self.name_en = self.name_fi
+
+    def _read_body(self, cruise):
         # get scientific crew
         self.scientific_crew = []
         staff = cruise.find("staff")
@@ -854,59 +2114,15 @@ class MCXfile:
             if ocode.find('obscode') is not None:
                 self.default_observations = ocode.find('obscode').text
 
-        self.default_mapsymbol = defaults.find('mapsymbol').attrib
+        self.default_mapsymbol = dict(defaults.find('mapsymbol').attrib)
 
         # Get routepoints
         stations = croute.find("points")
-        for station in stations.findall("point"):
-            la = station.find('lat').text.split('D')
-            lat = float(la[0]) + float(la[1].split('M')[0])/60
-            lo = station.find('lon').text.split('D')
-            lon = float(lo[0]) + float(lo[1].split('M')[0])/60
-
-            rpoint = Routepoint(station.find('name').text, lat, lon)
-
-            rpoint.nro = station.attrib['nro']
-            rpoint.type = station.attrib['type']
-            rpoint.status = station.attrib['status']
-            rpoint.index = station.attrib['index']
-
-            rpoint.depth = float(station.find('depth').text)
-            rpoint.distance = float(station.find('distance').text)
-            rpoint.entry = station.find('entry').attrib['dateTime']
-            rpoint.entry_status = station.find('entry').attrib['status']
-            dur = station.find('duration').text
-            if dur:
-                rpoint.duration = hours_from_mcx_duration_format(dur)
-            rpoint.exit = station.find('exit').attrib['dateTime']
-            rpoint.exit_status = station.find('exit').attrib['status']
-            rpoint.speed = float(station.find('speed').text)
-            rpoint.speed_status = station.find('speed').attrib['status']
-
-            if station.find('observations') is not None:
-                ocode = station.find('observations')
-                if ocode.find('obscode') is not None:
-                    rpoint.observations = ocode.find('obscode').text
-
-            if station.find('SDN_P02_parameters') is not None:
-                rpoint.SDN_P02_parameters = station.find(
-                    'SDN_P02_parameters').text
-
-            if station.find('SDN_C77_data') is not None:
-                rpoint.SDN_C77_data = station.find('SDN_C77_data').text
-
-            if station.find('Country'):
-                rpoint.country = station.find('Country').text
-            if station.find('SeaArea'):
-                rpoint.sea_area = station.find('SeaArea').text
-            rpoint.mooring = child_node_text(station, 'isMooring')
-            rpoint.mapsymbol = station.find('mapsymbol').attrib
-            rpoint.comments = child_node_text(station, 'comments')
-
-            self.route.append(rpoint)
+        points = [parse_mcx_point(station) for station in stations.findall("point")]
+        self.route.extend(points)
 
         acinfo = cruise.find('acquisitionInfo')
-        if acinfo:
+        if acinfo is not None and len(acinfo):
             for o in acinfo.findall("objective"):
                 obj = ObjectiveInfo(o.attrib['param'], o.attrib['organisationCode'], o.attrib['person'], o.attrib['paramName'])
                 self.acquisitionInfo.append(obj)
@@ -928,9 +2144,6 @@ class MCXfile:
             if mf is not None:
                 self.mapfiles.append(mf.text)
 
-        if self.name_en == '':
-            self.name_en = self.name_fi
-
     def save(self, **kwargs):
         # Saves the cruise into a mcx-file
         # optionally a new name can be given to the file
@@ -1046,7 +2259,7 @@ class MCXfile:
             ok_to_save = True
 
         if ok_to_save:
-            xmlstr = minidom.parseString(ET.tostring(ncruise, 'utf-8')).toprettyxml(indent="   ")
+            xmlstr = self.xml.to_pretty_xml(ncruise)
             with open(new_file, "w") as f:
                 f.write(xmlstr)
 
@@ -1077,13 +2290,13 @@ class MCXfile:
         return result
 
     def get_lat(self):
-        return [station.lat for station in self.route]
+        return self.route.values('lat')
 
     def get_lon(self):
-        return [station.lon for station in self.route]
+        return self.route.values('lon')
     
     def get_lonlat(self):
-        return [[station.lon, station.lat] for station in self.route]
+        return [[lon, lat] for lon, lat in zip(self.get_lon(), self.get_lat())]
 
     def get_boundingbox(self):
         result = [180.0, 90, -180.0, -90.0]
@@ -1118,15 +2331,9 @@ class MCXfile:
         result.append('')
         result.append('Nro Station          arrival to            distance from start')
         result.append(' ')
-        d = 0
-        apoint = self.get_coordinates(self.route[0])
-        i = 0
-        result.append(f"{i:3d} {self.route[i].name:16} {self.route[i].entry[:10]} {self.route[i].entry[11:]} {d:7.2f} nmi")
-        for i in range(1, len(self.route)):
-            bpoint = self.get_coordinates(self.route[i])
-            d = d + sarea.gcDistance_nmi(apoint, bpoint)
-            apoint = bpoint 
-            result.append(f"{i:3d} {self.route[i].name:16} {self.route[i].entry[:10]} {self.route[i].entry[11:]} {d:7.2f} nmi")
+        d = sarea.route_distances_nmi(self.get_lon(), self.get_lat())
+        for i, station in enumerate(self.route):
+            result.append(f"{i:3d} {station.name:16} {station.entry[:10]} {station.entry[11:]} {d[i]:7.2f} nmi")
         return result
 
     def get_distance_and_duration_to(self):
@@ -1135,14 +2342,11 @@ class MCXfile:
         result.append('Nro Station          arrival to           distance to                  duration to')
         result.append(' ')
         start = datetime.fromisoformat(self.route[0].entry)
-        d = 0
-        apoint = self.get_coordinates(self.route[0])
+        distances = sarea.route_distances_nmi(self.get_lon(), self.get_lat())
         i = 0
         result.append(f"{i:3d} {self.route[i].name:16} {self.route[i].entry[:10]} {self.route[i].entry[11:]}")
         for i in range(1, len(self.route)):
-            bpoint = self.get_coordinates(self.route[i])
-            d = d + sarea.gcDistance_nmi(apoint, bpoint)
-            apoint = bpoint 
+            d = distances[i]
             dur = (datetime.fromisoformat(self.route[i].entry) - start).total_seconds()
             dh = math.floor(dur/3600)
             dm = math.floor((dur - dh*3600)/60)
@@ -1160,377 +2364,52 @@ class MCXfile:
         return result
 
 
-    def leaflethtml(self):
+    def leaflethtml(self, out=None):
         # =====================
-        [lo1, la1, lo2, la2] = self.get_boundingbox()
-        llhtml = mcx_html_tmpl.copy()
-        for I in range(len(llhtml)):
-            if '<title>' in llhtml[I]:
-                llhtml[I] = f'    <title>Routemap of {self.name_en}</title>'
-
-            if 'var map = L.map' in llhtml[I]:
-                llhtml[I] = f"      var map = L.map('map', {{center:["\
-                    f'{((la1+la2)/2):10.6f}, {((lo1+lo2)/2):11.6f}],'\
-                    f' zoom: 5}});'
-
-            if 'Cruise route of' in llhtml[I]:
-                llhtml[I] = '        this._div.innerHTML = \'<h4 style="color: #0000CC;">Cruise route of' \
-                    + ' the ' \
-                    + self.platform_name \
-                    + ' cruise ' \
-                    + self.nro \
-                    + '/' \
-                    + str(self.year) \
-                    + '</h4>' \
-                    + self.name_en \
-                    + '<br>' \
-                    + self.departure_time.split('T')[0] \
-                    + ' - ' \
-                    + self.arrival_time.split('T')[0] \
-                    + '\';'
-            if '//pisteet ja reitti' in llhtml[I]:
-                I1 = I
-                I2 = I+1
-
-        olist = []
-
-        for I in range(0, I1):
-            olist.append(llhtml[I])
-
-        olist.append('')
-        olist.append('      var stationPoints = L.layerGroup();')
-        olist.append('')
-
-        for I in range(len(self.route)):
-            if self.route[I].name == 'P':
-                continue
-            nameandtime = f"{I}: {self.route[I].name}, {self.route[I].entry}, "\
-                f"{self.route[I].distance:5.1f} nmi, index={self.route[I].index}"
-
-            if self.route[I].country == 'Finland':
-                pColor = 'green'
-            else:
-                pColor = 'red'
-
-            r = '      L.circle('\
-                f"[{self.route[I].lat:9.6f}, {self.route[I].lon:11.6f}], "\
-                f"500, {{color: '{pColor}',fillColor: '{pColor}',"\
-                f"fillOpacity: 0.5"\
-                f'}}).addTo(stationPoints).bindTooltip("{nameandtime}");'
-            olist.append(r)
-
-        olist.append(' ')
-        olist.append('      var routeLine = L.layerGroup();')
-        olist.append('      var antLine   = L.layerGroup();')
-        olist.append('')
-
-        rLine = '      route = ['
-        for I in range(len(self.route)-1):
-            rLine = rLine + \
-                f'[{self.route[I].lat:9.5f}, {self.route[I].lon:10.5f}], '
-        rLine = rLine + \
-            f'[{self.route[-1].lat:9.5f}, {self.route[-1].lon:10.5f}]]'
-
-        olist.append(rLine)
-        olist.append(
-            '      L.polyline(route, {color: \'blue\', weight: 1}).addTo(routeLine);')
-        olist.append(' ')
-        olist.append('      antroute = L.polyline.antPath(route, {')
-        olist.append('          "delay": 1000,')
-        olist.append('          "dashArray": [10,10],')
-        olist.append('          "weight": 3,')
-        olist.append('          "color": "#0000FF",')
-        olist.append('          "pulseColor": "#FFFFFF",')
-        olist.append('          "paused": false ,')
-        olist.append('          "reverse": false ,')
-        olist.append('          "hardwareAccelerated": true')
-        olist.append('      }).addTo(antLine)')
-        olist.append(' ')
-
-        for I in range(I2, len(llhtml)):
-            olist.append(llhtml[I])
-
-        o_name = f"{self.fname.split('.')[0]}.html"
-        o_file = open(o_name, 'w')
-        for i in range(len(olist)):
-            o_file.write(olist[i] + '\n')
-        o_file.close()
-        print(f'Valmis! Matkasta {self.fname} Tulostettu tiedosto {o_name}')
-        return
-
-    def to_gmtscript(self, **kwargs):
-        topodir = kwargs.get('topodir', False)
-        stationnames = kwargs.get('station_names', False)
-        routeline = kwargs.get('line', True)
-        o_name = f"{self.fname.split('.')[0]}_gmt.txt"
-        [lo1, la1, lo2, la2] = self.get_boundingbox()
-        reg = [float(math.trunc(lo1-1)), float(math.trunc(lo2+2)), float(math.trunc(la1)), float(math.trunc(la2+1))]
-        olist = []
-        olist.append('import pygmt')
-        olist.append(' ')
-        olist.append('fig = pygmt.Figure()')
-        olist.append(' ')
-        olist.append('# mapregion [minlon, maxlon, minlat, maxlat]')
-        olist.append(f'fig.basemap(region=[{reg[0]:.{7}}, {reg[1]:.{7}}, {reg[2]:.{7}}, {reg[3]:.{7}}], projection="M8i", frame=True)')
-        if topodir:
-            topodat = f'{topodir}Baltic_Sea_topo.nc'
-            topoclr = f'{topodir}Baltic_Sea_topo.cpt' 
-            olist.append('# plot bottom topography')
-            olist.append(f'fig.grdimage("{topodat}", cmap="{topoclr}")')
-            olist.append('# plot land')
-            olist.append('fig.coast(land="darkgreen")')
-            penclr = 'black'
-        else:
-            olist.append('# plot land')
-            olist.append('fig.coast(land="darkgreen", water="navy")')
-            penclr = 'white'
-
-        xs = ', '.join([f'{p.lon:.{7}}' for p in self.route])
-        ys = ', '.join([f'{p.lat:.{7}}' for p in self.route])
-        s = f'fig.plot(x=[{xs}], y=[{ys}]'
-        if routeline:
-            olist.append('# plot routeline ')
-            olist.append(s + f', pen="1,{penclr}")')
-        olist.append('# plot station marks')
-        olist.append(s + ', pen="3,red", S="c0.1")')
-        # Plot cruise name
-        namestr = f'Cruise {self.name}, {self.departure_time.split("T")[0]} - {self.arrival_time.split("T")[0]}'
-        olist.append('# plot title ')
-        olist.append(f'fig.text(text="{namestr}", x={reg[0]+(reg[1]-reg[0])/25}, y={reg[3]-(reg[3]-reg[2])/25}, justify="LM", font="16p,Helvetica-Bold,{penclr}")')
-        olist.append(' ')
-        if stationnames:
-            for p in self.route:
-                olist.append(f'fig.text(text=["{p.name}"], x=[{p.lon}], y=[{p.lat}], font="6p,Helvetica-Bold,navy", justify="LM", offset="0.15/0", fill="white")')
-
-        olist.append('fig.show()')
-
-        ofile = open(o_name, 'w')
-        for r in olist:
-            ofile.write(r+'\n')
-        ofile.close()
-
-    def to_ODV_GOBline(self):
-        olist = []
-        olist.append('%GOB1.04 graphics objects')
-        olist.append('')
-        olist.append(':POLYLINE')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=0')
-        olist.append('doSmooth=0')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=1')
-        olist.append('FillColor=-1')
-        olist.append('SymbolTypeAtStart=-1')
-        olist.append('SymbolSizeAtStart=3')
-        olist.append('SymbolTypeAtEnd=-1')
-        olist.append('SymbolSizeAtEnd=3')
-        olist.append(f'nPts={len(self.route)}')
-        olist.append(f'nStrokePts={len(self.route)}')
-        for p in self.route:
-            olist.append('{:10.5f}'.format(p.lon).strip() + ' ' + '{:9.5f}'.format(p.lat).strip())
-
-        ofile = open(f"{self.fname.split('.')[0]}_ODV_line.gob", 'w')
-        for r in olist:
-            ofile.write(r + '\n')
-        ofile.close()
-
-    def to_ODV_GOBsymbols(self):
-        stations = [str(p.lon) + ' ' + str(p.lat) for p in self.route if p.type == 's']
-        olist = []
-        olist.append('%GOB1.04 graphics objects')
-        olist.append('')
-        olist.append(':SYMBOLSET')
-        olist.append(f'Text={self.name_en}')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=1')
-        olist.append('addToLegends=1')
-        olist.append('symbolNo=1')
-        olist.append('symbolSize=2.5')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=-1')
-        olist.append('FillColor=12')
-        olist.append('BorderColor=0')
-        olist.append('BorderWidth=1')
-        olist.append(f'nPts={len(stations)}')
-
-        for p in self.route:
-            if p.type == 's':
-                olist.append('{:10.5f}'.format(p.lon).strip() + ' ' + '{:9.5f}'.format(p.lat).strip())
-
-        ofile = open(self.fname.split('.')[0]+'_ODV_points.gob', 'w')
-        for r in olist:
-            ofile.write(r+'\n')
-        ofile.close()
-
-    def to_ODV_gob(self):
-        olist = []
-        olist.append('%GOB1.04 graphics objects')
-        olist.append('')
-        olist.append(':POLYLINE')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=0')
-        olist.append('doSmooth=0')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=1')
-        olist.append('FillColor=-1')
-        olist.append('SymbolTypeAtStart=-1')
-        olist.append('SymbolSizeAtStart=3')
-        olist.append('SymbolTypeAtEnd=-1')
-        olist.append('SymbolSizeAtEnd=3')
-        olist.append(f'nPts={len(self.route)}')
-        olist.append(f'nStrokePts={len(self.route)}')
-        for p in self.route:
-            olist.append(f'{p.lon:.5f} {p.lat:.5f}')
-
-        stations = [str(p.lon) + ' ' + str(p.lat) for p in self.route if p.type == 's']
-        olist.append('')
-        olist.append(':SYMBOLSET')
-        olist.append(f'Text={self.name_en}')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=1')
-        olist.append('addToLegends=1')
-        olist.append('symbolNo=1')
-        olist.append('symbolSize=2.5')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=-1')
-        olist.append('FillColor=12')
-        olist.append('BorderColor=0')
-        olist.append('BorderWidth=1')
-        olist.append(f'nPts={len(stations)}')
-
-        for p in self.route:
-            if p.type == 's':
-                olist.append(f'{p.lon:.5f} {p.lat:.5f}')
-
-        ofile = open(f"{self.fname.split('.')[0]}_ODV.gob", 'w')
-        for r in olist:
-            ofile.write(r + '\n')
-        ofile.close()
+        result = self._export_to('L', out)
+        if out is None:
+            print(f'Valmis! Matkasta {self.fname} Tulostettu tiedosto {result}')
+        return result
 
-    def to_KML(self):
-        olist = []
-        olist.append('<?xml version="1.0" encoding="UTF-8"?>')
-        olist.append('<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2" xmlns:kml="http://www.opengis.net/kml/2.2" xmlns:atom="http://www.w3.org/2005/Atom">')
-        olist.append('<Document>')
-        olist.append(f'  <name>{self.name_en}</name>')
-        olist.append('  <open>1</open>')
-        olist.append('  <description>Cruise route</description>')
-        olist.append('  <Style id="sn_placemark_circle">')
-        olist.append('    <IconStyle>')
-        olist.append('      <color>802e19fc</color>')
-        olist.append('      <scale>0.6</scale>')
-        olist.append('      <Icon>')
-        olist.append('        <href>http://maps.google.com/mapfiles/kml/shapes/placemark_circle.png</href>')
-        olist.append('      </Icon>')
-        olist.append('    </IconStyle>')
-        olist.append('    <LabelStyle>')
-        olist.append('      <color>1affffff</color>')
-        olist.append('      <scale>0.3</scale>')
-        olist.append('    </LabelStyle>')
-        olist.append('    <ListStyle>')
-        olist.append('    </ListStyle>')
-        olist.append('  </Style>')
-        olist.append('  <StyleMap id="msn_placemark_circle">')
-        olist.append('    <Pair>')
-        olist.append('      <key>normal</key>')
-        olist.append('      <styleUrl>#sn_placemark_circle</styleUrl>')
-        olist.append('    </Pair>')
-        olist.append('    <Pair>')
-        olist.append('      <key>highlight</key>')
-        olist.append('      <styleUrl>#sh_placemark_circle_highlight</styleUrl>')
-        olist.append('    </Pair>')
-        olist.append('  </StyleMap>')
-        olist.append('  <Style id="sh_placemark_circle_highlight">')
-        olist.append('    <IconStyle>')
-        olist.append('      <color>802e19fc</color>')
-        olist.append('      <scale>0.6</scale>')
-        olist.append('      <Icon>')
-        olist.append('        <href>http://maps.google.com/mapfiles/kml/shapes/placemark_circle_highlight.png</href>')
-        olist.append('      </Icon>')
-        olist.append('    </IconStyle>')
-        olist.append('    <LabelStyle>')
-        olist.append('      <color>1affffff</color>')
-        olist.append('      <scale>0.3</scale>')
-        olist.append('    </LabelStyle>')
-        olist.append('    <ListStyle>')
-        olist.append('    </ListStyle>')
-        olist.append('  </Style>')
-        olist.append('  <Placemark>')
-        olist.append('    <name>Route</name>')
-        olist.append('    <LineString>')
-        olist.append('      <tessellate>1</tessellate>')
-        olist.append('      <coordinates>')
-        for p in self.route:
-            olist.append(f'        {p.lon:.5f},{p.lat:.5f},0')
-        olist.append('      </coordinates>')
-        olist.append('    </LineString>')
-        olist.append('  </Placemark>')
-        olist.append('  <Folder>')
-        olist.append('    <name>Points</name>')
-        olist.append('    <open>1</open>')
-        olist.append('    <description>These are the observation stations</description>')
-        olist.append('    <LookAt>')
-        lons = [p.lon for p in self.route]
-        lats = [p.lat for p in self.route]
-        clon = (min(lons) + max(lons))/2
-        clat = (min(lats) + max(lats))/2
-        olist.append(f'      <longitude>{clon:10.5f}</longitude>')
-        olist.append(f'      <latitude>{clat:9.5}</latitude>')
-        olist.append('      <altitude>0</altitude>')
-        olist.append('      <heading>0</heading>')
-        olist.append('      <tilt>0</tilt>')
-        olist.append('      <range>500000</range>')
-        olist.append('    </LookAt>')
-        for p in self.route:
-            if p.name != 'P':
-                olist.append('    <Placemark>')
-                olist.append(f'      <name>{p.name}</name>')
-                olist.append('      <Snippet maxLines="0"></Snippet>')
-                olist.append(f'      <description><![CDATA[{self.name_en}')
-                olist.append(f'        <p>Longitude: {p.lon:10.5f}<br>Latitude: {p.lat:9.5f}<br>]]></description>')
-                olist.append('      <styleUrl>#msn_placemark_circle</styleUrl>')
-                olist.append('      <Point>')
-                olist.append(f'        <coordinates>{p.lon:10.5f},{p.lat:9.5f},0</coordinates>')
-                olist.append('      </Point>')
-                olist.append('    </Placemark>')
-        olist.append('    </Folder>')
-        olist.append('  </Document>')
-        olist.append('</kml>')
-
-        ofile = open(f"{self.fname.split('.')[0]}.kml", 'w')
-        for r in olist:
-            ofile.write(r + '\n')
-        ofile.close()
-
-    def to_python_list(self):
+    def to_python_list(self, out=None):
+        # out as in the exporters of _PlanExport
         olist = []
         for p in self.route:
             if p.name != 'P': 
                 olist.append(f'[{p.lon:10.5f}, {p.lat:9.5f}, {p.name}]')
 
-        ofile = open(f"{self.fname.split('.')[0]}_python_list.txt", 'w')
-        ofile.write('[')
-        for r in olist[:-2]:
-            ofile.write(r + ',\n')
-        ofile.write(f'{olist[-1]}]')
-        ofile.close()
-
-class MKXfile:
-
-    def __init__(self, fname):
-        self.fname = fname
+        def texts():
+            yield '['
+            for r in olist[:-2]:
+                yield r + ',\n'
+            yield f'{olist[-1]}]'
+
+        if out is None:
+            out = f"{_output_base(self.fname)}_python_list.txt"
+        return write_output(texts(), out)
+
+class MKXfile(_PlanSnapshot, _LazyPlan, _PlanExport):
+    leaflet_route_separator = ','
+    leaflet_tooltip_index = False
+    header_tags = ('software', 'ship', 'departure', 'arrival',
+                   'description', 'descriptionFIN')
+    body_attributes = ('default_speed_knots', 'default_duration_hours',
+                       'default_observations', 'default_mapsymbol',
+                       'acquisitionInfo', 'accessPolicies', 'mkxsave', 'mapfiles')
+
+    def __init__(self, fname, lazy=False, backend=None, cache=False, cache_dir=None):
+        """ lazy      - read only the header of the file, the crew and the route
+                        are read when they are first used
+            backend   - XML backend, 'stdlib' or None, 'lxml' or 'auto' for
+                        lxml when it is installed (see xml_backend)
+            fname can also be the content of a plan as bytes or a file object,
+            then fname is the name of the file object or ''
+            cache     - load the plan from a snapshot of an earlier read of the
+                        same unchanged file, or make one
+            cache_dir - directory of the snapshots, default_snapshot_dir() if None
+        """
+        self.fname, self._data = _plan_source(fname)
+        self.xml = xb.get_backend(backend)
         self.name = ''
         self.organiser = ''
         self.nro = 0
@@ -1546,7 +2425,7 @@ class MKXfile:
         self.project = ''
         self.ctd_name = ''
         self.scientific_crew = []
-        self.route = []
+        self.route = RouteTable()
         self.language = ''
         self.software_version = ''
         self.master = ''
@@ -1563,17 +2442,22 @@ class MKXfile:
         self.arrival_port = ''
         self.header_errors = []
 
-        my_file = Path(fname)
-        if my_file.is_file():
-            self.read()
+        if self._data is not None or Path(self.fname).is_file():
+            self._read_plan(lazy, cache and self._data is None, cache_dir)
             self.OK = True
         else:
             self.OK = False
 
     def read(self):
         # read the mcx-file into mcx-object
-        cruise = ET.parse(self.fname).getroot()
-
+        with self._open_plan() as f:
+            cruise = self.xml.parse(f)
+        self._read_header(cruise)
+        self._body_loaded = True
+        self._read_body(cruise)
+
+    def _read_header(self, cruise):
+        # cruise attributes, ship, departure, arrival and descriptions
         cruise_attributes = cruise.attrib
         self.organiser = cruise_attributes['organiser']
         self.name_fi = cruise_attributes['name']
@@ -1620,6 +2504,10 @@ class MKXfile:
         self.letterid = ''
         self.ctd_name = ''
 
+        if self.name_en == '':
+            self.name_en = self.name_fi
+
+    def _read_body(self, cruise):
         # get scientific crew
         self.scientific_crew = []
         staff = cruise.find("staff")
@@ -1667,10 +2555,11 @@ class MKXfile:
             if ocode.find('obscode') is not None:
                 self.default_observations = ocode.find('obscode').text
 
-        self.default_mapsymbol = defaults.find('mapsymbol').attrib
+        self.default_mapsymbol = dict(defaults.find('mapsymbol').attrib)
 
         # Get routepoints
         stations = croute.find("points")
+        points = []
         for station in stations.findall("point"):
             la = station.find('lat').text.split('D')
             lat = float(la[0])+float(la[1].split('M')[0])/60
@@ -1714,11 +2603,12 @@ class MKXfile:
             if child_node_text(station, 'isMooring') is not None:
                 rpoint.mooring = child_node_text(station, 'isMooring')
             if station.find('mapsymbol') is not None:
-                rpoint.mapsymbol = station.find('mapsymbol').attrib
+                rpoint.mapsymbol = dict(station.find('mapsymbol').attrib)
             if child_node_text(station, 'comments') is not None:
                 rpoint.comments = child_node_text(station, 'comments')
 
-            self.route.append(rpoint)
+            points.append(rpoint)
+        self.route.extend(points)
 
         if cruise.find('acquisitionInfo') is not None:
             # jotain
@@ -1740,9 +2630,6 @@ class MKXfile:
             if mf is not None:
                 self.mapfiles.append(mf.text)
 
-        if self.name_en == '':
-            self.name_en = self.name_fi
-
     def get_persons_in_role(self, a_role):
         result = []
         for person in self.scientific_crew:
@@ -1770,10 +2657,7 @@ class MKXfile:
         return result
 
     def get_lat(self):
-        lat = []
-        for station in self.route:
-            lat.append(station.lat)
-        return lat
+        return self.route.values('lat')
 
     def get_boundingbox(self):
         result = [180.0, 90, -180.0, -90.0]
@@ -1785,348 +2669,8 @@ class MKXfile:
         result = [min(lon), min(lat), max(lon), max(lat)]
         return result
 
-    def leaflethtml(self):
-        #   Prints the leaflet html into a file
-        [lo1, la1, lo2, la2] = self.get_boundingbox()
-        llhtml = mcx_html_tmpl.copy()
-        for I in range(len(llhtml)):
-            if '<title>' in llhtml[I]:
-                llhtml[I] = f'    <title>Routemap of {self.name_en}</title>'
-
-            if 'var map = L.map' in llhtml[I]:
-                llhtml[I] = '      var map = L.map(\'map\', {center:[' \
-                    f'{((la1+la2)/2):10.6f}, {((lo1+lo2)/2):11.6f}], '\
-                    f'zoom: 5}});'
-
-            if 'Cruise route of' in llhtml[I]:
-                llhtml[I] = '        this._div.innerHTML = \'<h4 style="color: #0000CC;">Cruise route of' \
-                    + ' the ' \
-                    + self.platform_name \
-                    + ' cruise ' \
-                    + self.nro \
-                    + '/' \
-                    + str(self.year) \
-                    + '</h4>' \
-                    + self.name_en \
-                    + '<br>' \
-                    + self.departure_time.split('T')[0] \
-                    + ' - ' \
-                    + self.arrival_time.split('T')[0] \
-                    + '\';'
-            if '//pisteet ja reitti' in llhtml[I]:
-                I1 = I
-                I2 = I+1
-
-        olist = []
-
-        for I in range(0, I1):
-            olist.append(llhtml[I])
-
-        olist.append('')
-        olist.append('      var stationPoints = L.layerGroup();')
-        olist.append('')
+    def _point_countries(self, data):
+        return sarea.classify_points(data.lons, data.lats, 'economiczones', 'name', '').tolist()
 
-        for I in range(len(self.route)):
-            if self.route[I].name == 'P':
-                continue
-            nameandtime = f'{I}: {self.route[I].name}, {self.route[I].entry}'\
-                f', {self.route[I].distance:5.1f} nmi'
-
-            country = sarea.whosEconomicZone(
-                [self.route[I].lon, self.route[I].lat])
-            if country == 'Finland':
-                pColor = 'green'
-            else:
-                pColor = 'red'
-
-            r = '      L.circle(['\
-                f'{self.route[I].lat:9.6f}, {self.route[I].lon:11.6f}], 500,'\
-                f" {{color: '{pColor}',fillColor: '{pColor}',"\
-                f"fillOpacity: 0.5"\
-                f'}}).addTo(stationPoints).bindTooltip("{nameandtime}");'
-            olist.append(r)
-
-        olist.append(' ')
-        olist.append('      var routeLine = L.layerGroup();')
-        olist.append('      var antLine   = L.layerGroup();')
-        olist.append('')
-
-        rLine = '      route = ['
-        for I in range(len(self.route)-1):
-            rLine = rLine +\
-                f'[{self.route[I].lat:9.5f}, {self.route[I].lon:10.5f}],'
-        rLine = rLine +\
-            f'[{self.route[-1].lat:9.5f}, {self.route[-1].lon:10.5f}]]'
-
-        olist.append(rLine)
-        olist.append(
-            '      L.polyline(route, {color: \'blue\', weight: 1}).' +
-            'addTo(routeLine);')
-        olist.append(' ')
-        olist.append('      antroute = L.polyline.antPath(route, {')
-        olist.append('          "delay": 1000,')
-        olist.append('          "dashArray": [10,10],')
-        olist.append('          "weight": 3,')
-        olist.append('          "color": "#0000FF",')
-        olist.append('          "pulseColor": "#FFFFFF",')
-        olist.append('          "paused": false ,')
-        olist.append('          "reverse": false ,')
-        olist.append('          "hardwareAccelerated": true')
-        olist.append('      }).addTo(antLine)')
-        olist.append(' ')
-
-        for I in range(I2, len(llhtml)):
-            olist.append(llhtml[I])
-
-        o_file = open(f"{self.fname.split('.')[0]}.html", 'w')
-        for i in range(len(olist)):
-            o_file.write(olist[i] + '\n')
-        o_file.close()
-
-    def to_gmtscript(self,topodir=None):
-        o_name = f"{self.fname.split('.')[0]}_gmt.txt"
-        [lo1, la1, lo2, la2] = self.get_boundingbox()
-        reg = [float(math.trunc(lo1-1)),float(math.trunc(lo2+2)), float(math.trunc(la1)), float(math.trunc(la2+1))]
-        olist = []
-        olist.append('import pygmt')
-        olist.append(' ')
-        olist.append('fig = pygmt.Figure()')
-        olist.append(' ')
-        olist.append('# mapregion [minlon, maxlon, minlat, maxlat]')
-        olist.append(f'fig.basemap(region=[{reg[0]:.{7}}, {reg[1]:.{7}}, {reg[2]:.{7}}, {reg[3]:.{7}}], projection="M8i", frame=True)')
-        if topodir:
-            topodat = f'{topodir}Baltic_Sea_topo.nc'
-            topoclr = f'{topodir}Baltic_Sea_topo.cpt' 
-            olist.append('# plot bottom topography')
-            olist.append(f'fig.grdimage("{topodat}", cmap="{topoclr}")')
-            olist.append('# plot land')
-            olist.append('fig.coast(land="darkgreen")')
-            penclr = 'black'
-        else:
-            olist.append('# plot land')
-            olist.append('fig.coast(land="darkgreen", water="navy")')
-            penclr = 'white'
-
-        xs = ', '.join([f'{p.lon:.{7}}' for p in self.route])
-        ys = ', '.join([f'{p.lat:.{7}}' for p in self.route])
-        s ='fig.plot(x=[' + xs + '], y=[' + ys + ']'
-        olist.append('# plot routeline ')
-        olist.append(s + f', pen="1,{penclr}")')
-        olist.append('# plot station marks')
-        olist.append(s + ', pen="3,red", S="c0.1")')
-        # Plot cruise name
-        namestr = f'Cruise {self.name}, {self.departure_time.split("T")[0]} - {self.arrival_time.split("T")[0]}'
-        olist.append('# plot title ')
-        olist.append(f'fig.text(text="{namestr}", x={reg[0]+(reg[1]-reg[0])/25}, y={reg[3]-(reg[3]-reg[2])/25}, justify="LM", font="16p,Helvetica-Bold,{penclr}")')
-        olist.append(' ')
-        olist.append('fig.show()')
-
-        ofile = open(o_name, 'w')
-        for r in olist:
-            ofile.write(r+'\n')
-        ofile.close()
-
-    def to_ODV_GOBline(self):
-        olist = []
-        olist.append('%GOB1.04 graphics objects')
-        olist.append('')
-        olist.append(':POLYLINE')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=0')
-        olist.append('doSmooth=0')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=1')
-        olist.append('FillColor=-1')
-        olist.append('SymbolTypeAtStart=-1')
-        olist.append('SymbolSizeAtStart=3')
-        olist.append('SymbolTypeAtEnd=-1')
-        olist.append('SymbolSizeAtEnd=3')
-        olist.append(f'nPts={len(self.route)}')
-        olist.append(f'nStrokePts={len(self.route)}')
-        for p in self.route:
-            olist.append(f'{p.lon:.5f} {p.lat:.5f}')
-
-        ofile = open(f"{self.fname.split('.')[0]}_ODV_line.gob", 'w')
-        for r in olist:
-            ofile.write(r+'\n')
-        ofile.close()
-
-    def to_ODV_GOBsymbols(self):
-        stations = [f"{p.lon} {p.lat}" for p in self.route if p.type == 's']
-        olist = []
-        olist.append('%GOB1.04 graphics objects')
-        olist.append('')
-        olist.append(':SYMBOLSET')
-        olist.append(f'Text={self.name_en}')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=1')
-        olist.append('addToLegends=1')
-        olist.append('symbolNo=1')
-        olist.append('symbolSize=2.5')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=-1')
-        olist.append('FillColor=12')
-        olist.append('BorderColor=0')
-        olist.append('BorderWidth=1')
-        olist.append(f'nPts={len(stations)}')
-
-        for p in self.route:
-            if p.type == 's':
-                olist.append(f'{p.lon:.5f} {p.lat:.5f}')
-
-        ofile = open(f"{self.fname.split('.')[0]}_ODV_points.gob", 'w')
-        for r in olist:
-            ofile.write(r + '\n')
-        ofile.close()
-
-    def to_ODV_gob(self):
-        olist = []
-        olist.append('%GOB1.04 graphics objects')
-        olist.append('')
-        olist.append(':POLYLINE')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=0')
-        olist.append('doSmooth=0')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=1')
-        olist.append('FillColor=-1')
-        olist.append('SymbolTypeAtStart=-1')
-        olist.append('SymbolSizeAtStart=3')
-        olist.append('SymbolTypeAtEnd=-1')
-        olist.append('SymbolSizeAtEnd=3')
-        olist.append(f'nPts={len(self.route)}')
-        olist.append(f'nStrokePts={len(self.route)}')
-        for p in self.route:
-            olist.append(f'{p.lon:.5f} {p.lat:.5f}')
-
-        stations = [f'{p.lon} {p.lat}' for p in self.route if p.type == 's']
-        olist.append('')
-        olist.append(':SYMBOLSET')
-        olist.append(f'Text={self.name_en}')
-        olist.append('coordinates=1')
-        olist.append('clip=1')
-        olist.append('iOrder=1')
-        olist.append('isFixed=1')
-        olist.append('addToLegends=1')
-        olist.append('symbolNo=1')
-        olist.append('symbolSize=2.5')
-        olist.append('LineColor=1')
-        olist.append('LineType=0')
-        olist.append('LineWidth=-1')
-        olist.append('FillColor=12')
-        olist.append('BorderColor=0')
-        olist.append('BorderWidth=1')
-        olist.append(f'nPts={len(stations)}')
-
-        for p in self.route:
-            if p.type == 's':
-                olist.append(f'{p.lon:.5f} {p.lat:.5f}')
-
-        ofile = open(f"{self.fname.split('.')[0]}_ODV.gob", 'w')
-        for r in olist:
-            ofile.write(r + '\n')
-        ofile.close()
-
-    def to_KML(self):
-        olist = []
-        olist.append('<?xml version="1.0" encoding="UTF-8"?>')
-        olist.append('<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2" xmlns:kml="http://www.opengis.net/kml/2.2" xmlns:atom="http://www.w3.org/2005/Atom">')
-        olist.append('<Document>')
-        olist.append(f'  <name>{self.name_en}</name>')
-        olist.append('  <open>1</open>')
-        olist.append('  <description>Cruise route</description>')
-        olist.append('  <Style id="sn_placemark_circle">')
-        olist.append('    <IconStyle>')
-        olist.append('      <color>802e19fc</color>')
-        olist.append('      <scale>0.6</scale>')
-        olist.append('      <Icon>')
-        olist.append('        <href>http://maps.google.com/mapfiles/kml/shapes/placemark_circle.png</href>')
-        olist.append('      </Icon>')
-        olist.append('    </IconStyle>')
-        olist.append('    <LabelStyle>')
-        olist.append('      <color>1affffff</color>')
-        olist.append('      <scale>0.3</scale>')
-        olist.append('    </LabelStyle>')
-        olist.append('    <ListStyle>')
-        olist.append('    </ListStyle>')
-        olist.append('  </Style>')
-        olist.append('  <StyleMap id="msn_placemark_circle">')
-        olist.append('    <Pair>')
-        olist.append('      <key>normal</key>')
-        olist.append('      <styleUrl>#sn_placemark_circle</styleUrl>')
-        olist.append('    </Pair>')
-        olist.append('    <Pair>')
-        olist.append('      <key>highlight</key>')
-        olist.append('      <styleUrl>#sh_placemark_circle_highlight</styleUrl>')
-        olist.append('    </Pair>')
-        olist.append('  </StyleMap>')
-        olist.append('  <Style id="sh_placemark_circle_highlight">')
-        olist.append('    <IconStyle>')
-        olist.append('      <color>802e19fc</color>')
-        olist.append('      <scale>0.6</scale>')
-        olist.append('      <Icon>')
-        olist.append('        <href>http://maps.google.com/mapfiles/kml/shapes/placemark_circle_highlight.png</href>')
-        olist.append('      </Icon>')
-        olist.append('    </IconStyle>')
-        olist.append('    <LabelStyle>')
-        olist.append('      <color>1affffff</color>')
-        olist.append('      <scale>0.3</scale>')
-        olist.append('    </LabelStyle>')
-        olist.append('    <ListStyle>')
-        olist.append('    </ListStyle>')
-        olist.append('  </Style>')
-        olist.append('  <Placemark>')
-        olist.append('    <name>Route</name>')
-        olist.append('    <LineString>')
-        olist.append('      <tessellate>1</tessellate>')
-        olist.append('      <coordinates>')
-        for p in self.route:
-            olist.append('        ' + f'{p.lon:.5f},{p.lat:.5f},0')
-        olist.append('      </coordinates>')
-        olist.append('    </LineString>')
-        olist.append('  </Placemark>')
-        olist.append('  <Folder>')
-        olist.append('    <name>Points</name>')
-        olist.append('    <open>1</open>')
-        olist.append('    <description>These are the observation stations</description>')
-        olist.append('    <LookAt>')
-        lons = [p.lon for p in self.route]
-        lats = [p.lat for p in self.route]
-        clon = (min(lons) + max(lons))/2
-        clat = (min(lats) + max(lats))/2
-        olist.append(f'      <longitude>{clon:10.5f}</longitude>')
-        olist.append(f'      <latitude>{clat:9.5}</latitude>')
-        olist.append('      <altitude>0</altitude>')
-        olist.append('      <heading>0</heading>')
-        olist.append('      <tilt>0</tilt>')
-        olist.append('      <range>500000</range>')
-        olist.append('    </LookAt>')
-        for p in self.route:
-            if p.name != 'P':
-                olist.append('    <Placemark>')
-                olist.append(f'      <name>{p.name}</name>')
-                olist.append('      <Snippet maxLines="0"></Snippet>')
-                olist.append('      <description><![CDATA[' + self.name_en)
-                olist.append(f'        <p>Longitude: {p.lon:10.5f}<br>Latitude: {p.lat:9.5f}<br>]]></description>')
-                olist.append('      <styleUrl>#msn_placemark_circle</styleUrl>')
-                olist.append('      <Point>')
-                olist.append(f'        <coordinates>{p.lon:10.5f},{p.lat:9.5f},0</coordinates>')
-                olist.append('      </Point>')
-                olist.append('    </Placemark>')
-        olist.append('    </Folder>')
-        olist.append('  </Document>')
-        olist.append('</kml>')
-
-        ofile = open(f"{self.fname.split('.')[0]}.kml", 'w')
-        for r in olist:
-            ofile.write(r + '\n')
-        ofile.close()
+    def to_gmtscript(self, topodir=None, out=None):
+        return self._export_to('P', out, topodir=topodir)
@@ -6,113 +6,314 @@ Output has severel options:
 - ODV gob-file that can be read to ODV
 - kml-file for plotting route in Google Earth
 
+A directory is searched for mcx- and mkx-files recursively. With --jobs N
+the files are exported in N processes. A file that fails does not stop
+the others, the failures are listed at the end with the times.
+
+Only the outputs that are not up to date are made: a manifest file
+(.mycruise_map.json) in each directory records the content of the plan
+and the exporter version of each output, --force makes them all again.
+
+With --watch the files or directories are watched after the export and
+the plans that change are exported again, e.g. while a plan is being
+edited in MyCruise. The process stays running, so the sea area polygons
+and station lists loaded for the first export are used again.
+
 This needs:
-- myCruisefile.py in the same directory
+- mcxFile.py in the same directory
 and optionally for pyGMT output in some directory
 - Baltic_sea_topo.nc that is a gridded bottom topography
 - Baltic_Sea_topo.cpt that is color scale for topography
 '''
 import os
 import sys
-import myCruisefile as mcx
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import mcxFile as mcx
+import export_manifest as em
+import plan_watch as pw
 
 
 outputtypes = ['L', 'P', 'O', 'I', 'S', 'K']
-f_names = []
-outputtype = ''
-topodir = ''
-
-for a in sys.argv[1:]:
-    if a == '-h' or a == 'help' or a == '-help':
-        print('\nUsage:')
-        print('mycruise_map           - input parameters are asked')
-        print('mycruise_map directory - finds all mcx and mkx files')
-        print('                       in directory and asks rest of the parameters')
-        print('mycruise_map filename  - uses the given file')
-        print('                       and asks rest of the parameters')
-        print('mycruise_map with command line parameters:')
-        print('    input=filename|directory')
-        print('    outputtype=L|P|O|I|S|K, small letters can also be used')
-        print('               L - Leaflet html-file')
-        print('               P - pyGMT script to plot the map with GMT')
-        print('               O - ODV gob-file with line and points')
-        print('               I - ODV gob-file, line only')
-        print('               S - ODV gob-file, points only')
-        print('               K - Google Earth kml-file')
-        print('    topodir=directory')
-        print('            used only with outputtype P to plot topography')
-        print('            using Baltic_Sea_topo.nc and Baltic_Sea_topo.cpt')
-        print('            from directory, otherwise the sea color is navy')
-        print('\nexample:')
-        print('mycruise_map input=VRT_2020_syksy.mcx outputtype=L topodir=/Users/pekka/GMTomat\n')
-        sys.exit(2)
-
-    if 'input=' in a:
-        f_name = a.split('=')[1]
-        if not '.MCX' in f_name.upper() and not '.MKX' in f_name.upper():
-            f_names = [i for i in os.listdir(f_name) if i.upper().endswith('.MCX') or i.upper().endswith('.MKX')]
+plan_extensions = ('.MCX', '.MKX')
+
+Options = namedtuple('Options', 'f_names outputtype topodir jobs inputs watch poll force')
+
+
+def usage():
+    print('\nUsage:')
+    print('mycruise_map           - input parameters are asked')
+    print('mycruise_map directory - finds all mcx and mkx files')
+    print('                       in directory and its subdirectories')
+    print('                       and asks rest of the parameters')
+    print('mycruise_map filename  - uses the given file')
+    print('                       and asks rest of the parameters')
+    print('mycruise_map with command line parameters:')
+    print('    input=filename|directory')
+    print('    outputtype=L|P|O|I|S|K, small letters can also be used')
+    print('               several letters (e.g. LPOK) give several outputs')
+    print('               from one reading of the file')
+    print('               L - Leaflet html-file')
+    print('               P - pyGMT script to plot the map with GMT')
+    print('               O - ODV gob-file with line and points')
+    print('               I - ODV gob-file, line only')
+    print('               S - ODV gob-file, points only')
+    print('               K - Google Earth kml-file')
+    print('    topodir=directory')
+    print('            used only with outputtype P to plot topography')
+    print('            using Baltic_Sea_topo.nc and Baltic_Sea_topo.cpt')
+    print('            from directory, otherwise the sea color is navy')
+    print('    --jobs N, -j N or jobs=N')
+    print('            number of processes exporting the files, 0 for')
+    print('            one per CPU, default 1')
+    print('    --watch')
+    print('            keeps running and exports a plan again when it changes')
+    print('            (Ctrl-C stops), new plans in the directories are exported too')
+    print('    --poll')
+    print('            with --watch, checks the files every second instead of')
+    print('            using inotify, e.g. for network drives')
+    print('    --force')
+    print('            makes all outputs, also those that are up to date')
+    print('\nexample:')
+    print('mycruise_map input=VRT_2020_syksy.mcx outputtype=L topodir=/Users/pekka/GMTomat')
+    print('mycruise_map input=/data/cruises outputtype=LPOK --jobs 8')
+    print('mycruise_map input=VRT_2020_syksy.mcx outputtype=LK --watch\n')
+
+
+def is_plan(fname):
+    return fname.upper().endswith(plan_extensions)
+
+
+def find_plans(path):
+    """ Returns the mcx- and mkx-files in directory path and its
+        subdirectories in sorted order, [path] if path is not a directory.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    f_names = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        f_names.extend(os.path.join(dirpath, f) for f in sorted(filenames) if is_plan(f))
+    return f_names
+
+
+def export_plan(fname, outputtype, topodir=''):
+    # outputtype is one or more of outputtypes, e.g. 'LPOK'
+    acruise = mcx.open_cruise(fname)
+    if not acruise.OK:
+        raise FileNotFoundError(f'File {fname} not found')
+    acruise.export(outputtype, topodir=topodir)
+
+
+def render(fname, outputtype, topodir=''):
+    """ Exports one file. Returns (fname, seconds, error), error is None
+        if the export succeeded and otherwise the exception as text.
+    """
+    t0 = time.perf_counter()
+    try:
+        export_plan(fname, outputtype, topodir)
+        error = None
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    return fname, time.perf_counter() - t0, error
+
+
+def render_all(f_names, outputtype, topodir='', jobs=1, pool=None):
+    """ Exports the files in jobs processes (one per CPU if jobs is 0) and
+        yields the results of render as the files are ready. A given pool
+        (ProcessPoolExecutor) is used instead of starting new processes.
+        outputtype is the same for all files or a dict {fname: outputtype}.
+    """
+    if not isinstance(outputtype, dict):
+        outputtype = dict.fromkeys(f_names, outputtype)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(f_names) < 2:
+        for f in f_names:
+            yield render(f, outputtype[f], topodir)
+        return
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(f_names))) as pool:
+            yield from _pool_results(pool, f_names, outputtype, topodir)
+    else:
+        yield from _pool_results(pool, f_names, outputtype, topodir)
+
+
+def _pool_results(pool, f_names, outputtype, topodir):
+    futures = {pool.submit(render, f, outputtype[f], topodir): f for f in f_names}
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except Exception as e:
+            # the worker process died
+            yield futures[future], 0.0, f'{type(e).__name__}: {e}'
+
+
+def render_stale(f_names, outputtype, topodir='', jobs=1, pool=None, force=False, plans=None):
+    """ Exports the outputs of the files that are not up to date (all with
+        force) as render_all and records them in the manifests. Yields the
+        results of render, nothing for the files that are up to date. A file
+        whose output files are those of an earlier file of plans (default
+        f_names), e.g. x.mkx of x.mcx, is not exported but reported failed.
+    """
+    options = {'P': topodir}
+    todo, states, clashes = em.stale_outputs(f_names, outputtype, options, force, plans)
+    for fname, other in clashes.items():
+        yield fname, 0.0, f'its output files are those of {other}, not exported'
+    done = {}
+    try:
+        for result in render_all(list(todo), todo, topodir, jobs, pool):
+            if result[2] is None:
+                done[result[0]] = todo[result[0]]
+            yield result
+    finally:
+        em.record_outputs(done, states, options)
+
+
+def print_summary(results, seconds, up_to_date=0):
+    failed = [r for r in results if r[2] is not None]
+    if up_to_date:
+        print(f'\n{up_to_date} file(s) up to date, --force exports them again')
+    print(f'\n{len(results) - len(failed)} of {len(results)} file(s) exported in {seconds:.1f} s'
+          f' ({sum(r[1] for r in results):.1f} s in the exports)')
+    if len(results) > 1:
+        fname, slowest, _ = max(results, key=lambda r: r[1])
+        print(f'slowest {fname} {slowest:.2f} s')
+    for fname, _, error in failed:
+        print(f'FAILED {fname}: {error}')
+
+
+def watch_plans(inputs, outputtype, topodir='', jobs=1, poll=False, pool=None, force=False):
+    """ Exports the plans in inputs (files and directories) again whenever
+        they are written, until Ctrl-C. Without force a plan that is saved
+        with the same content is not exported.
+    """
+    method = 'poll' if poll else 'auto'
+    changes = pw.watch(inputs, match=is_plan, method=method)
+    print(f'\nWatching {", ".join(inputs)} for changes, Ctrl-C stops')
+    try:
+        for changed in changes:
+            t0 = time.perf_counter()
+            exported = set()
+            plans = [f for path in inputs for f in find_plans(path)]
+            for fname, secs, error in render_stale(changed, outputtype, topodir, jobs, pool, force, plans):
+                exported.add(fname)
+                status = 'OK' if error is None else f'FAILED {error}'
+                print(f'{time.strftime("%H:%M:%S")} {fname} {secs:.2f} s {status}')
+            for fname in changed:
+                if fname not in exported:
+                    print(f'{time.strftime("%H:%M:%S")} {fname} up to date')
+            if len(changed) > 1:
+                print(f'{len(changed)} file(s) in {time.perf_counter() - t0:.2f} s')
+    except KeyboardInterrupt:
+        print('\nStopped watching')
+    finally:
+        changes.close()
+
+
+def parse_args(argv):
+    """ Returns the Options of the command line arguments, asking what is
+        not given.
+    """
+    f_names = []
+    inputs = []
+    outputtype = ''
+    topodir = ''
+    jobs = 1
+    watch = False
+    poll = False
+    force = False
+    positional = []
+
+    args = iter(argv)
+    for a in args:
+        if a == '-h' or a == 'help' or a == '-help':
+            usage()
+            sys.exit(2)
+
+        if a in ('--jobs', '-j'):
+            jobs = int(next(args, '1'))
+        elif a.startswith('--jobs=') or a.startswith('jobs='):
+            jobs = int(a.split('=')[1])
+        elif a == '--watch':
+            watch = True
+        elif a == '--poll':
+            poll = True
+        elif a == '--force':
+            force = True
+        elif 'input=' in a:
+            inputs.append(a.split('=')[1])
+            f_names.extend(find_plans(inputs[-1]))
+        elif 'outputtype=' in a:
+            outputtype = a.split('=')[1].upper()
+        elif 'topodir=' in a:
+            topodir = a.split('=')[1]
         else:
-            f_names.append(f_name) 
-    if 'outputtype=' in a:
-        outputtype = a.split('=')[1].upper()
-    if 'topodir=' in a:
-        topodir = a.split('=')[1]
-
-# Choose files to print
-if len(f_names) == 0:
-    if len(sys.argv) > 1:
-        f_name = sys.argv[1] 
-        if not '.MCX' in f_name.upper() and not '.MKX' in f_name.upper():
-            f_names = [i for i in os.listdir(f_name) if i.upper().endswith('.MCX') or i.upper().endswith('.MKX')]
+            positional.append(a)
+
+    # Choose files to print
+    if len(f_names) == 0:
+        if len(positional) > 0:
+            inputs.append(positional[0])
+            f_names = find_plans(positional[0])
         else:
-            f_names.append(f_name) 
-    else:
-        f_name = input('Give cruise file: ')
-        f_names.append(f_name)
+            f_name = input('Give cruise file: ')
+            inputs.append(f_name)
+            f_names.append(f_name)
 
-# Choose output-type
-if outputtype == '':
-    if len(sys.argv) > 2:
-        outputtype = sys.argv[2].upper()[0]
-    else:
-        outputtype = input('Give outputtype '+
-            '(small letters are also accepted)\n L = Leaflet,\n P = pyGMT,\n '+
-            'O = ODV gob line with points,\n I = ODV gob line,\n '+
-            'S = ODV gob points,\n K = Google kml:\n ')
-        if outputtype == '':
-            outputtype = 'L'
+    # Choose output-type
+    if outputtype == '':
+        if len(positional) > 1:
+            outputtype = positional[1].upper()
         else:
-            outputtype = outputtype.upper()[0]
-
-if outputtype not in outputtypes:
-    outputtype = 'L'
-
-if outputtype == 'P':
-    if topodir == '':
-        topodir = input('If you have files\n'+
-            'Baltic_Sea_topo.nc and Baltic_Sea_topo.cpt,\n'+
-            'give their directory to get topography on the map, or push enter ')
-    if topodir != '' and topodir[-1] != '/':
-        topodir = topodir + '/'
-    
-# Print chosen files in chosen output type
-for f in f_names:
-    acruise = mcx.mycruisefile(f)
-    
-    if outputtype == 'L':
-        acruise.leaflethtml()
-    elif outputtype == 'P':
+            outputtype = input('Give outputtype '+
+                '(small letters are also accepted)\n L = Leaflet,\n P = pyGMT,\n '+
+                'O = ODV gob line with points,\n I = ODV gob line,\n '+
+                'S = ODV gob points,\n K = Google kml:\n ')
+            outputtype = outputtype.upper()
+
+    outputtype = ''.join(t for t in dict.fromkeys(outputtype) if t in outputtypes)
+    if outputtype == '':
+        outputtype = 'L'
+
+    if 'P' in outputtype:
         if topodir == '':
-            acruise.to_gmtscript()
-        else:
-            acruise.to_gmtscript(topodir)
-    elif outputtype == 'O':
-        acruise.to_ODV_gob()
-    elif outputtype == 'I':
-        acruise.to_ODV_GOBline()
-    elif outputtype == 'S':
-        acruise.to_ODV_GOBsymbols()
-    elif outputtype == 'K':
-        acruise.to_KML()
-
-print('Output file(s) are ready!')
+            topodir = input('If you have files\n'+
+                'Baltic_Sea_topo.nc and Baltic_Sea_topo.cpt,\n'+
+                'give their directory to get topography on the map, or push enter ')
+        if topodir != '' and topodir[-1] != '/':
+            topodir = topodir + '/'
+
+    return Options(f_names, outputtype, topodir, jobs, inputs, watch, poll, force)
+
+
+def main(argv=None):
+    opts = parse_args(sys.argv[1:] if argv is None else argv)
+    jobs = opts.jobs or os.cpu_count() or 1
+
+    # In watch mode the worker processes are kept for the later exports
+    pool = ProcessPoolExecutor(max_workers=jobs) if opts.watch and jobs > 1 else None
+    try:
+        # Print chosen files in chosen output type
+        t0 = time.perf_counter()
+        results = []
+        for result in render_stale(opts.f_names, opts.outputtype, opts.topodir, jobs, pool, opts.force):
+            results.append(result)
+            if result[2] is not None:
+                print(f'\nNOTE! {result[0]} failed: {result[2]}')
+        print_summary(results, time.perf_counter() - t0, len(set(opts.f_names)) - len(results))
+
+        ok = all(r[2] is None for r in results)
+        if ok:
+            print('Output file(s) are ready!')
+        if opts.watch:
+            watch_plans(opts.inputs, opts.outputtype, opts.topodir, jobs, opts.poll, pool, opts.force)
+            return 0
+        return 0 if ok else 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
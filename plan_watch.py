@@ -0,0 +1,256 @@
+'''
+Watching cruise plan files for changes
+
+watch yields the plan files that have changed under the given files and
+directories (directories recursively), one list per burst of writes: the
+list is yielded when the files have been quiet for debounce seconds, so
+that a plan saved in several writes, or through a temporary file that is
+renamed, is reported once.
+
+'inotify' uses the inotify of Linux (through ctypes, no extra packages),
+'poll' compares the modification times and sizes of the files every
+interval seconds and works everywhere, also on network drives where
+inotify does not see the writes of other computers. 'auto' (the default)
+is inotify when it can be used and poll otherwise.
+
+usage:
+import plan_watch as pw
+for changed in pw.watch(['/data/cruises'], match=lambda f: f.endswith('.mcx')):
+    print(changed)
+'''
+import os
+import select
+import struct
+import sys
+import time
+
+METHODS = ('auto', 'inotify', 'poll')
+
+# inotify event masks, see inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_watch_mask = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+_event = struct.Struct('iIII')
+
+
+def _match_all(fname):
+    return True
+
+
+def scan(paths, match=None):
+    """ Returns {file name: (mtime_ns, size)} of the files in paths that
+        match, directories are searched recursively.
+    """
+    match = match or _match_all
+    files = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for f in filenames:
+                    fname = os.path.join(dirpath, f)
+                    if match(fname):
+                        _stat_into(files, fname)
+        elif match(path):
+            _stat_into(files, path)
+    return files
+
+
+def _stat_into(files, fname):
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return
+    files[fname] = (st.st_mtime_ns, st.st_size)
+
+
+class PollingWatcher:
+    name = 'poll'
+
+    def __init__(self, paths, match=None, interval=1.0):
+        self.paths = list(paths)
+        self.match = match
+        self.interval = interval
+        self._files = scan(self.paths, match)
+
+    def close(self):
+        pass
+
+    def _changes(self):
+        files = scan(self.paths, self.match)
+        changed = {f for f, stamp in files.items() if self._files.get(f) != stamp}
+        changed.update(f for f in self._files if f not in files)
+        self._files = files
+        return changed
+
+    def wait(self, timeout=None):
+        """ Returns the set of files changed since the last call, waiting
+            for at most timeout seconds (forever if None) for a change.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is None:
+                time.sleep(self.interval)
+            else:
+                left = deadline - time.monotonic()
+                if left > 0:
+                    time.sleep(min(self.interval, left))
+            changed = self._changes()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+class InotifyWatcher:
+    name = 'inotify'
+
+    def __init__(self, paths, match=None):
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is available only on Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._get_errno = ctypes.get_errno
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self._get_errno(), 'inotify_init1 failed')
+        self.paths = list(paths)
+        self.match = match or _match_all
+        # wd -> [directory, watched recursively]
+        self._dirs = {}
+        # (directory, name) -> the file as given, of the files watched one by one
+        self._files = {}
+        try:
+            for path in self.paths:
+                if os.path.isdir(path):
+                    self._add_tree(path)
+                else:
+                    parent, name = os.path.split(path)
+                    self._add_dir(parent or '.', False)
+                    self._files[(parent or '.', name)] = path
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _add_dir(self, dirpath, recursive):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dirpath), _watch_mask)
+        if wd < 0:
+            raise OSError(self._get_errno(), f'inotify_add_watch failed for {dirpath}')
+        if wd in self._dirs:
+            self._dirs[wd][1] = self._dirs[wd][1] or recursive
+        else:
+            self._dirs[wd] = [dirpath, recursive]
+
+    def _add_tree(self, path):
+        # watches path and its subdirectories, returns the matching files in them
+        found = set()
+        for dirpath, dirnames, filenames in os.walk(path):
+            self._add_dir(dirpath, True)
+            found.update(f for f in (os.path.join(dirpath, f) for f in filenames) if self.match(f))
+        return found
+
+    def _read(self):
+        changed = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            pos = 0
+            while pos < len(buf):
+                wd, mask, cookie, length = _event.unpack_from(buf, pos)
+                pos += _event.size
+                name = os.fsdecode(buf[pos:pos + length].rstrip(b'\0'))
+                pos += length
+                if mask & IN_Q_OVERFLOW:
+                    # events were lost, every file may have changed
+                    changed.update(scan(self.paths, self.match))
+                    continue
+                if wd not in self._dirs:
+                    continue
+                if mask & IN_IGNORED:
+                    del self._dirs[wd]
+                    continue
+                dirpath, recursive = self._dirs[wd]
+                if mask & IN_ISDIR:
+                    if recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                        # a new subdirectory, its files may have been written
+                        # before its watch was added
+                        try:
+                            changed.update(self._add_tree(os.path.join(dirpath, name)))
+                        except OSError:
+                            pass
+                    continue
+                if recursive:
+                    fname = os.path.join(dirpath, name)
+                    if self.match(fname):
+                        changed.add(fname)
+                elif (dirpath, name) in self._files:
+                    changed.add(self._files[(dirpath, name)])
+
+    def wait(self, timeout=None):
+        """ Returns the set of files changed since the last call, waiting
+            for at most timeout seconds (forever if None) for a change.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], left)
+            changed = self._read() if ready else set()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+def get_watcher(paths, match=None, method=None, interval=1.0):
+    """ Returns a watcher of paths.
+        method - 'auto' or None (inotify if it can be used, else poll),
+                 'inotify' or 'poll'
+        Raises OSError for 'inotify' when inotify cannot be used and
+        ValueError for an unknown method.
+    """
+    method = method or 'auto'
+    if method not in METHODS:
+        raise ValueError(f'unknown watch method {method!r}, use one of {", ".join(METHODS)}')
+    if method in ('auto', 'inotify'):
+        try:
+            return InotifyWatcher(paths, match)
+        except OSError:
+            if method == 'inotify':
+                raise
+    return PollingWatcher(paths, match, interval)
+
+
+def watch(paths, match=None, debounce=0.3, method=None, interval=1.0):
+    """ Yields the sorted lists of the files in paths (directories
+        recursively) that match and have been written, each list after the
+        files have been quiet for debounce seconds. Removed files are not
+        listed. Runs until the generator is closed.
+    """
+    watcher = get_watcher(paths, match, method, interval)
+    try:
+        while True:
+            changed = watcher.wait()
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            changed = sorted(f for f in changed if os.path.isfile(f))
+            if changed:
+                yield changed
+    finally:
+        watcher.close()
@@ -0,0 +1,163 @@
+'''
+Memoized sea area lookups
+
+AreaCache sits in front of the lookup functions of sea_areas.
+The points are quantized to a given number of decimals and the results
+are kept in an in-process LRU and optionally in an sqlite file that
+survives between runs. The file stores sea_areas.border_hash of the
+polygon data and is emptied when the polygons have changed.
+
+Within a process the polygons are checked again (validate) when
+sea_areas.forget_area_index has been called since the last check. An
+area list changed in place must be followed by forget_area_index, as
+the lookups of sea_areas need it too, or the cached results stay those
+of the old polygons.
+
+usage:
+import sea_area_cache as sac
+cache = sac.AreaCache(precision=5, store='areas.sqlite')
+cache.locate([lon, lat])
+cache.whosEconomicZone([lon, lat])
+cache.stats()
+cache.close()
+'''
+import pickle
+import sqlite3
+from collections import OrderedDict
+import sea_areas as sa
+
+# The functions of sea_areas that AreaCache serves as its own methods
+cached_functions = (
+    'locate',
+    'getMyCruiseHelcomAreaCode',
+    'getSeaAreaName',
+    'getHelcomAreaAndBasinNames',
+    'getBalticSeaMainAreaName',
+    'whosEconomicZone',
+    'whosTerritorialWater',
+    'whosBaseline',
+    'getMyCruiseCountryCode',
+)
+
+
+class AreaCache:
+    def __init__(self, precision=5, maxsize=100000, store=None):
+        """ precision - decimals of lon and lat in the cache key, the lookup
+                        is done for the rounded point so that every point
+                        with the same key gets the same answer
+            maxsize   - number of results in the in-process LRU
+            store     - optional sqlite file for results between runs
+        """
+        self.precision = precision
+        self.maxsize = maxsize
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._pending = 0
+        self.data_hash = sa.border_hash()
+        self._generation = sa.area_generation
+        self.db = None
+        if store:
+            self.db = sqlite3.connect(store)
+            self.db.execute('create table if not exists meta (key text primary key, value text)')
+            self.db.execute('create table if not exists result '
+                            '(func text, lon real, lat real, value blob, primary key (func, lon, lat))')
+            self._check_store()
+
+    def _check_store(self):
+        row = self.db.execute("select value from meta where key = 'data_hash'").fetchone()
+        if row is None or row[0] != self.data_hash:
+            self.db.execute('delete from result')
+            self.db.execute("insert or replace into meta values ('data_hash', ?)", (self.data_hash,))
+            self.db.commit()
+
+    def validate(self):
+        """ Empties the cache if the polygon data of sea_areas has changed
+            since the cache was opened. Returns True if the cache was valid.
+        """
+        self._generation = sa.area_generation
+        data_hash = sa.border_hash()
+        if data_hash == self.data_hash:
+            return True
+        self.data_hash = data_hash
+        self._lru.clear()
+        if self.db is not None:
+            self._check_store()
+        return False
+
+    def lookup(self, func, aPoint):
+        """ Returns func(point) for aPoint rounded to the cache precision."""
+        if self._generation != sa.area_generation:
+            self.validate()
+        # the module is in the key: sea_areas and sea_area_tuples have
+        # functions of the same name that answer differently
+        key = (f'{func.__module__}.{func.__qualname__}',
+               round(aPoint[0], self.precision), round(aPoint[1], self.precision))
+        lru = self._lru
+        if key in lru:
+            lru.move_to_end(key)
+            self.hits += 1
+            return lru[key]
+        value = None
+        if self.db is not None:
+            row = self.db.execute('select value from result where func = ? and lon = ? and lat = ?',
+                                  key).fetchone()
+            if row is not None:
+                value = pickle.loads(row[0])
+                self.store_hits += 1
+        if value is None:
+            value = func([key[1], key[2]])
+            self.misses += 1
+            if self.db is not None:
+                self.db.execute('insert or replace into result values (?, ?, ?, ?)',
+                                key + (pickle.dumps(value),))
+                self._pending += 1
+                if self._pending >= 1000:
+                    self.flush()
+        lru[key] = value
+        if len(lru) > self.maxsize:
+            lru.popitem(last=False)
+        return value
+
+    def wrap(self, func):
+        """ Returns a cached version of a lookup function func(aPoint)."""
+        def cached(aPoint):
+            return self.lookup(func, aPoint)
+        cached.__name__ = func.__name__
+        cached.__doc__ = func.__doc__
+        return cached
+
+    def __getattr__(self, name):
+        # cache.whosEconomicZone(aPoint) etc. for the functions in cached_functions
+        if name in cached_functions:
+            return self.wrap(getattr(sa, name))
+        raise AttributeError(name)
+
+    def stats(self):
+        return {'hits': self.hits, 'store_hits': self.store_hits, 'misses': self.misses,
+                'size': len(self._lru)}
+
+    def flush(self):
+        if self.db is not None and self._pending:
+            self.db.commit()
+            self._pending = 0
+
+    def clear(self):
+        self._lru.clear()
+        if self.db is not None:
+            self.db.execute('delete from result')
+            self.db.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
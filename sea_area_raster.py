@@ -0,0 +1,181 @@
+'''
+Raster lookup grid for sea area and economic zone codes
+
+The grid covers the Baltic Sea as defined in sea_areas.gsw_Baltic.
+Each cell stores the MyCruise sea area code (mccode of BalticSeaAreas)
+and the MyCruise EEZ code (mccode of economiczones), 0 if none.
+Cells that a polygon edge crosses are flagged as boundary cells.
+A point in an interior cell gets its codes directly from the grid,
+boundary cells and points outside the grid use the exact polygon test.
+
+The grid is built from the polygons in sea_areas and saved into a file.
+get_area_raster loads it and rebuilds it automatically if the polygon data
+of sea_areas has changed.
+
+usage:
+import sea_area_raster as sar
+raster = sar.get_area_raster()
+area, eez = raster.lookup([lon, lat])
+areas, eezs = raster.lookup_many(lons, lats)
+'''
+import os
+import math
+import numpy as np
+import sea_areas as sa
+
+RASTER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sea_area_raster.npz')
+RASTER_VERSION = 1
+
+# [minlon, minlat, maxlon, maxlat] of sea_areas.gsw_Baltic
+BALTIC_EXTENT = (7.0, 50.0, 32.0, 66.0)
+
+# Edges are widened by this (degrees) when the boundary cells are marked,
+# so that rounding in the cell index of a point can not miss a boundary cell
+EDGE_EPS = 1e-7
+
+
+def raster_data_hash():
+    """ Hash of the polygon data the raster is built from."""
+    return sa.border_hash(sa.BalticSeaAreas, sa.economiczones)
+
+
+class AreaRaster:
+    def __init__(self, lon0, lat0, resolution, area, eez, boundary, data_hash):
+        self.lon0 = lon0
+        self.lat0 = lat0
+        self.resolution = resolution
+        self.area = area
+        self.eez = eez
+        self.boundary = boundary
+        self.data_hash = data_hash
+        self.nlat, self.nlon = area.shape
+
+    @classmethod
+    def build(cls, resolution=0.01, extent=BALTIC_EXTENT):
+        """ Builds the raster from the polygons of sea_areas."""
+        lon0, lat0, lon1, lat1 = extent
+        nlon = int(round((lon1 - lon0)/resolution))
+        nlat = int(round((lat1 - lat0)/resolution))
+        clon = lon0 + (np.arange(nlon) + 0.5)*resolution
+        clat = lat0 + (np.arange(nlat) + 0.5)*resolution
+        glon, glat = np.meshgrid(clon, clat)
+        area = sa.classify_points(glon, glat, sa.BalticSeaAreas).astype(np.int32)
+        eez = sa.classify_points(glon, glat, sa.economiczones).astype(np.int32)
+
+        boundary = np.zeros((nlat, nlon), dtype=bool)
+        for areas in (sa.BalticSeaAreas, sa.economiczones):
+            for polygon in sa.polygons(areas):
+                _mark_edges(boundary, polygon.ring, lon0, lat0, resolution)
+
+        return cls(lon0, lat0, resolution, area, eez, boundary, raster_data_hash())
+
+    @classmethod
+    def load(cls, path=RASTER_FILE):
+        with np.load(path) as d:
+            if int(d['version']) != RASTER_VERSION:
+                raise ValueError(f'{path} is not a version {RASTER_VERSION} area raster')
+            return cls(float(d['lon0']), float(d['lat0']), float(d['resolution']),
+                       d['area'], d['eez'], d['boundary'], str(d['data_hash']))
+
+    def save(self, path=RASTER_FILE):
+        # np.savez adds .npz to the name, so write to a temporary .npz name
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        try:
+            np.savez_compressed(tmp, version=RASTER_VERSION,
+                                lon0=self.lon0, lat0=self.lat0, resolution=self.resolution,
+                                area=self.area, eez=self.eez, boundary=self.boundary,
+                                data_hash=self.data_hash)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def is_current(self):
+        """ True if the raster was built from the current polygon data."""
+        return self.data_hash == raster_data_hash()
+
+    def cell_of(self, lons, lats):
+        """ Returns the row and column indices of the cells and a mask of
+            points that are inside the raster.
+        """
+        i = np.floor((np.asarray(lats, dtype=float) - self.lat0)/self.resolution)
+        j = np.floor((np.asarray(lons, dtype=float) - self.lon0)/self.resolution)
+        ok = (i >= 0) & (i < self.nlat) & (j >= 0) & (j < self.nlon)
+        return np.where(ok, i, 0).astype(np.intp), np.where(ok, j, 0).astype(np.intp), ok
+
+    def lookup(self, aPoint):
+        """ Returns (sea area mccode, EEZ mccode) of aPoint [lon, lat], 0 if none."""
+        i = math.floor((aPoint[1] - self.lat0)/self.resolution)
+        j = math.floor((aPoint[0] - self.lon0)/self.resolution)
+        if 0 <= i < self.nlat and 0 <= j < self.nlon and not self.boundary.item(i, j):
+            return self.area.item(i, j), self.eez.item(i, j)
+        return (sa.in_which(aPoint, sa.BalticSeaAreas, 'mccode', 0),
+                sa.in_which(aPoint, sa.economiczones, 'mccode', 0))
+
+    def lookup_many(self, lons, lats):
+        """ Returns arrays of sea area and EEZ mccodes for arrays of points."""
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        i, j, ok = self.cell_of(lons, lats)
+        area = self.area[i, j]
+        eez = self.eez[i, j]
+        exact = ~ok | self.boundary[i, j]
+        if exact.any():
+            area[exact] = sa.classify_points(lons[exact], lats[exact], sa.BalticSeaAreas)
+            eez[exact] = sa.classify_points(lons[exact], lats[exact], sa.economiczones)
+        return area, eez
+
+
+def _mark_edges(boundary, ring, lon0, lat0, resolution):
+    """ Flags every cell that an edge of the closed ring touches.
+
+        Each edge is cut into pieces shorter than half a cell. The bounding
+        box of a piece then spans at most two cells in both directions and
+        contains the piece, so flagging its corner cells covers the edge.
+    """
+    nlat, nlon = boundary.shape
+    p = np.asarray(ring, dtype=float)
+    for (xa, ya), (xb, yb) in zip(p[:-1], p[1:]):
+        n = int(np.ceil(max(abs(xb - xa), abs(yb - ya))/(resolution/2))) + 1
+        t = np.linspace(0.0, 1.0, n + 1)
+        x = xa + (xb - xa)*t
+        y = ya + (yb - ya)*t
+        x1 = np.minimum(x[:-1], x[1:]) - EDGE_EPS
+        x2 = np.maximum(x[:-1], x[1:]) + EDGE_EPS
+        y1 = np.minimum(y[:-1], y[1:]) - EDGE_EPS
+        y2 = np.maximum(y[:-1], y[1:]) + EDGE_EPS
+        for xs in (x1, x2):
+            for ys in (y1, y2):
+                j = np.floor((xs - lon0)/resolution).astype(np.intp)
+                i = np.floor((ys - lat0)/resolution).astype(np.intp)
+                ok = (i >= 0) & (i < nlat) & (j >= 0) & (j < nlon)
+                boundary[i[ok], j[ok]] = True
+
+
+_rasters = {}
+
+def get_area_raster(path=RASTER_FILE, resolution=0.01):
+    """ Returns the area raster. It is loaded from path once per process,
+        and rebuilt and saved if the file is missing, has another resolution
+        or was built from different polygon data than sea_areas has now.
+        If path cannot be written (e.g. a read-only installation) the
+        rebuilt raster is used without saving it.
+    """
+    if (path, resolution) in _rasters:
+        return _rasters[(path, resolution)]
+    raster = None
+    if os.path.isfile(path):
+        try:
+            raster = AreaRaster.load(path)
+        except (OSError, ValueError, KeyError):
+            raster = None
+    if raster is None or raster.resolution != resolution or not raster.is_current():
+        raster = AreaRaster.build(resolution)
+        try:
+            raster.save(path)
+        except OSError:
+            # rebuilt again by the next process
+            pass
+    _rasters[(path, resolution)] = raster
+    return raster
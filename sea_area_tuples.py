@@ -14,6 +14,7 @@ Pekka Alenius 2021-05-19
 
 from math import pi, radians, cos, sin, asin, sqrt
 from collections import namedtuple
+from sea_areas import area_index
 
 # In all the following the geographic points Gp are interpreted as
 # [longitude, latitude]
@@ -94,6 +95,10 @@ baselines = [
     Adm_area('Sweden',  'SE', 177000, 'B', [Gp(10.92, 58.94167), Gp(10.96167, 58.93), Gp(10.96, 58.93), Gp(10.96333, 58.88833), Gp(10.97833, 58.77833), Gp(11.02167, 58.53667), Gp(11.20667, 58.32833), Gp(11.32833, 58.095), Gp(11.43833, 57.895), Gp(11.59167, 57.63667), Gp(11.89667, 57.29667), Gp(12.11, 57.15167), Gp(12.24333, 57.06333), Gp(12.35833, 56.91833), Gp(12.52, 56.83), Gp(12.62333, 56.73), Gp(12.71, 56.64833), Gp(12.54333, 56.45167), Gp(12.44833, 56.30333), Gp(12.88667, 55.52), Gp(12.84167, 55.45333), Gp(12.82667, 55.41667), Gp(12.81333, 55.37833), Gp(12.80667, 55.365), Gp(12.80833, 55.35667), Gp(12.81667, 55.33667), Gp(12.935, 55.37833), Gp(13.05333, 55.375), Gp(13.06133, 55.37483), Gp(13.073, 55.37083), Gp(13.0855, 55.36767), Gp(13.097, 55.373), Gp(13.10933, 55.376), Gp(13.1225, 55.37567), Gp(13.13483, 55.3725), Gp(13.14883, 55.37233), Gp(13.15967, 55.3675), Gp(13.17467, 55.36833), Gp(13.187, 55.3665), Gp(13.20583, 55.36283), Gp(13.22067, 55.35917), Gp(13.23117, 55.354), Gp(13.24383, 55.35233), Gp(13.2555, 55.3495), Gp(13.26833, 55.34583), Gp(13.28067, 55.34283), Gp(13.29333, 55.34217), Gp(13.3085, 55.3405), Gp(13.32417, 55.34183), Gp(13.339, 55.33967), Gp(13.3525, 55.33683), Gp(13.36617, 55.3365), Gp(13.37983, 55.34233), Gp(13.39283, 55.34783), Gp(13.4045, 55.35133), Gp(13.417, 55.35267), Gp(13.42917, 55.35483), Gp(13.44517, 55.36383), Gp(13.45517, 55.3685), Gp(13.4725, 55.37383), Gp(13.4865, 55.37917), Gp(13.50367, 55.38333), Gp(13.52133, 55.38467), Gp(13.53433, 55.38533), Gp(13.54883, 55.38567), Gp(13.56167, 55.38333), Gp(13.57567, 55.38433), Gp(13.58817, 55.3865), Gp(13.60133, 55.388), Gp(13.6075, 55.395), Gp(13.614, 55.40167), Gp(13.623, 55.40833), Gp(13.633, 55.413), Gp(13.64517, 55.41633), Gp(13.65967, 55.41667), Gp(13.674, 55.41617), Gp(13.68733, 55.41667), Gp(13.699, 55.4205), Gp(13.70983, 55.42433), Gp(13.72317, 55.4255), Gp(13.73667, 55.42417), Gp(13.75217, 55.42483), Gp(13.76567, 55.42483), Gp(13.77933, 55.4235), Gp(13.79333, 55.42217), Gp(13.80667, 55.42383), Gp(13.82283, 55.42417), Gp(13.83533, 55.4215), Gp(13.84833, 55.41967), Gp(13.85717, 55.425), Gp(13.87167, 55.4295), Gp(13.88683, 55.43217), Gp(13.90233, 55.43333), Gp(13.91767, 55.43267), Gp(13.93667, 55.4315), Gp(13.9495, 55.429), Gp(13.96117, 55.42567), Gp(13.97433, 55.42133), Gp(13.98633, 55.41683), Gp(13.99817, 55.4105), Gp(14.0095, 55.40467), Gp(14.02633, 55.39617), Gp(14.0365, 55.3915), Gp(14.0465, 55.38617), Gp(14.05667, 55.38017), Gp(14.06867, 55.38267), Gp(14.0825, 55.38383), Gp(14.096, 55.38283), Gp(14.10867, 55.382), Gp(14.12167, 55.38033), Gp(14.13517, 55.37733), Gp(14.14917, 55.37583), Gp(14.16533, 55.37617), Gp(14.18033, 55.37717), Gp(14.19367, 55.37983), Gp(14.204, 55.38483), Gp(14.21283, 55.394), Gp(14.21967, 55.40167), Gp(14.22633, 55.411), Gp(14.23167, 55.41783), Gp(14.2365, 55.42517), Gp(14.24517, 55.43667), Gp(14.25433, 55.44233), Gp(14.266, 55.44633), Gp(14.27417, 55.45233), Gp(14.28183, 55.45933), Gp(14.2855, 55.46767), Gp(14.29367, 55.47383), Gp(14.30283, 55.47933), Gp(14.31383, 55.4835), Gp(14.32183, 55.49017), Gp(14.33017, 55.49667), Gp(14.33783, 55.50267), Gp(14.35217, 55.50733), Gp(14.3535, 55.51483), Gp(14.35267, 55.52233), Gp(14.358, 55.52967), Gp(14.3625, 55.53783), Gp(14.36267, 55.54567), Gp(14.36583, 55.55317), Gp(14.35667, 55.55833), Gp(14.34733, 55.56367), Gp(14.34333, 55.57183), Gp(14.33967, 55.57983), Gp(14.33533, 55.587), Gp(14.325, 55.5915), Gp(14.31517, 55.59783), Gp(14.3045, 55.60483), Gp(14.302, 55.612), Gp(14.289, 55.61783), Gp(14.286, 55.62533), Gp(14.2835, 55.63517), Gp(14.28233, 55.64417), Gp(14.28183, 55.652), Gp(14.28333, 55.66083), Gp(14.27917, 55.668), Gp(14.27333, 55.67467), Gp(14.25917, 55.68017), Gp(14.24667, 55.68233), Gp(14.236, 55.68633), Gp(14.22467, 55.69067), Gp(14.21717, 55.69717), Gp(14.20867, 55.70283), Gp(14.20717, 55.71083), Gp(14.2035, 55.71867), Gp(14.2005, 55.72683), Gp(14.19867, 55.73417), Gp(14.19867, 55.74183), Gp(14.19967, 55.74917), Gp(14.20067, 55.75667), Gp(14.20217, 55.764), Gp(14.204, 55.77267), Gp(14.2055, 55.78), Gp(14.20833, 55.78767), Gp(14.21167, 55.797), Gp(14.215, 55.80517), Gp(14.21717, 55.8125), Gp(14.2215, 55.82067), Gp(14.22517, 55.82833), Gp(14.22917, 55.837), Gp(14.23333, 55.844), Gp(14.23917, 55.852), Gp(14.244, 55.85983), Gp(14.24917, 55.8675), Gp(14.25533, 55.875), Gp(14.26217, 55.882), Gp(14.26883, 55.88833), Gp(14.27783, 55.8955), Gp(14.28683, 55.90067), Gp(14.29783, 55.90517), Gp(14.31033, 55.90983), Gp(14.30667, 55.90667), Gp(14.72333, 55.99333), Gp(14.845, 56.0), Gp(14.86, 56.005), Gp(14.975, 56.11), Gp(15.47833, 56.08), Gp(15.70167, 55.94667), Gp(15.70667, 55.94833), Gp(15.79333, 56.01167), Gp(16.405, 56.195), Gp(16.76667, 56.73333), Gp(16.85, 56.82), Gp(16.87167, 56.84667), Gp(17.07667, 57.17833), Gp(17.08667, 57.22833), Gp(17.155, 57.30833), Gp(17.13, 57.35667), Gp(16.83167, 57.595), Gp(16.90667, 57.685), Gp(16.85167, 57.84333), Gp(17.16667, 58.31), Gp(17.22167, 58.535), Gp(17.97333, 58.71167), Gp(17.975, 58.71333), Gp(18.02333, 58.73167), Gp(18.59, 58.95833), Gp(18.61667, 58.97167), Gp(18.805, 59.06667), Gp(19.19333, 59.30667), Gp(19.50167, 59.41833), Gp(19.645, 59.62), Gp(19.46333, 59.73833), Gp(19.37333, 59.79333), Gp(19.09667, 59.89333), Gp(18.86167, 60.04), Gp(18.91667, 60.22167), Gp(18.92, 60.24), Gp(18.925, 60.27667), Gp(18.82833, 60.42833), Gp(18.50333, 60.51667), Gp(18.02167, 60.64167), Gp(17.52167, 60.82167), Gp(17.34333, 61.175), Gp(17.40167, 61.27833), Gp(17.47167, 61.54333), Gp(17.56, 61.72333), Gp(17.64667, 62.01667), Gp(17.74833, 62.21833), Gp(17.89667, 62.51167), Gp(18.06, 62.6), Gp(18.47167, 62.855), Gp(18.625, 62.945), Gp(19.09, 63.205), Gp(19.2, 63.25167), Gp(19.68167, 63.32167), Gp(20.03, 63.41333), Gp(20.74333, 63.575), Gp(20.78667, 63.58833), Gp(20.925, 63.67333), Gp(20.93667, 63.68333), Gp(21.02, 63.81), Gp(21.01667, 63.81333), Gp(20.915, 63.98333), Gp(21.135, 64.16167), Gp(21.52, 64.335), Gp(21.61833, 64.43333), Gp(21.62333, 64.455), Gp(21.51, 64.595), Gp(21.30333, 64.87), Gp(21.56833, 65.03167), Gp(21.89, 65.12833), Gp(22.61667, 65.28167), Gp(22.77, 65.46333), Gp(23.56167, 65.52), Gp(23.95333, 65.58667)])
 ]
 
+# in_which and the other lookups use the indexes of the area lists, made here
+for _areas in (BalticSeaAreas, BalticSeaMainAreas, economiczones, territorialwaters, baselines):
+    area_index(_areas)
+
 def isinarea(aPoint, aBorder):
     """ This checks if aPoint is inside the area surrounded by aBorder.
     The border should be a list of Gp-points. The point can be
@@ -158,11 +163,12 @@ def gsw_Baltic(lon, lat):
     
 def in_which(aPoint, areas, par, def_val):
     """ Check in which area within a area list aPoint is."""
-    for a in areas:
-        if isinarea(aPoint, a.border):
-            for name in a._fields:
-                if name == par:
-                    return getattr(a, par)
+    i = area_index(areas).first(aPoint)
+    if i >= 0:
+        a = areas[i]
+        for name in a._fields:
+            if name == par:
+                return getattr(a, par)
     return ''
 
 def Helcom_areacode(aPoint):
@@ -175,9 +181,10 @@ def sea_area_name(aPoint):
     return in_which(aPoint, BalticSeaAreas, 'name', '')
 
 def Helcom_area_and_basin_name(aPoint):
-    for area in BalticSeaAreas:
-        if isinarea(aPoint, area.border) == True:
-            return f"{area.name}, {area.basin}"
+    i = area_index(BalticSeaAreas).first(aPoint)
+    if i >= 0:
+        area = BalticSeaAreas[i]
+        return f"{area.name}, {area.basin}"
     return ''
 
 def getBalticSeaMainAreaName(aPoint):
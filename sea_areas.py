@@ -11,7 +11,10 @@ Wiley 2008
 
 Pekka Alenius 2021-05-07
 '''
+import math
 from math import pi, radians, cos, sin, asin, sqrt
+from collections import namedtuple
+import download_cache as dc
 
 BalticSeaAreas = [
     {'name': 'Bothnian Bay',           'basin': 'Gulf of Bothnia', 'fmicode': 'A', 'mccode': 1110, 'file': 'BothnianBay.csv',          'border': [[20.964, 64.457], [20.436, 65.131], [22.207, 66.099], [23.600, 66.136], [24.811, 66.186], [25.875, 65.664], [26.000, 65.000], [22.532, 63.212], [22.331, 63.466], [21.000, 63.800], [20.587, 63.803], [20.964, 64.457]]},
@@ -79,10 +82,166 @@ baselines = [
     {'name': 'Finland', 'ISOcode': 'FI', 'bordertype': 'B', 'border': [[27.62, 60.32417],[27.57867, 60.30967],[27.27383, 60.265],[27.03083, 60.23733],[26.2625, 60.16117],[25.79467, 60.04033],[25.136, 60.09067],[24.89517, 60.0355],[24.30617, 59.86833],[23.59167, 59.787],[23.399, 59.74767],[22.97383, 59.74933],[22.41833, 59.71383],[21.5015, 59.675],[20.73917, 59.73617],[19.7855, 59.808],[19.304, 60.15667],[19.13533, 60.30033],[19.13583, 60.30133],[19.399, 60.43167],[19.70933, 60.49783],[20.20867, 60.54017],[20.744, 60.76583],[21.17017, 61.05083],[21.27083, 61.42233],[21.32917, 61.64633],[21.2345, 62.0165],[21.08667, 62.41333],[20.837, 62.7845],[20.73833, 62.96083],[20.58433, 63.23717],[20.78917, 63.42433],[21.14133, 63.45333],[21.744, 63.47483],[22.16217, 63.5285],[22.52333, 63.7515],[22.6235, 63.864],[22.65233, 63.88667],[22.66417, 63.8955],[22.71633, 63.92833],[22.74117, 63.93733],[22.81067, 63.9605],[23.39917, 64.09283],[23.447, 64.333],[24.2525, 64.53783],[24.32267, 64.6815],[24.551, 65.03967],[24.65517, 65.33583],[24.3135, 65.564],[24.03083, 65.59933]]},
     {'name': 'Sweden',  'ISOcode': 'SE', 'bordertype': 'B', 'border': [[10.92, 58.94167],[10.96167, 58.93],[10.96, 58.93],[10.96333, 58.88833],[10.97833, 58.77833],[11.02167, 58.53667],[11.20667, 58.32833],[11.32833, 58.095],[11.43833, 57.895],[11.59167, 57.63667],[11.89667, 57.29667],[12.11, 57.15167],[12.24333, 57.06333],[12.35833, 56.91833],[12.52, 56.83],[12.62333, 56.73],[12.71, 56.64833],[12.54333, 56.45167],[12.44833, 56.30333],[12.88667, 55.52],[12.84167, 55.45333],[12.82667, 55.41667],[12.81333, 55.37833],[12.80667, 55.365],[12.80833, 55.35667],[12.81667, 55.33667],[12.935, 55.37833],[13.05333, 55.375],[13.06133, 55.37483],[13.073, 55.37083],[13.0855, 55.36767],[13.097, 55.373],[13.10933, 55.376],[13.1225, 55.37567],[13.13483, 55.3725],[13.14883, 55.37233],[13.15967, 55.3675],[13.17467, 55.36833],[13.187, 55.3665],[13.20583, 55.36283],[13.22067, 55.35917],[13.23117, 55.354],[13.24383, 55.35233],[13.2555, 55.3495],[13.26833, 55.34583],[13.28067, 55.34283],[13.29333, 55.34217],[13.3085, 55.3405],[13.32417, 55.34183],[13.339, 55.33967],[13.3525, 55.33683],[13.36617, 55.3365],[13.37983, 55.34233],[13.39283, 55.34783],[13.4045, 55.35133],[13.417, 55.35267],[13.42917, 55.35483],[13.44517, 55.36383],[13.45517, 55.3685],[13.4725, 55.37383],[13.4865, 55.37917],[13.50367, 55.38333],[13.52133, 55.38467],[13.53433, 55.38533],[13.54883, 55.38567],[13.56167, 55.38333],[13.57567, 55.38433],[13.58817, 55.3865],[13.60133, 55.388],[13.6075, 55.395],[13.614, 55.40167],[13.623, 55.40833],[13.633, 55.413],[13.64517, 55.41633],[13.65967, 55.41667],[13.674, 55.41617],[13.68733, 55.41667],[13.699, 55.4205],[13.70983, 55.42433],[13.72317, 55.4255],[13.73667, 55.42417],[13.75217, 55.42483],[13.76567, 55.42483],[13.77933, 55.4235],[13.79333, 55.42217],[13.80667, 55.42383],[13.82283, 55.42417],[13.83533, 55.4215],[13.84833, 55.41967],[13.85717, 55.425],[13.87167, 55.4295],[13.88683, 55.43217],[13.90233, 55.43333],[13.91767, 55.43267],[13.93667, 55.4315],[13.9495, 55.429],[13.96117, 55.42567],[13.97433, 55.42133],[13.98633, 55.41683],[13.99817, 55.4105],[14.0095, 55.40467],[14.02633, 55.39617],[14.0365, 55.3915],[14.0465, 55.38617],[14.05667, 55.38017],[14.06867, 55.38267],[14.0825, 55.38383],[14.096, 55.38283],[14.10867, 55.382],[14.12167, 55.38033],[14.13517, 55.37733],[14.14917, 55.37583],[14.16533, 55.37617],[14.18033, 55.37717],[14.19367, 55.37983],[14.204, 55.38483],[14.21283, 55.394],[14.21967, 55.40167],[14.22633, 55.411],[14.23167, 55.41783],[14.2365, 55.42517],[14.24517, 55.43667],[14.25433, 55.44233],[14.266, 55.44633],[14.27417, 55.45233],[14.28183, 55.45933],[14.2855, 55.46767],[14.29367, 55.47383],[14.30283, 55.47933],[14.31383, 55.4835],[14.32183, 55.49017],[14.33017, 55.49667],[14.33783, 55.50267],[14.35217, 55.50733],[14.3535, 55.51483],[14.35267, 55.52233],[14.358, 55.52967],[14.3625, 55.53783],[14.36267, 55.54567],[14.36583, 55.55317],[14.35667, 55.55833],[14.34733, 55.56367],[14.34333, 55.57183],[14.33967, 55.57983],[14.33533, 55.587],[14.325, 55.5915],[14.31517, 55.59783],[14.3045, 55.60483],[14.302, 55.612],[14.289, 55.61783],[14.286, 55.62533],[14.2835, 55.63517],[14.28233, 55.64417],[14.28183, 55.652],[14.28333, 55.66083],[14.27917, 55.668],[14.27333, 55.67467],[14.25917, 55.68017],[14.24667, 55.68233],[14.236, 55.68633],[14.22467, 55.69067],[14.21717, 55.69717],[14.20867, 55.70283],[14.20717, 55.71083],[14.2035, 55.71867],[14.2005, 55.72683],[14.19867, 55.73417],[14.19867, 55.74183],[14.19967, 55.74917],[14.20067, 55.75667],[14.20217, 55.764],[14.204, 55.77267],[14.2055, 55.78],[14.20833, 55.78767],[14.21167, 55.797],[14.215, 55.80517],[14.21717, 55.8125],[14.2215, 55.82067],[14.22517, 55.82833],[14.22917, 55.837],[14.23333, 55.844],[14.23917, 55.852],[14.244, 55.85983],[14.24917, 55.8675],[14.25533, 55.875],[14.26217, 55.882],[14.26883, 55.88833],[14.27783, 55.8955],[14.28683, 55.90067],[14.29783, 55.90517],[14.31033, 55.90983],[14.30667, 55.90667],[14.72333, 55.99333],[14.845, 56.0],[14.86, 56.005],[14.975, 56.11],[15.47833, 56.08],[15.70167, 55.94667],[15.70667, 55.94833],[15.79333, 56.01167],[16.405, 56.195],[16.76667, 56.73333],[16.85, 56.82],[16.87167, 56.84667],[17.07667, 57.17833],[17.08667, 57.22833],[17.155, 57.30833],[17.13, 57.35667],[16.83167, 57.595],[16.90667, 57.685],[16.85167, 57.84333],[17.16667, 58.31],[17.22167, 58.535],[17.97333, 58.71167],[17.975, 58.71333],[18.02333, 58.73167],[18.59, 58.95833],[18.61667, 58.97167],[18.805, 59.06667],[19.19333, 59.30667],[19.50167, 59.41833],[19.645, 59.62],[19.46333, 59.73833],[19.37333, 59.79333],[19.09667, 59.89333],[18.86167, 60.04],[18.91667, 60.22167],[18.92, 60.24],[18.925, 60.27667],[18.82833, 60.42833],[18.50333, 60.51667],[18.02167, 60.64167],[17.52167, 60.82167],[17.34333, 61.175],[17.40167, 61.27833],[17.47167, 61.54333],[17.56, 61.72333],[17.64667, 62.01667],[17.74833, 62.21833],[17.89667, 62.51167],[18.06, 62.6],[18.47167, 62.855],[18.625, 62.945],[19.09, 63.205],[19.2, 63.25167],[19.68167, 63.32167],[20.03, 63.41333],[20.74333, 63.575],[20.78667, 63.58833],[20.925, 63.67333],[20.93667, 63.68333],[21.02, 63.81],[21.01667, 63.81333],[20.915, 63.98333],[21.135, 64.16167],[21.52, 64.335],[21.61833, 64.43333],[21.62333, 64.455],[21.51, 64.595],[21.30333, 64.87],[21.56833, 65.03167],[21.89, 65.12833],[22.61667, 65.28167],[22.77, 65.46333],[23.56167, 65.52],[23.95333, 65.58667]]}]
 
+class AreaPolygon(namedtuple('AreaPolygon', 'ring bbox edges buckets bucket_lat bucket_height')):
+#==================================================================================================
+# Immutable, precompiled form of a border for repeated point-in-polygon tests.
+# ring    - closed tuple of (lon, lat) points
+# bbox    - (minlon, minlat, maxlon, maxlat)
+# edges   - (ey, ly, ex, lx, lon0, lat0, kk) for every non-horizontal edge:
+#           latitude and longitude ranges, start point and slope dlon/dlat.
+#           Horizontal edges never count in isInsideBorder, so they are dropped.
+# buckets - the edges split into latitude bands of bucket_height starting
+#           from bucket_lat. An edge is in every band its latitude range
+#           touches, so a point only needs the edges of its own band.
+    __slots__ = ()
+
+    @classmethod
+    def from_border(cls, aBorder):
+        ring = tuple((p[0], p[1]) for p in aBorder)
+        if ring[-1] != ring[0]:
+            ring = ring + (ring[0],)
+        lon = [p[0] for p in ring]
+        lat = [p[1] for p in ring]
+        edges = []
+        for i in range(len(ring) - 1):
+            if lat[i + 1] != lat[i]:
+                edges.append((min(lat[i], lat[i + 1]), max(lat[i], lat[i + 1]),
+                              min(lon[i], lon[i + 1]), max(lon[i], lon[i + 1]),
+                              lon[i], lat[i],
+                              (lon[i + 1] - lon[i])/(lat[i + 1] - lat[i])))
+
+        nb = max(1, len(edges)//4)
+        bucket_lat = min(lat)
+        bucket_height = (max(lat) - bucket_lat)/nb or 1.0
+        buckets = [[] for _ in range(nb)]
+        for e in edges:
+            b1 = min(int((e[0] - bucket_lat)/bucket_height), nb - 1)
+            b2 = min(int((e[1] - bucket_lat)/bucket_height), nb - 1)
+            for b in range(b1, b2 + 1):
+                buckets[b].append(e)
+        return cls(ring, (min(lon), min(lat), max(lon), max(lat)), tuple(edges),
+                   tuple(tuple(b) for b in buckets), bucket_lat, bucket_height)
+
+    def contains(self, aPoint):
+        xp = aPoint[0]
+        yp = aPoint[1]
+        minlon, minlat, maxlon, maxlat = self.bbox
+        if not (minlon <= xp <= maxlon and minlat <= yp <= maxlat):
+            return False
+        buckets = self.buckets
+        b = min(int((yp - self.bucket_lat)/self.bucket_height), len(buckets) - 1)
+        inside = False
+        for ey, ly, ex, lx, lon0, lat0, kk in buckets[b]:
+            if ey <= yp < ly:
+                if xp <= ex or (xp <= lx and (lon0 + kk*(yp - lat0) - xp) >= 0.0):
+                    inside = not inside
+        return inside
+
+class STRtree:
+#=============
+# Static R-tree of bounding boxes (minlon, minlat, maxlon, maxlat) packed
+# with the Sort-Tile-Recursive algorithm. query(aPoint) returns the indices
+# of the boxes that contain the point, in increasing order.
+    def __init__(self, bboxes, node_size=4):
+        self.node_size = node_size
+        # leaf entries are (bbox, item index), inner entries (bbox, node)
+        # where node is a tuple of at most node_size entries
+        entries = [(tuple(b), i) for i, b in enumerate(bboxes)]
+        while len(entries) > node_size:
+            entries = [(self._union(node), node) for node in self._pack(entries)]
+        self.root = entries
+
+    def _pack(self, entries):
+        m = self.node_size
+        n_nodes = -(-len(entries)//m)
+        n_slices = max(1, math.ceil(math.sqrt(n_nodes)))
+        per_slice = n_slices*m
+        entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+        nodes = []
+        for s in range(0, len(entries), per_slice):
+            tile = sorted(entries[s:s + per_slice], key=lambda e: e[0][1] + e[0][3])
+            for k in range(0, len(tile), m):
+                nodes.append(tuple(tile[k:k + m]))
+        return nodes
+
+    @staticmethod
+    def _union(node):
+        return (min(e[0][0] for e in node), min(e[0][1] for e in node),
+                max(e[0][2] for e in node), max(e[0][3] for e in node))
+
+    def query(self, aPoint):
+        xp = aPoint[0]
+        yp = aPoint[1]
+        result = []
+        stack = list(self.root)
+        while stack:
+            (minlon, minlat, maxlon, maxlat), child = stack.pop()
+            if minlon <= xp <= maxlon and minlat <= yp <= maxlat:
+                if isinstance(child, int):
+                    result.append(child)
+                else:
+                    stack.extend(child)
+        result.sort()
+        return result
+
+class AreaIndex:
+#===============
+# Compiled area list: the AreaPolygons of the areas and an STRtree of their
+# bounding boxes. first(aPoint) gives the same area as looping over the list
+# in order, but only the polygons whose bbox contains the point are tested.
+    def __init__(self, areas):
+        self.areas = areas
+        self.polygons = tuple(AreaPolygon.from_border(a['border'] if isinstance(a, dict) else a.border)
+                              for a in areas)
+        self.tree = STRtree([p.bbox for p in self.polygons])
+
+    def first(self, aPoint):
+        for i in self.tree.query(aPoint):
+            if self.polygons[i].contains(aPoint):
+                return i
+        return -1
+
+_area_indexes = {}
+# Counts the calls of forget_area_index, so that results derived from the
+# area lists (e.g. sea_area_cache) can notice that they may have changed
+area_generation = 0
+
+def area_index(areas):
+#=====================
+# Returns the AreaIndex of the area list areas (dicts with 'border' or
+# namedtuples with .border). The area lists of this unit and sea_area_tuples
+# are indexed at import, other lists at first use.
+# The index is kept for the list object, not for its contents: a list that is
+# changed after its first use keeps its old index until forget_area_index.
+    key = id(areas)
+    if key not in _area_indexes:
+        # the index keeps the area list, so that its id stays unique
+        _area_indexes[key] = AreaIndex(areas)
+    return _area_indexes[key]
+
+def forget_area_index(areas=None):
+#==================================
+# Drops the AreaIndex of the area list areas (of all lists if None), so that
+# the next lookup indexes the list as it is now
+    global area_generation
+    if areas is None:
+        _area_indexes.clear()
+    else:
+        _area_indexes.pop(id(areas), None)
+    area_generation += 1
+    if areas is None or any(areas is a for a in _locate_layers):
+        _index_locate_layers()
+
+def polygons(areas):
+#===================
+# Returns the AreaPolygons of the area list areas, compiled once
+    return area_index(areas).polygons
+
 def isInsideBorder(aPoint, aBorder):
 #==================================}
 # Checks if aPoint is inside area surrounded by aBorder
 # All points ([x, y]) are geographical longitudes (x) and latitudes (y)
+# For the area lists of this unit use polygons(areas) that are compiled once.
 
     xp = aPoint[0]
     yp = aPoint[1]
@@ -136,10 +295,10 @@ def gsw_Baltic(lon, lat):
     
 def in_which(aPoint, borders, par, def_val):
 #===========================================
-    for b in borders:
-        if isInsideBorder(aPoint, b['border']):
-            return b[par]
-    return def_val
+    i = area_index(borders).first(aPoint)
+    if i < 0:
+        return def_val
+    return borders[i][par]
 
 
 def getFMIHelcomAreaCode(aPoint):
@@ -161,10 +320,10 @@ def getHelcomAreaAndBasinNames(aPoint):
 #======================================
 # This code returns the HELCOM-area code of aPoint [lon,lat]
     result = ''
-    for area in BalticSeaAreas:
-        if isInsideBorder(aPoint,area['border']) == True:
-            result = f"{area['name']}, {area['basin']}"
-            break
+    i = area_index(BalticSeaAreas).first(aPoint)
+    if i >= 0:
+        area = BalticSeaAreas[i]
+        result = f"{area['name']}, {area['basin']}"
     return result
 
 def getBalticSeaMainAreaName(aPoint):
@@ -192,6 +351,155 @@ def getMyCruiseCountryCode(aPoint):
 # This code returns the country of the economic zone of aPoint [lon,lat]
     return in_which(aPoint, economiczones, 'mccode', '0')
 
+area_layers = {
+    'BalticSeaAreas': BalticSeaAreas,
+    'BalticSeaMainAreas': BalticSeaMainAreas,
+    'economiczones': economiczones,
+    'territorialwaters': territorialwaters,
+    'baselines': baselines,
+}
+
+for _areas in area_layers.values():
+    area_index(_areas)
+
+def area_indices(lons, lats, areas):
+#===================================
+# Vectorized version of in_which: for each point (lons[i], lats[i]) returns
+# the index of the first area in areas that contains the point, -1 if none.
+# The edge-crossing rules are exactly those of isInsideBorder.
+    import numpy as np
+
+    x = np.asarray(lons, dtype=float).ravel()
+    y = np.asarray(lats, dtype=float).ravel()
+    result = np.full(x.shape, -1, dtype=np.int32)
+    for k, polygon in enumerate(polygons(areas)):
+        minlon, minlat, maxlon, maxlat = polygon.bbox
+        # only points not yet classified and inside the bounding box
+        cand = np.flatnonzero((result < 0) &
+                              (x >= minlon) & (x <= maxlon) &
+                              (y >= minlat) & (y <= maxlat))
+        if len(cand) == 0:
+            continue
+        # sort the candidates by latitude so that the points within the
+        # latitude band of an edge are a contiguous slice
+        order = np.argsort(y[cand], kind='stable')
+        cand = cand[order]
+        xs = x[cand]
+        ys = y[cand]
+        over = np.zeros(len(cand), dtype=bool)
+        for ey, ly, ex, lx, lon0, lat0, kk in polygon.edges:
+            lo = np.searchsorted(ys, ey, 'left')
+            hi = np.searchsorted(ys, ly, 'left')
+            if lo == hi:
+                continue
+            px = xs[lo:hi]
+            over[lo:hi] ^= (px <= ex) | ((px <= lx) & ((lon0 + kk*(ys[lo:hi] - lat0) - px) >= 0.0))
+        result[cand[over]] = k
+    return result.reshape(np.shape(lons))
+
+def border_hash(*layers):
+#=========================
+# Returns a hash of the area data (names, codes and borders) of the given
+# area lists, by default of all lists in area_layers. Files derived from the
+# borders store this to notice when the polygon data has changed.
+    import hashlib
+
+    if not layers:
+        layers = tuple(area_layers.values())
+    h = hashlib.sha1()
+    for areas in layers:
+        for a in areas:
+            h.update(repr(a).encode())
+    return h.hexdigest()
+
+def classify_points(lons, lats, layer, par='mccode', def_val=0):
+#===============================================================
+# Vectorized version of the in_which based lookups for NumPy arrays of
+# longitudes and latitudes. layer is one of the area lists or its name in
+# area_layers, e.g. classify_points(lons, lats, 'economiczones') gives the
+# same codes as getMyCruiseCountryCode point by point.
+# Baselines have no mccode, so use par='ISOcode' or par='name' with them.
+    import numpy as np
+
+    if isinstance(layer, str):
+        layer = area_layers[layer]
+    idx = area_indices(lons, lats, layer)
+    codes = np.array([a[par] for a in layer] + [def_val])
+    return codes[idx]
+
+# The fields of a locate record and the (area list, field, default) they come from.
+# The defaults are those of the single lookups, e.g. getMyCruiseCountryCode.
+location_fields = (
+    ('sea_area',          BalticSeaAreas,     'name',   ''),
+    ('mccode',            BalticSeaAreas,     'mccode', ''),
+    ('main_area',         BalticSeaMainAreas, 'basin',  ''),
+    ('economic_zone',     economiczones,      'name',   ''),
+    ('country_code',      economiczones,      'mccode', '0'),
+    ('territorial_water', territorialwaters,  'name',   ''),
+    ('baseline',          baselines,          'name',   ''),
+)
+
+Location = namedtuple('Location', [f[0] for f in location_fields])
+
+# All polygons of the layers used by locate in one STRtree, so that one
+# query gives the candidates of every layer. The entries are in layer
+# order and in list order within a layer, as are the sorted query results.
+_locate_layers = (BalticSeaAreas, BalticSeaMainAreas, economiczones, territorialwaters, baselines)
+
+def _index_locate_layers():
+    global _locate_entries, _locate_tree
+    _locate_entries = [(n, i, polygon)
+                       for n, areas in enumerate(_locate_layers)
+                       for i, polygon in enumerate(polygons(areas))]
+    _locate_tree = STRtree([e[2].bbox for e in _locate_entries])
+
+_index_locate_layers()
+# the layer number of each field of Location
+_location_layer = tuple(next(n for n, areas in enumerate(_locate_layers) if areas is f[1])
+                        for f in location_fields)
+
+def locate(aPoint):
+#==================
+# Returns a Location record of aPoint [lon,lat] with the results of
+# getSeaAreaName, getMyCruiseHelcomAreaCode, getBalticSeaMainAreaName,
+# whosEconomicZone, getMyCruiseCountryCode, whosTerritorialWater and whosBaseline
+# from a single R-tree query over all the layers
+    hits = [-1]*len(_locate_layers)
+    for k in _locate_tree.query(aPoint):
+        n, i, polygon = _locate_entries[k]
+        if hits[n] < 0 and polygon.contains(aPoint):
+            hits[n] = i
+    result = []
+    for (name, areas, par, def_val), n in zip(location_fields, _location_layer):
+        i = hits[n]
+        result.append(areas[i][par] if i >= 0 else def_val)
+    return Location(*result)
+
+def locate_many(points):
+#=======================
+# Batch form of locate for a sequence of [lon, lat] points or an (n, 2) array.
+# Returns a NumPy structured array with the fields of Location. The codes
+# mccode and country_code are integers there, 0 when the point is outside.
+# Unlike locate this does not query _locate_tree: each of the five layers is
+# one vectorized area_indices pass over all the points, and the fields of a
+# layer (e.g. sea_area and mccode) share its pass.
+    import numpy as np
+
+    p = np.asarray(points, dtype=float).reshape(-1, 2)
+    hits = [area_indices(p[:, 0], p[:, 1], areas) for areas in _locate_layers]
+    columns = []
+    for (name, areas, par, def_val), n in zip(location_fields, _location_layer):
+        values = [a[par] for a in areas]
+        if isinstance(values[0], int):
+            values = np.array(values + [0], dtype=np.int32)
+        else:
+            values = np.array(values + [def_val])
+        columns.append((name, values[hits[n]]))
+    result = np.empty(len(p), dtype=[(name, c.dtype) for name, c in columns])
+    for name, c in columns:
+        result[name] = c
+    return result
+
 def gcDistance_nmi(aPoint, bPoint):
 #==================================
 # Gives distance between points a and b in nautical miles
@@ -203,23 +511,92 @@ def gcDistance_nmi(aPoint, bPoint):
 
     return round((60*180/pi)*2*asin(sqrt(sin((la1 - la2)/2)*sin((la1 - la2)/2)+cos(la1)*cos(la2)*sin((lo1 - lo2)/2)*sin((lo1 - lo2)/2))),6)
 
-def getStationName(aPoint):
-#==========================
-    name = ''
-    with open('/Users/pekka/PythonOhjelmia/JupyterNotebooks/itameren_ices_asemat.txt','r') as statfile:
-        stations = statfile.read().split('\n')
-    for station in stations:
-        s = station.split(';')
-        if gcDistance_nmi(aPoint,[float(s[4]),float(s[3])]) < 1.0:
-            name = s[2]
-    return name
-
-def get_station_list():
-#======================
-    import requests
-    url = 'https://raw.githubusercontent.com/pekkaalenius/MyCruise/main/asemat.txt'
-    result = requests.get(url, allow_redirects=True)
-    rd = result.text.split('\n')[:-2]
+def gcDistances_nmi(alons, alats, blons, blats):
+#===============================================
+# Vectorized gcDistance_nmi: distances in nautical miles between the points
+# (alons, alats) and (blons, blats) element by element. The arrays are
+# broadcast against each other and the results are not rounded.
+    import numpy as np
+
+    lo1 = np.radians(np.asarray(alons, dtype=float))
+    la1 = np.radians(np.asarray(alats, dtype=float))
+    lo2 = np.radians(np.asarray(blons, dtype=float))
+    la2 = np.radians(np.asarray(blats, dtype=float))
+    sla = np.sin((la1 - la2)/2)
+    slo = np.sin((lo1 - lo2)/2)
+    return (60*180/pi)*2*np.arcsin(np.sqrt(sla*sla + np.cos(la1)*np.cos(la2)*slo*slo))
+
+def gcDistance_matrix_nmi(alons, alats, blons, blats):
+#=====================================================
+# Returns the N x M matrix of distances in nautical miles from the N points
+# (alons, alats) to the M points (blons, blats)
+    import numpy as np
+
+    return gcDistances_nmi(np.asarray(alons, dtype=float)[:, None], np.asarray(alats, dtype=float)[:, None],
+                           np.asarray(blons, dtype=float)[None, :], np.asarray(blats, dtype=float)[None, :])
+
+def route_leg_distances_nmi(lons, lats):
+#=======================================
+# Returns the lengths in nautical miles of the n-1 legs of a route of n points
+    import numpy as np
+
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    return gcDistances_nmi(lons[:-1], lats[:-1], lons[1:], lats[1:])
+
+def route_distances_nmi(lons, lats):
+#===================================
+# Returns the distance in nautical miles along the route from its first point
+# to each of its n points, the first one being 0
+    import numpy as np
+
+    d = np.zeros(len(lons))
+    if len(lons) > 1:
+        np.cumsum(route_leg_distances_nmi(lons, lats), out=d[1:])
+    return d
+
+station_name_file = '/Users/pekka/PythonOhjelmia/JupyterNotebooks/itameren_ices_asemat.txt'
+_station_name_index = None
+
+def getStationName(aPoint, index=None):
+#======================================
+# Returns the name of the station nearest to aPoint [lon,lat] if it is
+# closer than 1 nmi, otherwise ''. The stations are those of
+# station_name_file (name;lat;lon in columns 3-5), read and indexed once,
+# or those of the given station_index.StationIndex.
+    global _station_name_index
+    if index is None:
+        if _station_name_index is None:
+            import station_index
+            names = []
+            lats = []
+            lons = []
+            with open(station_name_file,'r') as statfile:
+                for station in statfile.read().split('\n'):
+                    if station.strip() == '':
+                        continue
+                    s = station.split(';')
+                    names.append(s[2])
+                    lats.append(float(s[3]))
+                    lons.append(float(s[4]))
+            _station_name_index = station_index.StationIndex(lons, lats, names)
+        index = _station_name_index
+    nearest = index.nearest(aPoint, 1)
+    if not nearest or nearest[0][0] >= 1.0:
+        return ''
+    station = nearest[0][1]
+    if isinstance(station, str):
+        return station
+    if isinstance(station, dict):
+        return station['name']
+    return station.name
+
+def get_station_list(url='https://raw.githubusercontent.com/pekkaalenius/MyCruise/main/asemat.txt',
+                     max_age=dc.DEFAULT_MAX_AGE, cache_dir=None):
+#================================================================================================
+# The download is cached locally, see download_cache
+    text = dc.fetch_text(url, max_age=max_age, cache_dir=cache_dir)
+    rd = text.split('\n')[:-2]
     station = []
     for r in rd:
         n, la, lo, d, c, s, t, v, y, a = r.split(';')
@@ -0,0 +1,355 @@
+'''
+Binary columnar station catalog
+
+The Aranda station list (stations.txt, see station_dictionaries) is
+converted once into a compact binary file with one column per field:
+float64 lat, lon and depth, int32 country, sea_area, visits, first_year
+and years, and names and types as int32 ids into an interned string table.
+
+load_catalog memory-maps the file and returns a StationCatalog whose
+columns are views into the mapped file without copying. Rows are
+materialized only when asked for. open_catalog keeps a binary sidecar
+next to a text station list and rebuilds it when the text file changes.
+
+usage:
+import station_catalog as sc
+catalog = sc.open_catalog('stations.txt')
+catalog.column('lat')        -> numpy array
+catalog[10].name             -> row view
+catalog.rows()               -> tuples (name, lat, lon, depth, country,
+                                sea_area, type, visits, first_year, years)
+sc.iter_rows('stations.txt', sea_area=1200, min_visits=5)
+                             -> generator of the matching row tuples
+'''
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+import download_cache as dc
+
+CATALOG_MAGIC = b'MCSTCAT1'
+CATALOG_SUFFIX = '.stcat'
+
+# The fields of a station row in file order and their column types.
+# 'str' columns are int32 ids into the string table.
+catalog_fields = (
+    ('name', 'str'),
+    ('lat', '<f8'),
+    ('lon', '<f8'),
+    ('depth', '<f8'),
+    ('country', '<i4'),
+    ('sea_area', '<i4'),
+    ('type', 'str'),
+    ('visits', '<i4'),
+    ('first_year', '<i4'),
+    ('years', '<i4'),
+)
+
+
+def parse_station_rows(fname):
+    """ Reads the rows of a text station list as tuples of catalog_fields.
+        The header line is skipped, a malformed row raises ValueError.
+    """
+    rows = []
+    with open(fname, 'r') as f:
+        for row in f:
+            row = row.rstrip('\n')
+            if row == '' or row.startswith('name;'):
+                continue
+            r = row.split(';')
+            if len(r) < 10:
+                raise ValueError(f'{fname}: malformed station row {row!r}')
+            rows.append((r[0], float(r[1]), float(r[2]), float(r[3]), int(r[4]), int(r[5]),
+                         r[6], int(r[7]), int(r[8]), int(r[9])))
+    return rows
+
+
+def write_catalog(rows, cat_fname, source=None):
+    """ Writes station rows (tuples of catalog_fields) into a binary catalog.
+        source is stored in the header, open_catalog uses it to check that
+        the catalog is up to date with its text file.
+    """
+    strings = {}
+    columns = []
+    for k, (name, dtype) in enumerate(catalog_fields):
+        values = [r[k] for r in rows]
+        if dtype == 'str':
+            values = [strings.setdefault(v, len(strings)) for v in values]
+            dtype = '<i4'
+        columns.append((name, np.array(values, dtype=dtype)))
+    blob = b''.join(s.encode('utf-8') for s in strings)
+    offsets = np.zeros(len(strings) + 1, dtype='<i4')
+    np.cumsum([len(s.encode('utf-8')) for s in strings], out=offsets[1:])
+    columns.append(('_string_offsets', offsets))
+    columns.append(('_strings', np.frombuffer(blob, dtype=np.uint8)))
+
+    # the header is followed by the columns, each aligned to 8 bytes
+    layout = {}
+    position = 0
+    for name, array in columns:
+        layout[name] = [array.dtype.str, position, len(array)]
+        position += -(-array.nbytes//8)*8
+    header = json.dumps({'n': len(rows), 'columns': layout, 'source': source}).encode()
+    header = header + b' '*(-(len(CATALOG_MAGIC) + 4 + len(header)) % 8)
+
+    with dc.atomic_write(cat_fname) as f:
+        f.write(CATALOG_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for name, array in columns:
+            data = array.tobytes()
+            f.write(data)
+            f.write(b'\0'*(-len(data) % 8))
+
+
+def build_catalog(fname, cat_fname=None):
+    """ Converts a text station list into a binary catalog file.
+        Returns the name of the catalog file.
+    """
+    if cat_fname is None:
+        cat_fname = os.path.splitext(fname)[0] + CATALOG_SUFFIX
+    st = os.stat(fname)
+    write_catalog(parse_station_rows(fname), cat_fname,
+                  {'file': os.path.abspath(fname), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns})
+    return cat_fname
+
+
+class StationRow:
+    """ Lazy view of one row of a StationCatalog."""
+    __slots__ = ('_catalog', '_i')
+
+    def __init__(self, catalog, i):
+        self._catalog = catalog
+        self._i = i
+
+    def __getattr__(self, name):
+        try:
+            return self._catalog.value(name, self._i)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f'StationRow({self._catalog.row(self._i)})'
+
+
+class StationCatalog:
+    def __init__(self, cat_fname):
+        self.fname = cat_fname
+        mm = np.memmap(cat_fname, dtype=np.uint8, mode='r')
+        if bytes(mm[:len(CATALOG_MAGIC)]) != CATALOG_MAGIC:
+            raise ValueError(f'{cat_fname} is not a station catalog')
+        start = len(CATALOG_MAGIC) + 4
+        (hlen,) = struct.unpack('<I', bytes(mm[len(CATALOG_MAGIC):start]))
+        header = json.loads(bytes(mm[start:start + hlen]))
+        base = start + hlen
+        self.n = header['n']
+        self.source = header['source']
+        self._columns = {}
+        for name, (dtype, offset, length) in header['columns'].items():
+            dt = np.dtype(dtype)
+            self._columns[name] = mm[base + offset:base + offset + length*dt.itemsize].view(dt)
+        self._decoded = {}
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return StationRow(self, i)
+
+    def __iter__(self):
+        return (StationRow(self, i) for i in range(self.n))
+
+    def string(self, sid):
+        """ Returns the string with id sid from the string table."""
+        offsets = self._columns['_string_offsets']
+        return bytes(self._columns['_strings'][offsets[sid]:offsets[sid + 1]]).decode('utf-8')
+
+    def strings(self):
+        """ Returns the interned string table as a list, decoded once."""
+        if '_strings' not in self._decoded:
+            offsets = self._columns['_string_offsets'].tolist()
+            blob = bytes(self._columns['_strings'])
+            self._decoded['_strings'] = [blob[offsets[k]:offsets[k + 1]].decode('utf-8')
+                                         for k in range(len(offsets) - 1)]
+        return self._decoded['_strings']
+
+    def column(self, name):
+        """ Returns a column as a read-only array view into the file.
+            For name and type these are the string ids, see strings().
+        """
+        return self._columns[name]
+
+    def text_column(self, name):
+        """ Returns the name or type column as a list of strings."""
+        table = self.strings()
+        return [table[sid] for sid in self._columns[name].tolist()]
+
+    def value(self, name, i):
+        if dict(catalog_fields)[name] == 'str':
+            return self.string(int(self._columns[name][i]))
+        return self._columns[name][i].item()
+
+    def row(self, i):
+        return tuple(self.value(name, i) for name, _ in catalog_fields)
+
+    def rows(self):
+        """ Returns all rows as tuples of catalog_fields."""
+        cols = []
+        for name, dtype in catalog_fields:
+            if dtype == 'str':
+                cols.append(self.text_column(name))
+            else:
+                cols.append(self._columns[name].tolist())
+        return list(zip(*cols))
+
+
+def load_catalog(cat_fname):
+    return StationCatalog(cat_fname)
+
+
+def _is_catalog(fname):
+    with open(fname, 'rb') as f:
+        return f.read(len(CATALOG_MAGIC)) == CATALOG_MAGIC
+
+
+def _current_catalog(fname):
+    """ Returns the catalog sidecar of a text station list if it is up to
+        date with the text file, otherwise None.
+    """
+    cat_fname = os.path.splitext(fname)[0] + CATALOG_SUFFIX
+    if not os.path.isfile(cat_fname):
+        return None
+    st = os.stat(fname)
+    try:
+        catalog = load_catalog(cat_fname)
+    except (OSError, ValueError):
+        return None
+    source = catalog.source or {}
+    if source.get('size') == st.st_size and source.get('mtime_ns') == st.st_mtime_ns:
+        return catalog
+    return None
+
+
+def open_catalog(fname):
+    """ Returns the StationCatalog of a station list. fname can be a binary
+        catalog or a text station list, whose catalog sidecar (same name
+        with extension .stcat) is built or rebuilt when needed. If the
+        sidecar can not be written (e.g. a read-only or full file system),
+        the catalog is built into a temporary file.
+        A malformed text station list raises ValueError.
+    """
+    if _is_catalog(fname):
+        return load_catalog(fname)
+    catalog = _current_catalog(fname)
+    if catalog is not None:
+        return catalog
+    cat_fname = os.path.splitext(fname)[0] + CATALOG_SUFFIX
+    try:
+        return load_catalog(build_catalog(fname, cat_fname))
+    except OSError:
+        fd, tmp = tempfile.mkstemp(suffix=CATALOG_SUFFIX)
+        os.close(fd)
+        catalog = load_catalog(build_catalog(fname, tmp))
+        # the mapping stays valid after the file is removed (not on Windows)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return catalog
+
+
+#========================================================================
+# Filtered reading
+#========================================================================
+
+def _as_set(codes):
+    if codes is None:
+        return None
+    if isinstance(codes, (int, np.integer)):
+        return {int(codes)}
+    return {int(c) for c in codes}
+
+
+def _catalog_mask(catalog, bbox, sea_area, country, min_visits, first_year):
+    # the filters as a boolean mask over the catalog columns
+    mask = np.ones(len(catalog), dtype=bool)
+    if sea_area is not None:
+        mask &= np.isin(catalog.column('sea_area'), list(sea_area))
+    if country is not None:
+        mask &= np.isin(catalog.column('country'), list(country))
+    if min_visits is not None:
+        mask &= catalog.column('visits') >= min_visits
+    if first_year is not None:
+        y = catalog.column('first_year')
+        if first_year[0] is not None:
+            mask &= y >= first_year[0]
+        if first_year[1] is not None:
+            mask &= y <= first_year[1]
+    if bbox is not None:
+        lon = catalog.column('lon')
+        lat = catalog.column('lat')
+        mask &= (lon >= bbox[0]) & (lat >= bbox[1]) & (lon <= bbox[2]) & (lat <= bbox[3])
+    return mask
+
+
+def _iter_text_rows(fname, bbox, sea_area, country, min_visits, first_year):
+    # The integer codes are tested first and the coordinates next, the rest
+    # of a row is converted only when all filters match.
+    with open(fname, 'r') as f:
+        for row in f:
+            row = row.rstrip('\n')
+            if row == '' or row.startswith('name;'):
+                continue
+            r = row.split(';')
+            if len(r) < 10:
+                raise ValueError(f'{fname}: malformed station row {row!r}')
+            if sea_area is not None and int(r[5]) not in sea_area:
+                continue
+            if country is not None and int(r[4]) not in country:
+                continue
+            if min_visits is not None and int(r[7]) < min_visits:
+                continue
+            if first_year is not None:
+                y = int(r[8])
+                if (first_year[0] is not None and y < first_year[0]) or \
+                   (first_year[1] is not None and y > first_year[1]):
+                    continue
+            lat = float(r[1])
+            lon = float(r[2])
+            if bbox is not None and not (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+                continue
+            yield (r[0], lat, lon, float(r[3]), int(r[4]), int(r[5]),
+                   r[6], int(r[7]), int(r[8]), int(r[9]))
+
+
+def iter_rows(fname, bbox=None, sea_area=None, country=None, min_visits=None, first_year=None):
+    """ Yields the rows (tuples of catalog_fields) of a station list that
+        match all the given filters:
+        bbox       - [minlon, minlat, maxlon, maxlat], edges included
+        sea_area   - a sea area code or a collection of codes
+        country    - a country code or a collection of codes
+        min_visits - the least number of visits
+        first_year - (first, last) range of first_year, edges included,
+                     either can be None
+
+        A binary catalog, or the up to date catalog sidecar of a text file,
+        is filtered column-wise. Otherwise the text file is read line by
+        line without building the sidecar. A malformed row raises ValueError.
+    """
+    sea_area = _as_set(sea_area)
+    country = _as_set(country)
+    if _is_catalog(fname):
+        catalog = load_catalog(fname)
+    else:
+        catalog = _current_catalog(fname)
+    if catalog is None:
+        yield from _iter_text_rows(fname, bbox, sea_area, country, min_visits, first_year)
+        return
+    mask = _catalog_mask(catalog, bbox, sea_area, country, min_visits, first_year)
+    for i in np.flatnonzero(mask).tolist():
+        yield catalog.row(i)
@@ -1,7 +1,10 @@
-import urllib.request
-import zipfile
 from collections import namedtuple
 import sea_area_tuples as sa
+import station_catalog as sc
+import download_cache as dc
+import ices_stations as ics
+
+STATIONS_URL = 'https://raw.githubusercontent.com/pekkaalenius/MyCruise/main/stations.txt'
 
 Aranda_station = namedtuple("Aranda_station", \
     "name position depth country sea_area type visits first_year years")
@@ -10,16 +13,13 @@ ICES_station = namedtuple("ICESstation", \
 
 def read_station_dictionary(filename):
     """The Aranda station list is read from a local file, that
-       has been done with make_station_list_from_Sumppu
+       has been done with make_station_list_from_Sumppu.
+       The namedtuples are made from the binary station catalog.
     """
-    with open(filename, 'r') as f:
-        s = f.read().split('\n')
     stations = []
-    for r in s:
-        n, la, lo, d, c, s, t, v, y, a = r.split(';')
+    for n, la, lo, d, c, s, t, v, y, a in sc.open_catalog(filename).rows():
         stations.append(\
-            Aranda_station(n, sa.Gp(float(lo), float(la)), int(d), \
-                int(c), int(s), t, int(v), int(y), int(a)))
+            Aranda_station(n, sa.Gp(lo, la), int(d), c, s, t, v, y, a))
     return stations
 
 def read_Aranda_stations_to_namedtuples(fname):
@@ -28,39 +28,32 @@ def read_Aranda_stations_to_namedtuples(fname):
         In the Station namedtuple the latitude and longitude are joined to
         namedtuple position (lon, lat) for compatibility with sea_area_tuples.
         Position lon and lat: station.position.lat station.position.lon
+        The namedtuples are made from the binary station catalog, see station_catalog.
     """
-    stations = []
-    with open(fname, "r") as f:
-        fr = f.read().split('\n')
-        i = 0
-        j = len(fr)
-        if 'name' in fr[0]:
-            i = 1
-        if fr[-1] == '':
-            j = -1
-        fr = fr[i:j]
-
-        for row in fr:
-            r = row.split(';')
-            try:
-                stations.append(
-                    Aranda_station(
-                        r[0], sa.Gp(float(r[2]), float(r[1])), \
-                        float(r[3]), int(r[4]), int(r[5]), r[6], \
-                        int(r[7]), int(r[8]), int(r[9])))
-            except:
-                return False
-    return stations
+    try:
+        rows = sc.open_catalog(fname).rows()
+    except ValueError:
+        return False
+    return [Aranda_station(n, sa.Gp(lo, la), d, c, s, t, v, y, a)
+            for n, la, lo, d, c, s, t, v, y, a in rows]
+
+def iter_Aranda_stations(fname, **filters):
+    """ Yields Aranda stations of a txt-file as Aranda_station namedtuples
+        without reading the whole list into memory.
+        The filters bbox, sea_area, country, min_visits and first_year are
+        those of station_catalog.iter_rows, e.g.
+        iter_Aranda_stations('stations.txt', bbox=[19, 59, 23, 61], min_visits=10)
+    """
+    for n, la, lo, d, c, s, t, v, y, a in sc.iter_rows(fname, **filters):
+        yield Aranda_station(n, sa.Gp(lo, la), d, c, s, t, v, y, a)
 
-def get_station_dictionary():
+def get_station_dictionary(url=STATIONS_URL, max_age=dc.DEFAULT_MAX_AGE, cache_dir=None):
     """ This reads the Aranda station list from github (pekkaalenius).
         Note that the list may be old and does not contain all new stations.
+        The download is cached locally, see download_cache.
     """
-    import requests
-
-    url = 'https://raw.githubusercontent.com/pekkaalenius/MyCruise/main/stations.txt'
-    result = requests.get(url, allow_redirects=True)
-    rd = result.text.split('\n')[1:-1]
+    text = dc.fetch_text(url, max_age=max_age, cache_dir=cache_dir)
+    rd = text.split('\n')[1:-1]
     stations = []
     for r in rd:
         n, la, lo, d, c, s, t, v, a, y = r.split(';')
@@ -70,120 +63,56 @@ def get_station_dictionary():
                 int(c), int(s), t, int(v), int(a), int(y)))    
     return stations
 
-def get_station_dictionary_from_Sumppu(ahost, auser, apassword):
-    """ This generates a new Aranda station list from Sumppu. 
-        Connection to Sumppu has to be available.
+def get_station_dictionary_from_Sumppu(ahost, auser, apassword, pool=None):
+    """ This generates a new Aranda station list from Sumppu.
+        Connection to Sumppu has to be available. A connection pool can
+        be given as pool, see sumppu_stations.
     """
-    import mysql.connector
-
-    sumppu = mysql.connector.connect(
-        host=ahost,
-        user=auser,
-        passwd=apassword,
-        database="sumppu"
-    )
-    sumppu_cursor = sumppu.cursor()
+    import sumppu_stations as ss
 
-    sqlQuery =\
-        "select s.name,s.latitude,s.longitude,if(s.bottom_depth is NULL,-9,s.bottom_depth),v.nv,b.ym,a.ny "\
-        "from station s, "\
-        "(select station_id id,count(id) nv "\
-        "from visit group by `station_id`) v, "\
-        "(select id,count(y) ny "\
-        "from (select distinct station_id id,year(date_visited) y "\
-        "from visit order by station_id) d "\
-        "group by id) a, "\
-        "(select station_id id,year(min(date_visited)) ym "\
-        "from visit group by station_id) b "\
-        "where a.id=v.id and b.id=v.id and v.id=s.id order by s.name"
-    sumppu_cursor.execute(sqlQuery)
-    result = sumppu_cursor.fetchall()
+    pool = pool or ss.sumppu_pool(ahost, auser, apassword)
     stations = []
-    if len(result) > 0:
-        for x in result:
-            lat = float(x[1])
-            lon = float(x[2])
-            country = sa.getMyCruiseCountryCode([lon, lat])
-            area = sa.getMyCruiseHelcomAreaCode([lon, lat])
-            stations.append(
-                Aranda_station(x[0], sa.Gp(lon, lat), int(x[3]), \
-                country, area, 'S1', int(x[4]), int(x[5]), int(x[6])))
-
-    sumppu_cursor.close()
-    sumppu.close()
-
+    for n, la, lo, d, c, s, t, v, y, a in ss.iter_station_rows(
+            pool, zones=sa.economiczones, areas=sa.BalticSeaAreas):
+        stations.append(
+            Aranda_station(n, sa.Gp(lo, la), d, c, s, t, v, y, a))
     return stations
 
-def make_station_list_from_Sumppu(host, user, password, file_to_save):
-    """ This makes the Aranda station list from Sumppu by using
-        get_station_dictionary_from_Sumppu.
-        The result is stored into a local file file_to_save
+def make_station_list_from_Sumppu(host, user, password, file_to_save, pool=None,
+                                  incremental=False):
+    """ This makes the Aranda station list from Sumppu and stores it into
+        a local file file_to_save. The stations are written as they are
+        read from Sumppu. A connection pool can be given as pool.
+        With incremental=True only the visits since the previous run
+        are read and the existing file is updated. A full run stores the
+        state that the next incremental run starts from.
     """
-    stations = get_station_dictionary_from_Sumppu(host, user, password)
-    if file_to_save != '':
-        ofile = open(file_to_save, 'w')
-        ofile.write(
-            "name;lat;lon;depth;country;sea_area;type;visits;first_year;years\n")
-        for s in stations:
-            ofile.write(
-                f"{s.name};{s.position.lat:9.6f};{s.position.lon:10.6f};"\
-                f"{s.depth};{s.country};{s.area};{s.type};"\
-                f"{s.visits};{s.year};{s.years}\n")
-        ofile.close()
+    import sumppu_stations as ss
 
-def get_BalticSea_ices_stations():
-    """ This routine downloads ICES StationDictionary.zip,
-        reads the Station_yyyy-mm-dd-hh-mm.tab file,
+    if file_to_save != '':
+        pool = pool or ss.sumppu_pool(host, user, password)
+        if incremental:
+            ss.refresh_station_list(pool, file_to_save,
+                                    zones=sa.economiczones, areas=sa.BalticSeaAreas)
+        else:
+            ss.write_station_list(
+                ss.iter_station_rows(pool, zones=sa.economiczones, areas=sa.BalticSeaAreas),
+                file_to_save)
+            try:
+                ss.seed_refresh_state(pool, file_to_save)
+            except ValueError:
+                # visits were added during the build, the next incremental
+                # run reads all visits
+                pass
+
+def get_BalticSea_ices_stations(source=ics.ICES_URL, cache_dir=None):
+    """ This routine reads the ICES StationDictionary.zip (downloaded or
+        a local file given as source), reads the Station_yyyy-mm-dd-hh-mm.tab file,
         takes from there stations that belong to Baltic Sea countries
         ['DK', 'DE', 'FI', 'EE', 'LV', 'LT', 'PL', 'RU', 'SE']
-        and are inside the Baltic Sea.
+        and are inside the Baltic Sea. The result is cached, see ices_stations.
         It returns a list of namedtuples ICES_station:
     """
-    url = 'https://www.ices.dk/data/Documents/ENV/StationDictionary.zip'
-
-    # The following could be used to extract the files to a local directory
-    # extract_dir = "example"
-    # zip_path, _ = urllib.request.urlretrieve(url)
-    # with zipfile.ZipFile(zip_path, "r") as f:
-    #     f.extractall(extract_dir)
-
-    filehandle, _ = urllib.request.urlretrieve(url)
-    zip_file_object = zipfile.ZipFile(filehandle, 'r')
-    files = zip_file_object.namelist()
-    id = -1
-    for i in range(len(files)):
-        if 'Station_' in files[i][:8]:
-            id = i
-    if id > -1: 
-        station_file = zip_file_object.namelist()[id]
-        file = zip_file_object.open(station_file)
-        content = file.read()
-        c = content.decode()
-        data = c.split('\r')
-
-        countries = ['DK', 'DE', 'FI', 'EE', 'LV', 'LT', 'PL', 'RU', 'SE']
-        stations = []
-        for d in data[1:]:
-            if 'Relation' in d:
-                break
-            s = d.split('\t')
-            if s[3] in countries:
-                try:
-                    country = s[3]
-                    name = s[4]
-                    lat = float(s[11])
-                    lat_range = float(s[12])
-                    lon = float(s[13])
-                    lon_range = float(s[14])
-                except:
-                    lat = float(s[12])
-                    lat_range = float(s[13])
-                    lon = float(s[14])
-                    lon_range = float(s[15])
-
-                if sa.gsw_Baltic(lon, lat):
-                    stations.append(
-                        ICES_station(name, country, sa.Gp(lon, lat),
-                                     lat_range, lon_range))
-
-    return stations
+    return [ICES_station(name, country, sa.Gp(lon, lat), lat_range, lon_range)
+            for name, country, lat, lat_range, lon, lon_range
+            in ics.read_ices_stations(source, cache_dir=cache_dir)]
@@ -0,0 +1,165 @@
+'''
+Nearest station index
+
+StationIndex is built once from a station list and answers
+nearest-station and within-radius queries by great-circle distance.
+The stations are hashed into a regular lat/lon grid, so a query only
+computes distances to the stations of the grid cells that can be
+within the search radius. Batch queries for whole routes compute the
+distances in blocks with NumPy.
+
+usage:
+import station_index as si
+index = si.StationIndex.from_file('stations.txt')
+index.nearest([lon, lat], k=3)      -> [(distance_nmi, station), ...]
+index.within([lon, lat], 1.0)       -> [(distance_nmi, station), ...]
+index.nearest_many(lons, lats, k=1) -> (distances, indices)
+'''
+import math
+import numpy as np
+import sea_areas as sa
+
+# A degree of latitude in nautical miles
+NMI_PER_DEGREE = 60.0
+# Half of the circumference of the earth in nautical miles
+MAX_DISTANCE_NMI = 180*NMI_PER_DEGREE
+
+
+class StationIndex:
+    def __init__(self, lons, lats, stations=None, cell_deg=0.5):
+        """ lons, lats - station coordinates
+            stations   - optional objects returned for the stations,
+                         by default the indices of the stations
+            cell_deg   - size of the grid cells in degrees
+        """
+        self.lons = np.asarray(lons, dtype=float)
+        self.lats = np.asarray(lats, dtype=float)
+        self.stations = stations if stations is not None else list(range(len(self.lons)))
+        self.cell_deg = cell_deg
+
+        ci = np.floor(self.lats/cell_deg).astype(np.int64)
+        cj = np.floor(self.lons/cell_deg).astype(np.int64)
+        self.order = np.lexsort((cj, ci))
+        self.cells = {}
+        if len(self.order):
+            keys = list(zip(ci[self.order].tolist(), cj[self.order].tolist()))
+            start = 0
+            for k in range(1, len(keys) + 1):
+                if k == len(keys) or keys[k] != keys[start]:
+                    self.cells[keys[start]] = (start, k)
+                    start = k
+
+    @classmethod
+    def from_stations(cls, stations, cell_deg=0.5):
+        """ Builds the index from a list of station dicts ('lat', 'lon'),
+            namedtuples with lat and lon, or namedtuples with a position Gp.
+        """
+        lons = []
+        lats = []
+        for s in stations:
+            if isinstance(s, dict):
+                lons.append(s['lon'])
+                lats.append(s['lat'])
+            elif hasattr(s, 'position'):
+                lons.append(s.position.lon)
+                lats.append(s.position.lat)
+            else:
+                lons.append(s.lon)
+                lats.append(s.lat)
+        return cls(lons, lats, list(stations), cell_deg)
+
+    @classmethod
+    def from_file(cls, fname, cell_deg=0.5):
+        """ Builds the index from an Aranda station file (stations.txt)."""
+        import station_dictionaries as sd
+        return cls.from_stations(sd.read_Aranda_stations(fname), cell_deg)
+
+    def __len__(self):
+        return len(self.lons)
+
+    def _candidates(self, lon, lat, radius_nmi):
+        """ Indices of the stations in the grid cells that can be within
+            radius_nmi of (lon, lat).
+        """
+        dlat = radius_nmi/NMI_PER_DEGREE
+        coslat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        # near the poles or across the date line all stations are candidates
+        if lat + dlat >= 90 or lat - dlat <= -90 or coslat*180 <= dlat:
+            return np.arange(len(self.lons))
+        dlon = dlat/coslat
+        if lon - dlon < -180 or lon + dlon > 180:
+            return np.arange(len(self.lons))
+        d = self.cell_deg
+        i1, i2 = math.floor((lat - dlat)/d), math.floor((lat + dlat)/d)
+        j1, j2 = math.floor((lon - dlon)/d), math.floor((lon + dlon)/d)
+        parts = []
+        if (i2 - i1 + 1)*(j2 - j1 + 1) > len(self.cells):
+            for (i, j), (s, e) in self.cells.items():
+                if i1 <= i <= i2 and j1 <= j <= j2:
+                    parts.append(self.order[s:e])
+        else:
+            for i in range(i1, i2 + 1):
+                for j in range(j1, j2 + 1):
+                    if (i, j) in self.cells:
+                        s, e = self.cells[(i, j)]
+                        parts.append(self.order[s:e])
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(parts)
+
+    def _within(self, aPoint, radius_nmi):
+        # indices and distances of the stations within radius_nmi, nearest first
+        cand = self._candidates(aPoint[0], aPoint[1], radius_nmi)
+        dist = sa.gcDistances_nmi(aPoint[0], aPoint[1], self.lons[cand], self.lats[cand])
+        ok = dist <= radius_nmi
+        cand = cand[ok]
+        dist = dist[ok]
+        order = np.lexsort((cand, dist))
+        return cand[order], dist[order]
+
+    def within(self, aPoint, radius_nmi):
+        """ Returns [(distance_nmi, station), ...] of the stations within
+            radius_nmi of aPoint [lon, lat], nearest first.
+        """
+        idx, dist = self._within(aPoint, radius_nmi)
+        return [(d, self.stations[i]) for i, d in zip(idx.tolist(), dist.tolist())]
+
+    def nearest(self, aPoint, k=1):
+        """ Returns [(distance_nmi, station), ...] of the k stations nearest
+            to aPoint [lon, lat], nearest first.
+        """
+        k = min(k, len(self.lons))
+        radius = self.cell_deg*NMI_PER_DEGREE
+        while True:
+            idx, dist = self._within(aPoint, radius)
+            # every station outside the radius is farther than those inside
+            if len(idx) >= k or radius >= MAX_DISTANCE_NMI:
+                return [(d, self.stations[i]) for i, d in zip(idx[:k].tolist(), dist[:k].tolist())]
+            radius = radius*4
+
+    def nearest_many(self, lons, lats, k=1, block=256):
+        """ Batch form of nearest for the points of e.g. a route.
+            Returns arrays of shape (n, k) of distances and station indices.
+        """
+        lons = np.asarray(lons, dtype=float).ravel()
+        lats = np.asarray(lats, dtype=float).ravel()
+        k = min(k, len(self.lons))
+        distances = np.empty((len(lons), k))
+        indices = np.empty((len(lons), k), dtype=np.intp)
+        for s in range(0, len(lons), block):
+            d = sa.gcDistance_matrix_nmi(lons[s:s + block], lats[s:s + block], self.lons, self.lats)
+            if k < d.shape[1]:
+                part = np.argpartition(d, k - 1, axis=1)[:, :k]
+            else:
+                part = np.broadcast_to(np.arange(d.shape[1]), d.shape)
+            pd = np.take_along_axis(d, part, axis=1)
+            order = np.lexsort((part, pd), axis=1)
+            indices[s:s + block] = np.take_along_axis(part, order, axis=1)
+            distances[s:s + block] = np.take_along_axis(pd, order, axis=1)
+        return distances, indices
+
+    def within_many(self, lons, lats, radius_nmi):
+        """ Batch form of within. Returns a list with a list of
+            [(distance_nmi, station), ...] for each point.
+        """
+        return [self.within(p, radius_nmi) for p in zip(lons, lats)]
@@ -0,0 +1,318 @@
+'''
+Aranda station list from the Sumppu database
+
+The station list is made as a pipeline: the station query is run on a
+pooled connection, the rows are fetched in chunks from an unbuffered
+cursor, the country and sea area codes of each chunk are found with one
+vectorized polygon test (sea_areas.area_indices) and the stations are
+written to the station list file as they come.
+
+The database is reached through a connection pool with the interface of
+mysql.connector.pooling.MySQLConnectionPool: get_connection() returns a
+DB-API connection whose close() gives it back to the pool. sumppu_pool
+makes such pools for Sumppu. ConnectionPool wraps any DB-API connect
+function, e.g. sqlite3.connect for a local stand-in database.
+
+usage:
+import sumppu_stations as ss
+pool = ss.sumppu_pool(host, user, password)
+ss.write_station_list(ss.iter_station_rows(pool), 'stations.txt')
+ss.seed_refresh_state(pool, 'stations.txt')    -> the state of the full list
+ss.refresh_station_list(pool, 'stations.txt')  -> only the visits since the last refresh
+
+The queries use the MySQL functions if() and year(). With another database
+give the queries as its SQL, e.g. strftime('%Y', date_visited) for sqlite.
+'''
+import json
+import os
+import threading
+import download_cache as dc
+import sea_areas as sa
+
+# The stations with the number of visits, the year of the first visit and
+# the number of years with visits. The columns are
+# name, latitude, longitude, depth, visits, first_year, years
+SUMPPU_QUERY =\
+    "select s.name,s.latitude,s.longitude,if(s.bottom_depth is NULL,-9,s.bottom_depth),v.nv,b.ym,a.ny "\
+    "from station s, "\
+    "(select station_id id,count(id) nv "\
+    "from visit group by `station_id`) v, "\
+    "(select id,count(y) ny "\
+    "from (select distinct station_id id,year(date_visited) y "\
+    "from visit order by station_id) d "\
+    "group by id) a, "\
+    "(select station_id id,year(min(date_visited)) ym "\
+    "from visit group by station_id) b "\
+    "where a.id=v.id and b.id=v.id and v.id=s.id order by s.name"
+
+# The visits after the high-water mark (visit id) with their stations.
+# The columns are visit id, name, latitude, longitude, depth, year
+VISITS_QUERY =\
+    "select v.id,s.name,s.latitude,s.longitude,if(s.bottom_depth is NULL,-9,s.bottom_depth),year(v.date_visited) "\
+    "from visit v, station s "\
+    "where v.station_id=s.id and v.id>{mark} order by v.id"
+
+# The visits of each station in each year and the largest visit id, the
+# refresh state of a full station list.
+# The columns are name, year, visits, largest visit id
+YEARS_QUERY =\
+    "select s.name,year(v.date_visited),count(v.id),max(v.id) "\
+    "from visit v, station s "\
+    "where v.station_id=s.id group by s.name,year(v.date_visited)"
+
+STATION_LIST_HEADER = "name;lat;lon;depth;country;sea_area;type;visits;first_year;years\n"
+CHUNK_SIZE = 1000
+STATE_SUFFIX = '.state.json'
+
+
+class _PooledConnection:
+    # A connection that goes back to its pool when it is closed
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            self._pool._release(self._connection)
+            self._connection = None
+
+
+class ConnectionPool:
+    def __init__(self, connect, size=2):
+        """ connect - function that opens a new DB-API connection
+            size    - number of idle connections kept open
+        """
+        self.connect = connect
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self.connect()
+        return _PooledConnection(self, connection)
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+_pools = {}
+
+def sumppu_pool(host, user, password, database='sumppu', size=2):
+    """ Returns a MySQL connection pool to Sumppu, one per process for
+        each host, user and database.
+    """
+    key = (host, user, database)
+    if key not in _pools:
+        from mysql.connector import pooling
+        _pools[key] = pooling.MySQLConnectionPool(
+            pool_name=f'sumppu{len(_pools)}', pool_size=size,
+            host=host, user=user, passwd=password, database=database)
+    return _pools[key]
+
+
+def iter_query_chunks(pool, query=SUMPPU_QUERY, chunk_size=CHUNK_SIZE):
+    """ Yields the rows of query in lists of at most chunk_size rows.
+        The cursor is unbuffered (the mysql.connector default), so the rows
+        are streamed from the server as they are fetched.
+    """
+    connection = pool.get_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def _codes(areas, par, def_val):
+    # the par values of the areas (dicts or namedtuples) and def_val last for index -1
+    return [a[par] if isinstance(a, dict) else getattr(a, par) for a in areas] + [def_val]
+
+
+def iter_station_rows(pool, query=SUMPPU_QUERY, chunk_size=CHUNK_SIZE,
+                      zones=sa.economiczones, areas=sa.BalticSeaAreas):
+    """ Yields the stations of Sumppu as tuples
+        (name, lat, lon, depth, country, sea_area, type, visits, first_year, years),
+        the fields of station_catalog.catalog_fields.
+        country is the mccode of the economic zone ('0' if none) and
+        sea_area the mccode of the sea area ('' if none), as given by
+        getMyCruiseCountryCode and getMyCruiseHelcomAreaCode.
+    """
+    country_codes = _codes(zones, 'mccode', '0')
+    area_codes = _codes(areas, 'mccode', '')
+    for chunk in iter_query_chunks(pool, query, chunk_size):
+        lats = [float(x[1]) for x in chunk]
+        lons = [float(x[2]) for x in chunk]
+        countries = sa.area_indices(lons, lats, zones).tolist()
+        sea_areas = sa.area_indices(lons, lats, areas).tolist()
+        for x, lat, lon, c, s in zip(chunk, lats, lons, countries, sea_areas):
+            yield (x[0], lat, lon, int(x[3]), country_codes[c], area_codes[s], 'S1',
+                   int(x[4]), int(x[5]), int(x[6]))
+
+
+def _format_row(name, lat, lon, depth, country, area, stype, visits, year, years):
+    return f"{name};{lat:9.6f};{lon:10.6f};{depth};{country};{area};{stype};{visits};{year};{years}\n"
+
+
+def write_station_list(rows, fname):
+    """ Writes station rows (see iter_station_rows) to a station list file
+        as they come. The file is replaced only when all rows are written.
+        Returns the number of stations.
+    """
+    n = 0
+    with dc.atomic_write(fname, 'w') as f:
+        f.write(STATION_LIST_HEADER)
+        for name, lat, lon, depth, country, area, stype, visits, year, years in rows:
+            f.write(_format_row(name, lat, lon, depth, country, area, stype, visits, year, years))
+            n = n + 1
+    return n
+
+
+def _read_list_rows(fname):
+    # the rows of a station list file split into fields, by name in file order
+    lines = {}
+    with open(fname, 'r') as f:
+        next(f, None)
+        for row in f:
+            r = row.rstrip('\n').split(';')
+            if len(r) < 10:
+                continue
+            lines[r[0]] = r
+    return lines
+
+
+def _write_state(fname, mark, years):
+    # the refresh state of the station list file as it is now
+    st = os.stat(fname)
+    state = {'mark': mark, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+             'years': {name: sorted(y) for name, y in years.items()}}
+    with dc.atomic_write(fname + STATE_SUFFIX, 'w') as f:
+        json.dump(state, f)
+
+
+def _read_state(fname):
+    """ Returns the refresh state of a station list file, None if there is
+        none or the file has been changed since the state was written.
+    """
+    try:
+        with open(fname + STATE_SUFFIX, 'r') as f:
+            state = json.load(f)
+        st = os.stat(fname)
+    except (OSError, ValueError):
+        return None
+    if state.get('size') != st.st_size or state.get('mtime_ns') != st.st_mtime_ns:
+        return None
+    return state
+
+
+def seed_refresh_state(pool, fname, query=YEARS_QUERY, chunk_size=CHUNK_SIZE):
+    """ Writes the refresh state of a station list file made with
+        write_station_list, which writes none, so that the next
+        refresh_station_list reads only the visits made after it.
+        query - the visits of each station by year, see YEARS_QUERY
+        The visits of the stations in the database must be those of the
+        list, otherwise (e.g. visits were added after the list was made)
+        ValueError is raised and no state is written.
+        Returns the high-water mark.
+    """
+    visits = {name: int(r[7]) for name, r in _read_list_rows(fname).items()}
+    counts = {}
+    years = {}
+    mark = 0
+    for chunk in iter_query_chunks(pool, query, chunk_size):
+        for name, year, n, vid in chunk:
+            counts[name] = counts.get(name, 0) + int(n)
+            years.setdefault(name, set()).add(int(year))
+            mark = max(mark, int(vid))
+    if counts != visits:
+        raise ValueError(f'{fname}: the visits of the list are not those of the database, make the list again')
+    _write_state(fname, mark, years)
+    return mark
+
+
+def refresh_station_list(pool, fname, chunk_size=CHUNK_SIZE,
+                         zones=sa.economiczones, areas=sa.BalticSeaAreas, query=VISITS_QUERY):
+    """ Updates a station list file with the visits made after the previous
+        refresh. The high-water mark (the largest visit id) and the years
+        with visits of each station are kept in fname + '.state.json'.
+        query - the visits after the high-water mark {mark}, see VISITS_QUERY
+
+        visits, first_year and years of the visited stations are updated
+        in place and new stations, the only ones classified, are appended
+        in name order. Without a valid state the list is built from all
+        visits; a list made with write_station_list has a state only after
+        seed_refresh_state. Returns (number of new visits, number of new
+        stations).
+    """
+    state = _read_state(fname)
+    lines = {}
+    years = {}
+    mark = 0
+    if state is not None:
+        mark = state['mark']
+        years = {name: set(y) for name, y in state['years'].items()}
+        lines = _read_list_rows(fname)
+    order = list(lines)
+
+    new = {}
+    n_visits = 0
+    for chunk in iter_query_chunks(pool, query.format(mark=int(mark)), chunk_size):
+        for vid, name, lat, lon, depth, year in chunk:
+            mark = max(mark, int(vid))
+            year = int(year)
+            n_visits = n_visits + 1
+            station_years = years.setdefault(name, set())
+            station_years.add(year)
+            if name in lines:
+                r = lines[name]
+                r[7] = str(int(r[7]) + 1)
+                r[8] = str(min(int(r[8]), year))
+                r[9] = str(len(station_years))
+            elif name in new:
+                s = new[name]
+                s[3] = s[3] + 1
+                s[4] = min(s[4], year)
+            else:
+                new[name] = [float(lat), float(lon), int(depth), 1, year]
+
+    names = sorted(new)
+    lats = [new[n][0] for n in names]
+    lons = [new[n][1] for n in names]
+    country_codes = _codes(zones, 'mccode', '0')
+    area_codes = _codes(areas, 'mccode', '')
+    countries = sa.area_indices(lons, lats, zones).tolist() if names else []
+    sea_areas = sa.area_indices(lons, lats, areas).tolist() if names else []
+
+    with dc.atomic_write(fname, 'w') as f:
+        f.write(STATION_LIST_HEADER)
+        for name in order:
+            f.write(';'.join(lines[name]) + '\n')
+        for name, c, s in zip(names, countries, sea_areas):
+            lat, lon, depth, visits, first_year = new[name]
+            f.write(_format_row(name, lat, lon, depth, country_codes[c], area_codes[s], 'S1',
+                                visits, first_year, len(years[name])))
+    _write_state(fname, mark, years)
+    return n_visits, len(names)
@@ -0,0 +1,60 @@
+import functools
+import os
+import sqlite3
+import sys
+import types
+
+import pytest
+
+# the units of MyCruise are modules in the top directory of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The Sumppu queries of sumppu_stations in the SQL of sqlite
+_sqlite_functions = (
+    ('if(s.bottom_depth is NULL,-9,s.bottom_depth)', 'ifnull(s.bottom_depth,-9)'),
+    ('year(min(date_visited))', "cast(strftime('%Y',min(date_visited)) as integer)"),
+    ('year(date_visited)', "cast(strftime('%Y',date_visited) as integer)"),
+    ('year(v.date_visited)', "cast(strftime('%Y',v.date_visited) as integer)"),
+    ('`', ''),
+)
+
+
+def sqlite_query(query):
+    for mysql, sqlite in _sqlite_functions:
+        query = query.replace(mysql, sqlite)
+    return query
+
+
+@pytest.fixture
+def sumppu_db(tmp_path):
+    """ A sqlite stand-in of Sumppu with three stations and four visits,
+        its connection pool and the queries of sumppu_stations for it.
+        add_visits([(station id, 'yyyy-mm-dd'), ...]) adds visits.
+    """
+    import sumppu_stations as ss
+
+    path = str(tmp_path / 'sumppu.sqlite')
+    with sqlite3.connect(path) as db:
+        db.executescript(
+            'create table station (id integer primary key, name text, latitude real, '
+            'longitude real, bottom_depth integer);'
+            'create table visit (id integer primary key, station_id integer, date_visited text);')
+        db.executemany('insert into station values (?, ?, ?, ?, ?)',
+                       [(1, 'LL7', 59.85, 24.83, 100), (2, 'BY15', 57.32, 20.05, None),
+                        (3, 'F64', 60.19, 19.14, 280)])
+        db.executemany('insert into visit (station_id, date_visited) values (?, ?)',
+                       [(1, '2019-05-01'), (1, '2020-05-01'), (2, '2020-06-01'), (1, '2020-07-01')])
+    db.close()
+
+    def add_visits(visits):
+        with sqlite3.connect(path) as db:
+            db.executemany('insert into visit (station_id, date_visited) values (?, ?)', visits)
+        db.close()
+
+    pool = ss.ConnectionPool(functools.partial(sqlite3.connect, path, check_same_thread=False))
+    yield types.SimpleNamespace(
+        path=path, pool=pool, add_visits=add_visits,
+        stations_query=sqlite_query(ss.SUMPPU_QUERY),
+        visits_query=sqlite_query(ss.VISITS_QUERY),
+        years_query=sqlite_query(ss.YEARS_QUERY))
+    pool.close()
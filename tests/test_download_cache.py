@@ -0,0 +1,85 @@
+import http.server
+import os
+import threading
+
+import pytest
+import requests
+
+import download_cache as dc
+
+CONTENT = b'name;lat;lon\nLL7;59.85;24.83\n'
+ETAG = '"v1"'
+
+
+class StationsHandler(http.server.BaseHTTPRequestHandler):
+    # serves CONTENT with an ETag, 304 when the client has the same ETag
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get('If-None-Match'))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(CONTENT)))
+        self.end_headers()
+        self.wfile.write(CONTENT)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StationsHandler.requests = []
+    httpd = http.server.HTTPServer(('127.0.0.1', 0), StationsHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f'http://127.0.0.1:{httpd.server_address[1]}/stations.txt'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_revalidates_with_304(server, tmp_path):
+    httpd, url = server
+    cache_dir = str(tmp_path)
+    path = dc.fetch_path(url, cache_dir=cache_dir)
+    with open(path, 'rb') as f:
+        assert f.read() == CONTENT
+    mtime = os.stat(path).st_mtime_ns
+
+    # a fresh copy is used without asking the server
+    assert dc.fetch(url, cache_dir=cache_dir) == CONTENT
+    assert StationsHandler.requests == [None]
+
+    # max_age=0 revalidates, the server answers 304 and the copy is kept
+    assert dc.fetch(url, cache_dir=cache_dir, max_age=0) == CONTENT
+    assert StationsHandler.requests == [None, ETAG]
+    assert os.stat(path).st_mtime_ns == mtime
+    assert not [n for n in os.listdir(cache_dir) if n.endswith('.tmp')]
+
+
+def test_fetch_uses_last_copy_offline(server, tmp_path):
+    httpd, url = server
+    cache_dir = str(tmp_path)
+    assert dc.fetch(url, cache_dir=cache_dir) == CONTENT
+    httpd.shutdown()
+    httpd.server_close()
+    assert dc.fetch(url, cache_dir=cache_dir, max_age=0, timeout=2) == CONTENT
+    with pytest.raises(requests.RequestException):
+        dc.fetch(url + '?other', cache_dir=cache_dir, timeout=2)
+
+
+def test_atomic_write_removes_temp_file_on_error(tmp_path):
+    fname = str(tmp_path / 'stations.txt')
+    with dc.atomic_write(fname, 'w') as f:
+        f.write('old')
+    with pytest.raises(RuntimeError):
+        with dc.atomic_write(fname, 'w') as f:
+            f.write('new')
+            raise RuntimeError
+    with open(fname) as f:
+        assert f.read() == 'old'
+    assert os.listdir(tmp_path) == ['stations.txt']
@@ -0,0 +1,96 @@
+import os
+import zipfile
+
+import pytest
+
+import ices_stations as ics
+import sea_areas as sa
+
+
+def tab_row(country, name, lat, lat_range, lon, lon_range, shift=False):
+    # a row of the station table, shift puts the coordinates one column later
+    s = ['x']*17
+    s[3] = country
+    s[4] = name
+    k = 12 if shift else 11
+    if shift:
+        s[11] = 'text'
+    s[k:k + 4] = [str(lat), str(lat_range), str(lon), str(lon_range)]
+    return '\t'.join(s)
+
+
+@pytest.fixture
+def station_zip(tmp_path):
+    rows = ['\t'.join(f'h{i}' for i in range(17)),
+            tab_row('FI', 'LL7', 59.85, 0.1, 24.83, 0.2),
+            tab_row('SE', 'BY15', 57.32, 0.05, 20.05, 0.1, shift=True),
+            tab_row('FI', 'Atlantic', 40.0, 0.1, -20.0, 0.1),
+            tab_row('US', 'Other', 59.0, 0.1, 20.0, 0.1),
+            'Relation\tstations',
+            tab_row('FI', 'After', 60.0, 0.1, 20.0, 0.1)]
+    fname = str(tmp_path / 'StationDictionary.zip')
+    with zipfile.ZipFile(fname, 'w') as zf:
+        zf.writestr('Station_2024-01-01-00-00.tab', '\r'.join(rows) + '\r')
+    return fname
+
+
+def old_parser(zip_path):
+    # the parsing of get_BalticSea_ices_stations before ices_stations
+    stations = []
+    zip_file_object = zipfile.ZipFile(zip_path, 'r')
+    files = zip_file_object.namelist()
+    id = -1
+    for i in range(len(files)):
+        if 'Station_' in files[i][:8]:
+            id = i
+    if id > -1:
+        c = zip_file_object.open(files[id]).read().decode()
+        data = c.split('\r')
+        countries = ['DK', 'DE', 'FI', 'EE', 'LV', 'LT', 'PL', 'RU', 'SE']
+        for d in data[1:]:
+            if 'Relation' in d:
+                break
+            s = d.split('\t')
+            if s[3] in countries:
+                try:
+                    country = s[3]
+                    name = s[4]
+                    lat = float(s[11])
+                    lat_range = float(s[12])
+                    lon = float(s[13])
+                    lon_range = float(s[14])
+                except (ValueError, IndexError):
+                    lat = float(s[12])
+                    lat_range = float(s[13])
+                    lon = float(s[14])
+                    lon_range = float(s[15])
+                if sa.gsw_Baltic(lon, lat):
+                    stations.append((name, country, lat, lat_range, lon, lon_range))
+    zip_file_object.close()
+    return stations
+
+
+def test_read_ices_stations_equals_old_parser(station_zip, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    rows = ics.read_ices_stations(station_zip, cache_dir=cache_dir)
+    assert rows == old_parser(station_zip)
+    assert [r[0] for r in rows] == ['LL7', 'BY15']
+
+
+def test_read_ices_stations_from_cache(station_zip, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    rows = ics.read_ices_stations(station_zip, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError('the zip was parsed again')
+
+    monkeypatch.setattr(ics, 'iter_ices_rows', no_parsing)
+    assert ics.read_ices_stations(station_zip, cache_dir=cache_dir) == rows
+
+
+def test_read_ices_stations_without_writable_cache(station_zip, tmp_path):
+    # the cache directory can not be made under a file
+    (tmp_path / 'file').write_text('')
+    rows = ics.read_ices_stations(station_zip, cache_dir=str(tmp_path / 'file' / 'cache'))
+    assert rows == old_parser(station_zip)
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+import sumppu_stations as ss
+
+NEW_VISITS = [(2, '2021-01-01'), (3, '2018-01-01'), (3, '2022-01-01'), (1, '2019-09-01')]
+
+
+def read_list(fname):
+    # {name: fields} and the names in file order of a station list
+    with open(fname) as f:
+        next(f)
+        rows = [line.rstrip('\n').split(';') for line in f]
+    return {r[0]: r for r in rows}, [r[0] for r in rows]
+
+
+def full_build(db, fname):
+    ss.write_station_list(ss.iter_station_rows(db.pool, db.stations_query), fname)
+    return read_list(fname)[0]
+
+
+@pytest.fixture
+def visit_rows(monkeypatch):
+    # the number of visit rows each query of refresh_station_list returns
+    counts = []
+    iter_query_chunks = ss.iter_query_chunks
+
+    def counting(pool, query, chunk_size=ss.CHUNK_SIZE):
+        counts.append(0)
+        for chunk in iter_query_chunks(pool, query, chunk_size):
+            counts[-1] += len(chunk)
+            yield chunk
+
+    monkeypatch.setattr(ss, 'iter_query_chunks', counting)
+    return counts
+
+
+def test_refresh_reads_only_new_visits(sumppu_db, tmp_path, visit_rows):
+    fname = str(tmp_path / 'stations.txt')
+    full_build(sumppu_db, fname)
+    assert ss.seed_refresh_state(sumppu_db.pool, fname, sumppu_db.years_query) == 4
+    visit_rows.clear()
+
+    sumppu_db.add_visits(NEW_VISITS)
+    assert ss.refresh_station_list(sumppu_db.pool, fname, query=sumppu_db.visits_query) == (4, 1)
+    assert visit_rows == [4]
+    stations, order = read_list(fname)
+    # the existing stations are updated in place, F64 is new and appended
+    assert order == ['BY15', 'LL7', 'F64']
+    assert stations == full_build(sumppu_db, str(tmp_path / 'full.txt'))
+    assert stations['LL7'][7:] == ['4', '2019', '2']
+    assert stations['F64'][7:] == ['2', '2018', '2']
+
+    # nothing new
+    assert ss.refresh_station_list(sumppu_db.pool, fname, query=sumppu_db.visits_query) == (0, 0)
+    assert read_list(fname) == (stations, order)
+    assert not [n for n in os.listdir(tmp_path) if n.endswith('.tmp')]
+
+
+def test_refresh_without_state_reads_all_visits(sumppu_db, tmp_path):
+    fname = str(tmp_path / 'stations.txt')
+    assert ss.refresh_station_list(sumppu_db.pool, fname, query=sumppu_db.visits_query) == (4, 2)
+    sumppu_db.add_visits(NEW_VISITS)
+    assert ss.refresh_station_list(sumppu_db.pool, fname, query=sumppu_db.visits_query) == (4, 1)
+    assert read_list(fname)[0] == full_build(sumppu_db, str(tmp_path / 'full.txt'))
+
+
+def test_changed_list_is_rebuilt(sumppu_db, tmp_path):
+    fname = str(tmp_path / 'stations.txt')
+    ss.refresh_station_list(sumppu_db.pool, fname, query=sumppu_db.visits_query)
+    with open(fname, 'a') as f:
+        f.write('EXTRA;60.0;20.0;10;0;;S1;1;2000;1\n')
+    # the state no longer matches the file, so all visits are read again
+    assert ss.refresh_station_list(sumppu_db.pool, fname, query=sumppu_db.visits_query) == (4, 2)
+    assert 'EXTRA' not in read_list(fname)[0]
+
+
+def test_seed_refuses_a_list_behind_the_database(sumppu_db, tmp_path):
+    fname = str(tmp_path / 'stations.txt')
+    full_build(sumppu_db, fname)
+    sumppu_db.add_visits(NEW_VISITS[:1])
+    with pytest.raises(ValueError):
+        ss.seed_refresh_state(sumppu_db.pool, fname, sumppu_db.years_query)
+    assert not os.path.exists(fname + ss.STATE_SUFFIX)
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+import pytest
+
+import sea_areas as sa
+import sumppu_stations as ss
+
+
+def stations_one_by_one(db):
+    # the stations as get_station_dictionary_from_Sumppu made them before
+    # the pipeline: all rows at once, classified point by point
+    with sqlite3.connect(db.path) as connection:
+        result = connection.execute(db.stations_query).fetchall()
+    connection.close()
+    stations = []
+    for x in result:
+        lat = float(x[1])
+        lon = float(x[2])
+        stations.append((x[0], lat, lon, int(x[3]), sa.getMyCruiseCountryCode([lon, lat]),
+                         sa.getMyCruiseHelcomAreaCode([lon, lat]), 'S1',
+                         int(x[4]), int(x[5]), int(x[6])))
+    return stations
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, ss.CHUNK_SIZE])
+def test_iter_station_rows_equals_point_by_point(sumppu_db, chunk_size):
+    rows = list(ss.iter_station_rows(sumppu_db.pool, sumppu_db.stations_query, chunk_size))
+    assert rows == stations_one_by_one(sumppu_db)
+    assert [r[7] for r in rows] == [1, 3]
+
+
+def test_write_station_list(sumppu_db, tmp_path):
+    fname = str(tmp_path / 'stations.txt')
+    n = ss.write_station_list(ss.iter_station_rows(sumppu_db.pool, sumppu_db.stations_query), fname)
+    with open(fname) as f:
+        lines = f.readlines()
+    assert n == 2
+    assert lines[0] == ss.STATION_LIST_HEADER
+    assert [line.split(';')[0] for line in lines[1:]] == ['BY15', 'LL7']
+    assert lines[1].split(';')[3] == '-9'
+    assert sorted(os.listdir(tmp_path)) == ['stations.txt', 'sumppu.sqlite']
+
+
+def test_failed_query_keeps_station_list(sumppu_db, tmp_path):
+    fname = str(tmp_path / 'stations.txt')
+    ss.write_station_list(ss.iter_station_rows(sumppu_db.pool, sumppu_db.stations_query), fname)
+    with open(fname) as f:
+        before = f.read()
+    with pytest.raises(sqlite3.OperationalError):
+        ss.write_station_list(ss.iter_station_rows(sumppu_db.pool, 'select * from nothing'), fname)
+    with open(fname) as f:
+        assert f.read() == before
+    assert sorted(os.listdir(tmp_path)) == ['stations.txt', 'sumppu.sqlite']
+
+
+def test_connection_pool_reuses_connections(sumppu_db):
+    opened = []
+
+    def connect():
+        opened.append(sqlite3.connect(sumppu_db.path))
+        return opened[-1]
+
+    pool = ss.ConnectionPool(connect, size=1)
+    for _ in range(3):
+        list(ss.iter_station_rows(pool, sumppu_db.stations_query))
+    assert len(opened) == 1
+    pool.close()
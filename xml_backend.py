@@ -0,0 +1,228 @@
+'''
+XML backends for reading and writing cruise plans
+
+A backend gives mcxFile the few XML operations it needs: parsing a file
+into an element tree, iterparse for the lazy header read and
+pretty-printing a plan built with xml.etree.ElementTree for saving.
+
+'stdlib' (the default) uses xml.etree.ElementTree and xml.dom.minidom,
+'lxml' uses lxml.etree (parsing and serialization in C) and 'auto' is
+lxml when it is installed and stdlib otherwise. Both backends drop
+comments and processing instructions when parsing, as ElementTree does,
+and write the same text as minidom.toprettyxml(indent="   "), with the
+line ends of text ('\\r\\n' and '\\r') as '\\n'. lxml checks this on a
+probe plan when it first saves and leaves the saving to the stdlib
+backend if its text differs. They raise their own errors for a malformed
+file: xml.etree.ElementTree.ParseError and lxml.etree.XMLSyntaxError.
+
+usage:
+import xml_backend as xb
+xml = xb.get_backend()            -> stdlib
+xml = xb.get_backend('auto')      -> lxml if it is installed
+root = xml.parse('cruise.mcx')
+text = xml.to_pretty_xml(root)
+'''
+import re
+
+BACKENDS = ('auto', 'lxml', 'stdlib')
+
+# The characters whose escaping differs between lxml and minidom, or
+# between the minidom of different Python versions
+_PROBE_CHARS = '"\'<>&\n\r\t'
+_markup = re.compile(r'(<!--.*?-->|<[^>]*>)', re.S)
+_line_end = re.compile('\r\n?')
+
+
+class StdlibBackend:
+    name = 'stdlib'
+
+    def __init__(self):
+        import xml.etree.ElementTree as etree
+        self.etree = etree
+
+    def __reduce__(self):
+        return (get_backend, (self.name,))
+
+    def parse(self, source):
+        """ Returns the root element of a file name or a binary file object."""
+        return self.etree.parse(source).getroot()
+
+    def iterparse(self, source, events=('end',)):
+        return self.etree.iterparse(source, events=events)
+
+    def to_pretty_xml(self, root):
+        """ Returns an xml.etree.ElementTree element as an indented XML document."""
+        return self._to_dom(root).toprettyxml(indent="   ")
+
+    def _to_dom(self, root):
+        # ElementTree writes the tree and minidom parses it again, so the
+        # line ends of text ('\r\n' and '\r') become '\n' as in any XML parser
+        from xml.dom import minidom
+        return minidom.parseString(self.etree.tostring(root, 'utf-8'))
+
+
+class LxmlBackend:
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import etree
+        self.etree = etree
+        self._parser = etree.XMLParser(remove_comments=True, remove_pis=True,
+                                       resolve_entities=False, huge_tree=True)
+        self._escape_maps = None
+        self._normalize_line_ends = False
+
+    def __reduce__(self):
+        return (get_backend, (self.name,))
+
+    def parse(self, source):
+        """ Returns the root element of a file name or a binary file object."""
+        return self.etree.parse(source, self._parser).getroot()
+
+    def iterparse(self, source, events=('end',)):
+        return self.etree.iterparse(source, events=events, remove_comments=True,
+                                    remove_pis=True, resolve_entities=False, huge_tree=True)
+
+    def _from_etree(self, root):
+        # A copy of an ElementTree tree as lxml elements. As ElementTree
+        # writes them, a text or a tail that is false ('', None, [], False)
+        # is not written. The line ends of text are made '\n' when the
+        # stdlib backend does so.
+        import xml.etree.ElementTree as ET
+        etree = self.etree
+        if self._normalize_line_ends:
+            def fix(text):
+                return _line_end.sub('\n', text) if '\r' in text else text
+        else:
+            def fix(text):
+                return text
+
+        def copy(elem, parent):
+            if elem.tag is ET.Comment:
+                new = etree.Comment(fix(elem.text) if elem.text else None)
+                if parent is not None:
+                    parent.append(new)
+            elif parent is None:
+                new = etree.Element(elem.tag, elem.attrib)
+            else:
+                new = etree.SubElement(parent, elem.tag, elem.attrib)
+            if elem.text and elem.tag is not ET.Comment:
+                new.text = fix(elem.text)
+            if elem.tail:
+                new.tail = fix(elem.tail)
+            for child in elem:
+                copy(child, new)
+            return new
+
+        return copy(root, None)
+
+    def _escapes(self):
+        # (text escapes, attribute escapes, same) where the escapes replace
+        # the lxml form of the characters written differently by the two
+        # backends with the stdlib form, and same tells if a probe plan is
+        # then written the same by both
+        if self._escape_maps is None:
+            import xml.etree.ElementTree as ET
+            stdlib = get_backend('stdlib')
+
+            def probe(text, attr):
+                elem = ET.Element('a', {'b': attr})
+                elem.text = text
+                lx = self.etree.tostring(self._from_etree(elem), encoding='unicode')
+                return _split_probe(lx), _split_probe(stdlib._to_dom(elem).documentElement.toxml())
+
+            self._normalize_line_ends = probe('\r\n\r', '')[1][1] == '\n\n'
+            text_map = {}
+            attr_map = {}
+            for c in _PROBE_CHARS:
+                lx, md = probe(c, c)
+                if lx[0] != md[0]:
+                    attr_map[lx[0]] = md[0]
+                if lx[1] != md[1]:
+                    text_map[lx[1]] = md[1]
+            escapes = (_replacer(text_map), _replacer(attr_map))
+            # a plan with line ends and the probe characters in its fields,
+            # e.g. the <dr> text of a point written on Windows
+            plan = ET.Element('mycruise', {'name': f'a\r\nb{_PROBE_CHARS}'})
+            point = ET.SubElement(plan, 'point')
+            ET.SubElement(point, 'dr').text = f'line 1\r\nline 2\rline 3\n{_PROBE_CHARS}'
+            ET.SubElement(point, 'name').text = 'P'
+            ET.SubElement(point, 'empty')
+            same = self._pretty_xml(plan, *escapes) == stdlib.to_pretty_xml(plan)
+            self._escape_maps = escapes + (same,)
+        return self._escape_maps
+
+    def to_pretty_xml(self, root):
+        """ Returns an xml.etree.ElementTree element as an indented XML document,
+            the same text as the stdlib backend writes. If the probe plan is
+            not written the same by lxml, the stdlib backend writes it.
+        """
+        text_escape, attr_escape, same = self._escapes()
+        if not same:
+            return get_backend('stdlib').to_pretty_xml(root)
+        return self._pretty_xml(root, text_escape, attr_escape)
+
+    def _pretty_xml(self, root, text_escape, attr_escape):
+        root = self._from_etree(root)
+        # etree.indent indents only elements without text, as minidom does
+        self.etree.indent(root, space='   ')
+        text = self.etree.tostring(root, encoding='unicode')
+        if text_escape or attr_escape:
+            # the even parts are text, the odd ones tags and comments
+            parts = _markup.split(text)
+            if text_escape:
+                parts[0::2] = [text_escape(p) if p and not p.isspace() else p for p in parts[0::2]]
+            if attr_escape:
+                parts[1::2] = [attr_escape(p) if '&#' in p and not p.startswith('<!--') else p
+                               for p in parts[1::2]]
+            text = ''.join(parts)
+        return '<?xml version="1.0" ?>\n' + text + '\n'
+
+
+def _split_probe(xmlstr):
+    # (attribute value, text) of a written <a b="...">...</a>
+    attr, text = xmlstr[len('<a b="'):].split('">', 1)
+    return attr, text[:-len('</a>')]
+
+
+def _replacer(table):
+    # a function that replaces the keys of table in a string, None for an empty table
+    if not table:
+        return None
+    pattern = re.compile('|'.join(re.escape(k) for k in sorted(table, key=len, reverse=True)))
+    return lambda s: pattern.sub(lambda m: table[m.group(0)], s)
+
+
+_backends = {}
+
+
+def available():
+    """ Returns the names of the backends that can be used."""
+    names = ['stdlib']
+    try:
+        import lxml.etree  # noqa: F401
+    except ImportError:
+        return names
+    return ['lxml'] + names
+
+
+def get_backend(backend=None):
+    """ Returns a backend object.
+        backend - 'stdlib' or None, 'lxml', 'auto' (lxml if it is installed)
+                  or a backend object, which is returned as such
+        Raises ImportError for 'lxml' when lxml is not installed and
+        ValueError for an unknown name.
+    """
+    if backend is not None and not isinstance(backend, str):
+        return backend
+    name = backend or 'stdlib'
+    if name == 'auto':
+        name = available()[0]
+    if name not in _backends:
+        if name == 'lxml':
+            _backends[name] = LxmlBackend()
+        elif name == 'stdlib':
+            _backends[name] = StdlibBackend()
+        else:
+            raise ValueError(f'unknown XML backend {backend!r}, use one of {", ".join(BACKENDS)}')
+    return _backends[name]